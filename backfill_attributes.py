@@ -0,0 +1,12 @@
+import sys
+import asyncio
+from models import initialize_db
+from ingest import backfill_attributes
+
+# Foydalanish: python backfill_attributes.py [--all]
+#   --all  barcha e'lonlarni qayta tahlil qilish (extraction.py yangilanganidan keyin)
+
+if __name__ == "__main__":
+    initialize_db()
+    updated = asyncio.run(backfill_attributes(only_missing="--all" not in sys.argv[1:]))
+    print(f"✅ {updated} ta e'lon yangilandi.")
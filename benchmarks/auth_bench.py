@@ -0,0 +1,120 @@
+"""
+Web panel authentication cost (in-process FastAPI app, no network).
+
+    python benchmarks/auth_bench.py --requests 2000 --concurrency 20 --logins 40
+    python benchmarks/auth_bench.py --legacy-bcrypt   # bcrypt on the DB read pool, as before
+
+1. authenticated: --requests GET /dashboard/stats with a session cookie, token cache
+                  off (JWT decode + User query per request) and on.
+2. login storm:   --logins POST /login running at the same time as /dashboard/stats
+                  requests; reports the latency of the latter while bcrypt is busy.
+"""
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from forwarding_replay import configure, percentile  # noqa: E402
+
+USERNAME, PASSWORD = "bench", "bench-password"
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000, help="authenticated requests per run")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--logins", type=int, default=40, help="logins in the storm")
+    parser.add_argument("--rounds", type=int, default=12, help="BCRYPT_ROUNDS")
+    parser.add_argument("--legacy-bcrypt", action="store_true",
+                        help="verify passwords on the DB read pool (previous behaviour)")
+    return parser.parse_args()
+
+
+async def timed_gets(client, count: int, concurrency: int) -> tuple:
+    latencies = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def get():
+        async with semaphore:
+            began = time.perf_counter()
+            response = await client.get("/dashboard/stats")
+            response.raise_for_status()
+            latencies.append(time.perf_counter() - began)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(get() for _ in range(count)))
+    return time.perf_counter() - start, latencies
+
+
+async def run(args):
+    import httpx
+    import main
+    import security
+    import storage
+    from models import User
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    if args.legacy_bcrypt:
+        async def authenticate(username, password):
+            def check():
+                user = User.get_or_none(User.username == username)
+                return user if user and user.verify_password(password) else None
+            return await storage.read(check)
+        main.authenticate = authenticate
+
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        began = time.perf_counter()
+        response = await client.post("/login", data={"username": USERNAME, "password": PASSWORD})
+        print(f"login: {(time.perf_counter() - began) * 1000:.0f} ms (bcrypt rounds {args.rounds}), "
+              f"status {response.status_code}")
+        client.cookies.set("access_token", response.cookies["access_token"])
+
+        for label, size in (("cache off", 0), ("cache on", security.TOKEN_CACHE_SIZE)):
+            security.token_cache.maxsize = size
+            security.token_cache.entries.clear()
+            seconds, latencies = await timed_gets(client, args.requests, args.concurrency)
+            print(f"authenticated ({label}): {args.requests / seconds:.0f} req/s, "
+                  f"p50 {percentile(latencies, 0.5) * 1000:.2f} ms, p99 {percentile(latencies, 0.99) * 1000:.2f} ms")
+
+        async def login():
+            await client.post("/login", data={"username": USERNAME, "password": PASSWORD})
+
+        storm = asyncio.gather(*(login() for _ in range(args.logins)))
+        await asyncio.sleep(0)
+        began = time.perf_counter()
+        _, latencies = await timed_gets(client, args.requests // 4, args.concurrency)
+        during = time.perf_counter() - began
+        await storm
+        storm_seconds = time.perf_counter() - began
+        print(f"login storm ({args.logins} logins, {'read pool' if args.legacy_bcrypt else 'bcrypt pool'}): "
+              f"logins done in {storm_seconds:.2f}s; /dashboard/stats meanwhile p50 "
+              f"{percentile(latencies, 0.5) * 1000:.1f} ms, p99 {percentile(latencies, 0.99) * 1000:.1f} ms, "
+              f"max {max(latencies, default=0) * 1000:.1f} ms ({len(latencies)} in {during:.2f}s)")
+
+
+def main():
+    args = parse_args()
+    args.targets, args.chat_per_minute, args.global_rate = 1, 1200, 30
+    configure(args)
+    os.environ["BCRYPT_ROUNDS"] = str(args.rounds)
+    os.chdir(ROOT)  # Jinja shablonlari nisbiy yo'l bilan yuklanadi
+    from models import db, initialize_db, User
+    import stats
+    with tempfile.TemporaryDirectory() as tmp:
+        db.init(os.path.join(tmp, "bench.db"), pragmas=db._pragmas)
+        initialize_db()
+        User.create_user(USERNAME, PASSWORD, is_admin=True)
+        stats.reconcile()
+        asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Local stand-in for the Telegram Bot API, for benchmarks.
+
+Point an aiogram Bot at it with:
+
+    api = FakeBotAPI(latency=0.05)
+    base_url = await api.start()
+    bot = Bot(token="123456:TEST", server=TelegramAPIServer.from_base(base_url))
+
+It answers the methods the bot uses (sendMediaGroup, forwardMessage, copyMessage(s),
+forwardMessages, sendMessage, deleteMessages, getMe, setMyCommands) after a simulated
+latency. It can also reply 429 with retry_after, either when a chat exceeds
+`flood_limit` messages per `flood_window` seconds or at random with `error_rate`.
+"""
+import asyncio
+import itertools
+import json
+import random
+import time
+from collections import Counter, defaultdict, deque
+
+from aiohttp import web
+
+
+class FakeBotAPI:
+    def __init__(self, latency: float = 0.05, jitter: float = 0.02, flood_limit: int = 30,
+                 flood_window: float = 1.0, retry_after: int = 1, error_rate: float = 0.0, seed: int = 1):
+        self.latency = latency
+        self.jitter = jitter
+        self.flood_limit = flood_limit
+        self.flood_window = flood_window
+        self.retry_after = retry_after
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.message_ids = itertools.count(1)
+        self.sent = defaultdict(deque)  # chat_id -> yuborilgan xabarlar vaqtlari
+        self.calls = Counter()          # method -> so'rovlar soni
+        self.messages = Counter()       # method -> yaratilgan xabarlar soni
+        self.too_many_requests = 0
+        self.runner = None
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        app = web.Application()
+        app.router.add_post("/bot{token}/{method}", self.handle)
+        self.runner = web.AppRunner(app, access_log=None)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, host, port)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        return f"http://{host}:{port}"
+
+    async def stop(self):
+        if self.runner is not None:
+            await self.runner.cleanup()
+
+    def _flooded(self, chat_id: str, count: int) -> bool:
+        now = time.monotonic()
+        window = self.sent[chat_id]
+        while window and now - window[0] > self.flood_window:
+            window.popleft()
+        if len(window) + count > self.flood_limit or self.random.random() < self.error_rate:
+            return True
+        window.extend([now] * count)
+        return False
+
+    def _message(self, chat_id) -> dict:
+        return {"message_id": next(self.message_ids), "date": int(time.time()),
+                "chat": {"id": int(chat_id), "type": "supergroup", "title": "bench"}}
+
+    async def handle(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"]
+        data = await request.post()
+        self.calls[method] += 1
+        await asyncio.sleep(max(0.0, self.latency + self.random.uniform(-self.jitter, self.jitter)))
+
+        chat_id = data.get("chat_id", "0")
+        if method == "sendMediaGroup":
+            count = len(json.loads(data["media"]))
+        elif method in ("forwardMessages", "copyMessages"):
+            count = len(json.loads(data["message_ids"]))
+        elif method in ("sendMessage", "forwardMessage", "copyMessage"):
+            count = 1
+        else:
+            count = 0
+
+        if count and self._flooded(chat_id, count):
+            self.too_many_requests += 1
+            return web.json_response({
+                "ok": False, "error_code": 429,
+                "description": f"Too Many Requests: retry after {self.retry_after}",
+                "parameters": {"retry_after": self.retry_after},
+            }, status=429)
+
+        self.messages[method] += count
+        if method == "sendMediaGroup":
+            result = [self._message(chat_id) for _ in range(count)]
+        elif method in ("forwardMessages", "copyMessages"):
+            result = [{"message_id": self._message(chat_id)["message_id"]} for _ in range(count)]
+        elif method == "copyMessage":
+            result = {"message_id": self._message(chat_id)["message_id"]}
+        elif count:
+            result = self._message(chat_id)
+        elif method == "getMe":
+            result = {"id": 123456, "is_bot": True, "first_name": "bench", "username": "bench_bot"}
+        else:
+            result = True
+        return web.json_response({"ok": True, "result": result})
@@ -0,0 +1,184 @@
+"""
+End-to-end replay against a local fake Bot API (benchmarks/fake_bot_api.py).
+
+    python benchmarks/forwarding_replay.py --listings 200 --albums 0.3 --targets 3 --latency 0.05
+
+1. ingest:  N synthetic source-group messages (singles and album parts) go through
+            handlers.handle_new_message -> media group assembler -> ingest buffer.
+2. forward: forwarding_task runs against an aiogram Bot pointed at the fake server
+            until one full queue cycle is delivered.
+
+Reports throughput of both phases, p50/p99 per-target send latency (including rate
+limiter waits and RetryAfter retries), 429s seen, and time spent in DB reads/writes.
+Config is passed through environment variables, so the limits under test are the real ones.
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+SOURCE_GROUP = -1001000000100
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--listings", type=int, default=200)
+    parser.add_argument("--albums", type=float, default=0.3, help="share of listings posted as albums")
+    parser.add_argument("--targets", type=int, default=3)
+    parser.add_argument("--latency", type=float, default=0.05, help="fake API latency, seconds")
+    parser.add_argument("--jitter", type=float, default=0.02)
+    parser.add_argument("--flood-limit", type=int, default=30, help="fake API: messages per chat per window")
+    parser.add_argument("--flood-window", type=float, default=1.0)
+    parser.add_argument("--retry-after", type=int, default=1)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fake API: random 429 probability")
+    parser.add_argument("--chat-per-minute", type=float, default=1200, help="bot: CHAT_SEND_PER_MINUTE")
+    parser.add_argument("--global-rate", type=float, default=30, help="bot: GLOBAL_SEND_RATE")
+    parser.add_argument("--batch", type=int, default=1, help="bot: FORWARD_BATCH_SIZE (forwardMessages)")
+    return parser.parse_args()
+
+
+def configure(args):
+    """Bot config is read from the environment at import time, so set it before importing the bot."""
+    targets = [-1001000000200 - n for n in range(args.targets)]
+    os.environ.update({
+        "BOT_TOKEN": "123456:BENCHMARK",
+        "ADMIN_IDS": "1",
+        "SOURCE_GROUPS": str(SOURCE_GROUP),
+        "TARGET_GROUPS": ",".join(map(str, targets)),
+        "FORWARD_INTERVAL": "0",
+        "FORWARD_BATCH_SIZE": str(getattr(args, "batch", 1)),
+        "CHAT_SEND_PER_MINUTE": str(args.chat_per_minute),
+        "CHAT_SEND_BURST": "10",
+        "GLOBAL_SEND_RATE": str(args.global_rate),
+        "ROUTING_RULES": "",
+        "ROUTING_RULES_FILE": "",
+        "MEDIA_GROUP_MIN_QUIET": "0.05",
+        "MEDIA_GROUP_MAX_QUIET": "0.5",
+    })
+
+
+def synthetic_messages(count: int, album_share: float, seed: int = 1) -> list:
+    rng = random.Random(seed)
+    messages, message_id = [], 0
+    for n in range(count):
+        caption = (f"KV{10000 + n} {rng.randint(1, 5)} xonali uy, {rng.randint(1, 13)}-mavze, "
+                   f"narxi {rng.randint(20, 90)} 000$")
+        parts = rng.randint(2, 10) if rng.random() < album_share else 1
+        for part in range(parts):
+            message_id += 1
+            message = {
+                "message_id": message_id,
+                "date": int(time.time()),
+                "chat": {"id": SOURCE_GROUP, "type": "supergroup", "title": "source"},
+                "photo": [{"file_id": f"photo-{n}-{part}", "file_unique_id": f"u-{n}-{part}",
+                           "width": 1280, "height": 960}],
+            }
+            if parts > 1:
+                message["media_group_id"] = f"album-{n}"
+            if part == 0:
+                message["caption"] = caption
+            messages.append(message)
+    return messages
+
+
+def percentile(samples: list, q: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * (len(ordered) - 1) + 0.5))]
+
+
+def histogram_total(histogram) -> float:
+    return sum(child.sum for child in list(histogram.children.values()))
+
+
+async def run(args):
+    from aiogram import Bot, types
+    from aiogram.bot.api import TelegramAPIServer
+    from models import QueueCursor
+    import forwarding
+    import handlers
+    import metrics
+    import state
+    import storage
+    from ingest import ingest_buffer
+    from fake_bot_api import FakeBotAPI
+
+    api = FakeBotAPI(latency=args.latency, jitter=args.jitter, flood_limit=args.flood_limit,
+                     flood_window=args.flood_window, retry_after=args.retry_after, error_rate=args.error_rate)
+    base_url = await api.start()
+    bot = Bot(token=os.environ["BOT_TOKEN"], server=TelegramAPIServer.from_base(base_url))
+
+    # ----- ingest -----
+    raw = synthetic_messages(args.listings, args.albums)
+    start = time.perf_counter()
+    # Polling dispatches the updates of one getUpdates batch concurrently, so do the same here.
+    await asyncio.gather(*(handlers.handle_new_message(types.Message.to_object(data)) for data in raw))
+    while handlers.media_group_assembler.groups or handlers.media_group_assembler.tasks:
+        await asyncio.sleep(0.01)
+    await ingest_buffer.drain()
+    ingest_seconds = time.perf_counter() - start
+    db_after_ingest = histogram_total(metrics.DB_READ_SECONDS) + histogram_total(metrics.DB_WRITE_SECONDS)
+
+    # ----- forward -----
+    latencies = []
+    send_to_target = forwarding.send_to_target
+
+    async def timed_send(*send_args, **send_kwargs):
+        began = time.perf_counter()
+        try:
+            return await send_to_target(*send_args, **send_kwargs)
+        finally:
+            latencies.append(time.perf_counter() - began)
+
+    forwarding.send_to_target = timed_send
+    state.set_sending(True)
+    start = time.perf_counter()
+    task = asyncio.create_task(forwarding.forwarding_task(bot))
+    while True:
+        await asyncio.sleep(0.05)
+        cursor = await storage.read(QueueCursor.get_or_none, QueueCursor.name == "forwarding")
+        if (cursor is not None and cursor.cycle >= 1) or task.done():
+            break
+    forward_seconds = time.perf_counter() - start
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+    await storage.write(lambda: None)  # yozuvchi navbatini bo'shatish (loop yopilishidan oldin)
+    forwarding.send_to_target = send_to_target
+    db_total = histogram_total(metrics.DB_READ_SECONDS) + histogram_total(metrics.DB_WRITE_SECONDS)
+
+    await (await bot.get_session()).close()
+    await api.stop()
+
+    print(f"ingest:  {len(raw)} messages -> {args.listings} listings in {ingest_seconds:.2f}s "
+          f"({len(raw) / ingest_seconds:.0f} msg/s), DB time {db_after_ingest:.2f}s")
+    print(f"forward: {args.listings} listings x {args.targets} targets in {forward_seconds:.2f}s "
+          f"({args.listings / forward_seconds:.1f} listings/s, {len(latencies) / forward_seconds:.1f} sends/s)")
+    print(f"  send latency p50 {percentile(latencies, 0.5) * 1000:.0f} ms, "
+          f"p99 {percentile(latencies, 0.99) * 1000:.0f} ms, max {max(latencies, default=0) * 1000:.0f} ms")
+    print(f"  API calls {dict(api.calls)}")
+    print(f"  messages created {sum(api.messages.values())}, 429 responses {api.too_many_requests}")
+    print(f"  DB time during forwarding {db_total - db_after_ingest:.2f}s")
+
+
+def main():
+    args = parse_args()
+    configure(args)
+    from models import db, initialize_db
+    import stats
+    with tempfile.TemporaryDirectory() as tmp:
+        db.init(os.path.join(tmp, "bench.db"), pragmas=db._pragmas)
+        initialize_db()
+        stats.reconcile()
+        asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Replay a synthetic source-group message stream through the ingest path.
+
+    python benchmarks/ingest_replay.py --messages 5000 --duplicates 0.2
+
+Modes (each starts from an empty temporary database):
+  sequential  one write transaction per post, awaited one by one (old behaviour)
+  buffered    IngestBuffer: batched upserts every --batch items or --flush-ms
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models import db, initialize_db, HouseListing, QueueItem  # noqa: E402
+import ingest  # noqa: E402
+import storage  # noqa: E402
+
+SOURCE_GROUP = -100123
+
+
+def synthetic_stream(count: int, duplicates: float, seed: int = 1) -> list:
+    rng = random.Random(seed)
+    seen, rows = [], []
+    for n in range(count):
+        if seen and rng.random() < duplicates:
+            post_id = rng.choice(seen)  # repost: same KV id, new media and caption
+        else:
+            post_id = 10000 + n
+            seen.append(post_id)
+        parts = rng.choice([1, 1, 1, 3, 5, 10])
+        media = [{"type": "photo", "file_id": f"file-{n}-{i}"} for i in range(parts)]
+        rows.append({
+            "post_id": post_id,
+            "post_url": f"https://t.me/c/123/{n}",
+            "source_message_id": n,
+            "status": "active",
+            "boost_status": "unboosted",
+            "source_group_id": SOURCE_GROUP,
+            "media_group_id": f"group-{n}" if parts > 1 else None,
+            "media_group_data": json.dumps(media),
+            "caption": f"KV{post_id} {rng.randint(1, 5)} xonali uy, narxi {rng.randint(20, 90)}000$",
+        })
+    return rows
+
+
+async def run_sequential(rows: list):
+    for fields in rows:
+        await storage.write(ingest.store_listings, [fields])
+
+
+async def run_buffered(rows: list, batch: int, flush_ms: float):
+    buffer = ingest.IngestBuffer(batch_size=batch, flush_ms=flush_ms)
+    await asyncio.gather(*(buffer.submit(**fields) for fields in rows))
+
+
+def reset():
+    QueueItem.delete().execute()
+    HouseListing.delete().execute()
+
+
+async def bench(mode: str, rows: list, args) -> dict:
+    await storage.write(reset)
+    start = time.perf_counter()
+    if mode == "sequential":
+        await run_sequential(rows)
+    else:
+        await run_buffered(rows, args.batch, args.flush_ms)
+    elapsed = time.perf_counter() - start
+    listings = await storage.read(HouseListing.select().count)
+    queued = await storage.read(QueueItem.select().count)
+    return {"mode": mode, "seconds": elapsed, "per_second": len(rows) / elapsed,
+            "listings": listings, "queued": queued}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=5000)
+    parser.add_argument("--duplicates", type=float, default=0.2, help="share of reposted KV ids")
+    parser.add_argument("--batch", type=int, default=200)
+    parser.add_argument("--flush-ms", type=float, default=50)
+    parser.add_argument("--modes", default="sequential,buffered")
+    args = parser.parse_args()
+
+    rows = synthetic_stream(args.messages, args.duplicates)
+    unique = len({row["post_id"] for row in rows})
+    print(f"{len(rows)} messages, {unique} unique listings")
+    with tempfile.TemporaryDirectory() as tmp:
+        db.init(os.path.join(tmp, "bench.db"), pragmas=db._pragmas)
+        initialize_db()
+        for mode in args.modes.split(","):
+            result = asyncio.run(bench(mode, rows, args))
+            print(f"{result['mode']:>10}: {result['seconds']:.2f}s  {result['per_second']:.0f} msg/s  "
+                  f"listings={result['listings']} queued={result['queued']}")
+
+
+if __name__ == "__main__":
+    main()
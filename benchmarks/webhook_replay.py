@@ -0,0 +1,118 @@
+"""
+POST Telegram updates at the webhook endpoint of the FastAPI app (in-process, no network).
+
+    python benchmarks/webhook_replay.py --listings 500 --albums 0.3 --concurrency 40
+    python benchmarks/webhook_replay.py --file recorded_updates.jsonl
+
+Updates are synthetic source-group posts (as in forwarding_replay.py) or, with --file,
+recorded updates, one JSON object per line. They are sent with up to --concurrency requests
+in flight, like Telegram's max_connections. Reports webhook acknowledgement latency,
+time until every update is handled and stored, and listings/albums that came out of it.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from forwarding_replay import configure, synthetic_messages, percentile  # noqa: E402
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--listings", type=int, default=500)
+    parser.add_argument("--albums", type=float, default=0.3, help="share of listings posted as albums")
+    parser.add_argument("--file", default="", help="recorded updates, JSON lines")
+    parser.add_argument("--concurrency", type=int, default=40, help="webhook requests in flight")
+    parser.add_argument("--workers", type=int, default=8, help="UPDATE_WORKERS")
+    parser.add_argument("--latency", type=float, default=0.05, help="fake API latency, seconds")
+    return parser.parse_args()
+
+
+def load_updates(args) -> list:
+    if args.file:
+        with open(args.file, encoding="utf-8") as f:
+            return [json.loads(line) for line in f if line.strip()]
+    messages = synthetic_messages(args.listings, args.albums)
+    for message in messages:
+        message["from"] = {"id": 42, "is_bot": False, "first_name": "poster"}  # real updates always carry it
+    return [{"update_id": n, "message": message} for n, message in enumerate(messages, 1)]
+
+
+async def run(args, raw: list):
+    import httpx
+    from aiogram import Bot, Dispatcher
+    from aiogram.bot.api import TelegramAPIServer
+    from models import HouseListing
+    import handlers
+    import main
+    import storage
+    import updates
+    from ingest import ingest_buffer
+    from fake_bot_api import FakeBotAPI
+
+    api = FakeBotAPI(latency=args.latency)
+    bot = Bot(token=os.environ["BOT_TOKEN"], server=TelegramAPIServer.from_base(await api.start()))
+    dp = Dispatcher(bot)
+    handlers.register_handlers(dp)
+    dispatcher = updates.start(dp)
+
+    acks, statuses = [], {}
+    semaphore = asyncio.Semaphore(args.concurrency)
+    headers = {"X-Telegram-Bot-Api-Secret-Token": os.environ["WEBHOOK_SECRET"]}
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def post(update):
+            async with semaphore:
+                began = time.perf_counter()
+                response = await client.post(os.environ["WEBHOOK_PATH"], json=update, headers=headers)
+                acks.append(time.perf_counter() - began)
+                statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(post(update) for update in raw))
+        acked = time.perf_counter() - start
+        await dispatcher.join()
+        while handlers.media_group_assembler.groups or handlers.media_group_assembler.tasks:
+            await asyncio.sleep(0.01)
+        await ingest_buffer.drain()
+        handled = time.perf_counter() - start
+
+    await dispatcher.stop()
+    stored = await storage.read(HouseListing.select().count)
+    await (await bot.get_session()).close()
+    await api.stop()
+
+    print(f"webhook: {len(raw)} updates acknowledged in {acked:.2f}s ({len(raw) / acked:.0f} updates/s), "
+          f"statuses {statuses}")
+    print(f"  ack latency p50 {percentile(acks, 0.5) * 1000:.1f} ms, p99 {percentile(acks, 0.99) * 1000:.1f} ms")
+    print(f"  all handled and stored in {handled:.2f}s with {args.workers} workers -> {stored} listings, "
+          f"{handlers.media_group_assembler.assembled} albums assembled, "
+          f"{handlers.media_group_assembler.expired} expired")
+
+
+def main():
+    args = parse_args()
+    args.targets, args.chat_per_minute, args.global_rate = 1, 1200, 30
+    configure(args)
+    os.environ.update({"UPDATE_MODE": "webhook", "WEBHOOK_PATH": "/telegram/webhook", "WEBHOOK_SECRET": "bench-secret",
+                       "UPDATE_WORKERS": str(args.workers)})
+    os.chdir(ROOT)  # Jinja shablonlari nisbiy yo'l bilan yuklanadi
+    from models import db, initialize_db
+    import stats
+    raw = load_updates(args)
+    with tempfile.TemporaryDirectory() as tmp:
+        db.init(os.path.join(tmp, "bench.db"), pragmas=db._pragmas)
+        initialize_db()
+        stats.reconcile()
+        asyncio.run(run(args, raw))
+
+
+if __name__ == "__main__":
+    main()
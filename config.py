@@ -12,4 +12,122 @@ TARGET_GROUPS = [int(x) for x in os.getenv("TARGET_GROUPS", "").split(',') if x.
 
 # Forwarding parametrlar
 FORWARD_INTERVAL = int(os.getenv("FORWARD_INTERVAL", "30"))
-BOOST_EVERY_N = int(os.getenv("BOOST_EVERY_N", "5"))
\ No newline at end of file
+# Yuborish tezligi: soatiga e'lonlar soni (0 = cheklovsiz). Standart — FORWARD_INTERVAL ga mos.
+POSTS_PER_HOUR = float(os.getenv("POSTS_PER_HOUR", str(3600 / FORWARD_INTERVAL if FORWARD_INTERVAL > 0 else 0)))
+# Tinch soatlar: bu oraliqda yuborilmaydi, masalan "23:00-07:00" (bo'sh = o'chirilgan)
+QUIET_HOURS = os.getenv("QUIET_HOURS", "")
+TIMEZONE = os.getenv("TIMEZONE", "Asia/Tashkent")
+# Ketma-ket bitta xabarli e'lonlar (bitta manba guruhdan) har kanalga bitta forwardMessages so'rovida
+# yuboriladi (1 = o'chirilgan, Bot API chegarasi 100, CHAT_SEND_BURST dan oshmaydi). To'plam shuncha slotni egallaydi.
+FORWARD_BATCH_SIZE = min(100, max(1, int(os.getenv("FORWARD_BATCH_SIZE", "1"))))
+BOOST_EVERY_N = int(os.getenv("BOOST_EVERY_N", "5"))
+# Scheduler og'irliklari: standart holatda har BOOST_EVERY_N oddiy e'londan keyin 1 ta boost e'lon
+REGULAR_WEIGHT = int(os.getenv("REGULAR_WEIGHT", str(BOOST_EVERY_N)))
+BOOST_WEIGHT = int(os.getenv("BOOST_WEIGHT", "1"))
+
+# Telegram yuborish limitlari (token-bucket rate limiter uchun)
+GLOBAL_SEND_RATE = float(os.getenv("GLOBAL_SEND_RATE", "25"))  # bot bo'yicha, xabar/soniya
+CHAT_SEND_PER_MINUTE = float(os.getenv("CHAT_SEND_PER_MINUTE", "20"))  # har bir kanal/guruh uchun, xabar/daqiqa
+CHAT_SEND_BURST = int(os.getenv("CHAT_SEND_BURST", "10"))  # bitta albom (10 ta media) sig'ishi uchun
+
+# Ma'lumotlar bazasi oqimlari (storage.py)
+DB_READ_WORKERS = int(os.getenv("DB_READ_WORKERS", "4"))
+DB_WRITE_BATCH = int(os.getenv("DB_WRITE_BATCH", "100"))  # bitta tranzaksiyadagi maksimal yozuvlar
+
+# Statistika hisoblagichlarini bazadagi qiymatlar bilan solishtirish oralig'i (soniya)
+STATS_RECONCILE_INTERVAL = int(os.getenv("STATS_RECONCILE_INTERVAL", "300"))
+
+# Albom qismlarini yig'ish: oxirgi qismdan keyin kutish oralig'i (moslashuvchan) va maksimal yashash vaqti
+MEDIA_GROUP_MIN_QUIET = float(os.getenv("MEDIA_GROUP_MIN_QUIET", "1"))
+MEDIA_GROUP_MAX_QUIET = float(os.getenv("MEDIA_GROUP_MAX_QUIET", "2"))
+MEDIA_GROUP_TTL = float(os.getenv("MEDIA_GROUP_TTL", "30"))
+
+# Yangi e'lonlarni saqlash: har INGEST_BATCH_SIZE ta yoki INGEST_FLUSH_MS millisoniyada bitta tranzaksiya
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "200"))
+INGEST_FLUSH_MS = float(os.getenv("INGEST_FLUSH_MS", "50"))
+# Mavjud e'lonlarga xonalar/narx/hudud ustunlarini to'ldirish: bitta tranzaksiyadagi e'lonlar soni
+BACKFILL_BATCH = int(os.getenv("BACKFILL_BATCH", "500"))
+
+# E'lonlarni kanallarga yo'naltirish qoidalari (routing.py). ROUTING_RULES — JSON ro'yxat,
+# bo'lmasa ROUTING_RULES_FILE fayli o'qiladi; qoidalar yo'q bo'lsa barcha TARGET_GROUPS ga yuboriladi.
+ROUTING_RULES = os.getenv("ROUTING_RULES", "")
+ROUTING_RULES_FILE = os.getenv("ROUTING_RULES_FILE", "routing_rules.json")
+ROUTING_FALLBACK = os.getenv("ROUTING_FALLBACK", "all")  # hech bir qoida mos kelmasa: all (TARGET_GROUPS) yoki none
+
+# /metrics (Prometheus) uchun ixtiyoriy token: berilsa "Authorization: Bearer <token>" talab qilinadi
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+
+# Jarayonlar: "python main.py web" (FastAPI, WEB_WORKERS ta worker) va "python main.py bot"
+# (polling + forwarding) alohida ishga tushirilishi mumkin; argumentsiz — ikkalasi bitta jarayonda.
+WEB_HOST = os.getenv("WEB_HOST", "0.0.0.0")
+WEB_PORT = int(os.getenv("WEB_PORT", "8000"))
+WEB_WORKERS = int(os.getenv("WEB_WORKERS", "2"))
+BOT_METRICS_PORT = int(os.getenv("BOT_METRICS_PORT", "9101"))  # bot jarayoni /metrics (va webhook) porti (0 = o'chirilgan)
+# Veb panel amallari navbati (jobs.py): bot jarayoni uni har JOB_POLL_INTERVAL soniyada tekshiradi
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "0.5"))
+JOB_BATCH = int(os.getenv("JOB_BATCH", "50"))
+JOB_RETENTION_DAYS = int(os.getenv("JOB_RETENTION_DAYS", "7"))  # bajarilgan joblar shuncha kun saqlanadi
+# Xato bilan tugagan job qayta "pending" bo'ladi (RETRY_BASE_DELAY/RETRY_MAX_DELAY bo'yicha kutib),
+# JOB_MAX_ATTEMPTS urinishdan keyin "dead" holatiga o'tadi va panel statistikasida ko'rinadi.
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "6"))
+
+# Yangilanishlarni olish: polling (standart) yoki webhook. Webhook FastAPI ilovasida WEBHOOK_PATH da
+# (main.py bot rejimida — BOT_METRICS_PORT dagi serverda) qabul qilinadi; WEBHOOK_URL — tashqi manzil
+# (bo'sh bo'lsa setWebhook chaqirilmaydi, masalan lokal test uchun).
+UPDATE_MODE = os.getenv("UPDATE_MODE", "polling")
+WEBHOOK_URL = os.getenv("WEBHOOK_URL", "")
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/telegram/webhook")
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "")  # X-Telegram-Bot-Api-Secret-Token (webhook rejimida majburiy)
+UPDATE_WORKERS = int(os.getenv("UPDATE_WORKERS", "8"))  # yangilanishlarni qayta ishlovchi workerlar (chat bo'yicha)
+UPDATE_QUEUE_SIZE = int(os.getenv("UPDATE_QUEUE_SIZE", "1000"))  # har bir worker navbati hajmi
+
+# Kanallardagi eski nusxalarni tozalash: har kanalda oxirgi KEEP_COPIES_PER_CHAT ta e'lon nusxasi qoladi
+# (0 = tozalanmaydi). Har DELIVERY_CLEANUP_INTERVAL soniyada, bir kanaldan ko'pi bilan DELIVERY_CLEANUP_BATCH ta nusxa.
+KEEP_COPIES_PER_CHAT = int(os.getenv("KEEP_COPIES_PER_CHAT", "0"))
+DELIVERY_CLEANUP_INTERVAL = int(os.getenv("DELIVERY_CLEANUP_INTERVAL", "3600"))
+DELIVERY_CLEANUP_BATCH = int(os.getenv("DELIVERY_CLEANUP_BATCH", "500"))
+
+# Yuborilmagan e'lonlarni qayta yuborish (retries.py): eksponensial kutish (RETRY_BASE_DELAY * 2^n,
+# RETRY_MAX_DELAY gacha, ±50% jitter), RETRY_MAX_ATTEMPTS dan keyin dead-letter ro'yxatiga o'tadi.
+RETRY_BASE_DELAY = float(os.getenv("RETRY_BASE_DELAY", "30"))
+RETRY_MAX_DELAY = float(os.getenv("RETRY_MAX_DELAY", "3600"))
+RETRY_MAX_ATTEMPTS = int(os.getenv("RETRY_MAX_ATTEMPTS", "8"))
+RETRY_POLL_INTERVAL = float(os.getenv("RETRY_POLL_INTERVAL", "10"))
+# Circuit breaker: kanalga ketma-ket CIRCUIT_FAILURES ta xatodan keyin u CIRCUIT_COOLDOWN soniyaga to'xtatiladi
+CIRCUIT_FAILURES = int(os.getenv("CIRCUIT_FAILURES", "5"))
+CIRCUIT_COOLDOWN = float(os.getenv("CIRCUIT_COOLDOWN", "300"))
+# Adminga xatolar haqida har ALERT_DIGEST_INTERVAL soniyada bitta umumiy xabar
+ALERT_DIGEST_INTERVAL = float(os.getenv("ALERT_DIGEST_INTERVAL", "300"))
+
+# Veb panel autentifikatsiyasi: token -> foydalanuvchi keshi (LRU, TOKEN_CACHE_TTL soniya; 0 = o'chirilgan)
+# va bcrypt uchun alohida oqimlar (event loop va DB o'qish pulini band qilmaydi)
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "1024"))
+TOKEN_CACHE_TTL = float(os.getenv("TOKEN_CACHE_TTL", "30"))
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))  # o'zgartirilsa, eski parollar kirishda qayta hashlanadi
+
+# Veb panelga jonli yangilanishlar (live.py, /dashboard/events SSE): har veb jarayonda bitta kuzatuvchi
+# har LIVE_POLL_INTERVAL soniyada bazadagi o'zgarishlarni o'qib, barcha ochiq panellarga bir xil delta yuboradi.
+LIVE_POLL_INTERVAL = float(os.getenv("LIVE_POLL_INTERVAL", "2"))
+LIVE_HEARTBEAT = float(os.getenv("LIVE_HEARTBEAT", "15"))  # proksilar ulanishni uzmasligi uchun
+LIVE_QUEUE_SIZE = int(os.getenv("LIVE_QUEUE_SIZE", "100"))  # sekin mijoz navbati to'lsa, u uziladi va qayta ulanadi
+LIVE_BATCH = int(os.getenv("LIVE_BATCH", "200"))  # bir tekshiruvda o'qiladigan o'zgargan e'lonlar
+LIVE_STATS_INTERVAL = float(os.getenv("LIVE_STATS_INTERVAL", "10"))  # alohida veb jarayonda statistikani qayta sanash
+
+# Albom e'lonlari uchun tayyor payload keshi (LRU) hajmi
+MEDIA_CACHE_SIZE = int(os.getenv("MEDIA_CACHE_SIZE", "5000"))
+
+# Har bir e'lon matni oxiriga qo'shiladigan kanal havolalari
+CHANNEL_LINKS_FOOTER = """\n\nhttps://t.me/navoiy_1x_uylar
+https://t.me/navoiy_1_2x_uylar
+https://t.me/navoiy_2x_uylar
+https://t.me/navoiy_2_3x_uylar
+https://t.me/navoiy_3x_uylar
+https://t.me/navoiy_3_4x_uylar
+https://t.me/navoiy_4x_uylar
+https://t.me/navoiy_4_5x_uylar
+https://t.me/navoiy_5x_uylar
+https://t.me/navoiy_reklama_uylar
+https://t.me/navoiy_hovli_kottedj
+https://t.me/navoiy_ijaragaa_uylar
+https://t.me/navoiy_karopka_uylar\n\nhttps://taplink.cc/rieltor24"""
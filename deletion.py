@@ -0,0 +1,101 @@
+import asyncio
+import json
+import logging
+from aiogram import Bot
+from models import HouseListing
+from ratelimit import limiter
+from metrics import DELETED_MESSAGES, DELETE_BATCH_SECONDS
+from config import KEEP_COPIES_PER_CHAT, DELIVERY_CLEANUP_INTERVAL, DELIVERY_CLEANUP_BATCH
+import deliveries
+import storage
+
+# Bot API deleteMessages bitta so'rovda 100 tagacha xabarni o'chiradi.
+DELETE_BATCH = 100
+
+async def delete_chat_messages(bot: Bot, chat_id: int, message_ids: list):
+    """Delete message ids from one chat in deleteMessages batches, under that chat's rate limit."""
+    for start in range(0, len(message_ids), DELETE_BATCH):
+        chunk = message_ids[start:start + DELETE_BATCH]
+        try:
+            with DELETE_BATCH_SECONDS.time():
+                await limiter.call(
+                    chat_id,
+                    lambda: bot.request("deleteMessages", {"chat_id": chat_id, "message_ids": json.dumps(chunk)}),
+                )
+        except Exception:
+            DELETED_MESSAGES.labels("error").inc(len(message_ids) - start)
+            raise
+        DELETED_MESSAGES.labels("ok").inc(len(chunk))
+
+async def delete_messages(bot: Bot, messages: dict) -> dict:
+    """
+    Delete {chat_id: [message_id, ...]} with all chats in parallel.
+    Returns {chat_id: error} for the chats that failed (empty dict = everything deleted).
+    """
+    chats = [(chat_id, ids) for chat_id, ids in messages.items() if ids]
+    results = await asyncio.gather(
+        *(delete_chat_messages(bot, chat_id, ids) for chat_id, ids in chats),
+        return_exceptions=True,
+    )
+    failures = {}
+    for (chat_id, ids), result in zip(chats, results):
+        if isinstance(result, Exception):
+            logging.error(f"❌ Guruh {chat_id} dan {len(ids)} ta xabarni o'chirishda xato: {result}")
+            failures[chat_id] = result
+    return failures
+
+async def delete_and_forget(bot: Bot, messages: dict) -> dict:
+    """
+    delete_messages() that also drops the ledger rows, but only for chats where the
+    deletion succeeded: copies that are still there stay findable and can be retried.
+    """
+    failures = await delete_messages(bot, messages)
+    deleted = {chat_id: ids for chat_id, ids in messages.items() if ids and chat_id not in failures}
+    if deleted:
+        await storage.write(deliveries.forget_messages, deleted)
+    return failures
+
+def purge_listing(listing_id: int):
+    """
+    Remove a soft-deleted listing with its ledger rows (writer thread), once its copies are gone.
+    Returns its boost_status, or None if it no longer exists or was restored meanwhile.
+    """
+    listing = HouseListing.get_or_none(HouseListing.id == listing_id)
+    if listing is None or listing.status != "deleted":
+        return None
+    listing.delete_instance(recursive=True)
+    return listing.boost_status
+
+def listing_messages(listing, include_source: bool = False) -> dict:
+    """All known copies of a listing (delivery ledger), optionally with the source message itself."""
+    messages = deliveries.copies(listing)
+    if include_source and listing.source_message_id:
+        messages.setdefault(listing.source_group_id, []).append(listing.source_message_id)
+    return messages
+
+async def cleanup_old_copies(bot: Bot, keep: int = KEEP_COPIES_PER_CHAT, batch: int = DELIVERY_CLEANUP_BATCH) -> int:
+    """
+    Delete copies beyond the latest `keep` in every target chat (at most `batch` copies
+    per chat per run). Ledger rows are dropped only for chats where deleteMessages succeeded.
+    """
+    removed = 0
+    for chat_id in await storage.read(deliveries.chats):
+        row_ids, message_ids = await storage.read(deliveries.stale, chat_id, keep, batch)
+        if not row_ids:
+            continue
+        failures = await delete_messages(bot, {chat_id: message_ids})
+        if chat_id not in failures:
+            removed += await storage.write(deliveries.remove, row_ids)
+    if removed:
+        logging.info(f"🧹 Kanallardagi eski nusxalar: {removed} ta xabar o'chirildi (har kanalda oxirgi {keep} ta qoladi).")
+    return removed
+
+async def cleanup_task(bot: Bot):
+    if KEEP_COPIES_PER_CHAT <= 0:
+        return
+    while True:
+        try:
+            await cleanup_old_copies(bot)
+        except Exception as e:
+            logging.error(f"❌ Eski nusxalarni tozalashda xato: {e}")
+        await asyncio.sleep(DELIVERY_CLEANUP_INTERVAL)
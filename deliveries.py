@@ -0,0 +1,89 @@
+"""
+Delivery ledger: one Delivery row per message the bot posted in a target chat.
+
+Indexed both ways, so "all copies of a listing" and "which listing owns message
+Y in chat Z" are index lookups. A copy is one (listing, cycle) in a chat; albums
+have one row per part.
+"""
+import datetime
+from typing import Optional
+from peewee import fn, Tuple
+from models import Delivery, HouseListing
+
+def record(listing_id: int, cycle: int, forwarded: dict):
+    """Store {target_chat_id: [message_id, ...]} sent for one listing in `cycle`."""
+    now = datetime.datetime.now()
+    rows = [{"listing": listing_id, "target_chat_id": int(chat_id), "message_id": message_id,
+             "sent_at": now, "cycle": cycle}
+            for chat_id, message_ids in forwarded.items() for message_id in message_ids]
+    if rows:
+        Delivery.insert_many(rows).on_conflict_ignore().execute()
+
+def record_batch(cycle: int, target: int, sent: dict):
+    """Store {listing_id: [message_id, ...]} sent to one target by a batched call."""
+    now = datetime.datetime.now()
+    rows = [{"listing": listing_id, "target_chat_id": target, "message_id": message_id,
+             "sent_at": now, "cycle": cycle}
+            for listing_id, message_ids in sent.items() for message_id in message_ids]
+    if rows:
+        Delivery.insert_many(rows).on_conflict_ignore().execute()
+
+def copies(listing: HouseListing) -> dict:
+    """Every known copy of a listing: {chat_id: [message_id, ...]}."""
+    messages = {}
+    query = (Delivery
+             .select(Delivery.target_chat_id, Delivery.message_id)
+             .where(Delivery.listing == listing.id)
+             .order_by(Delivery.id)
+             .tuples())
+    for chat_id, message_id in query:
+        messages.setdefault(chat_id, []).append(message_id)
+    return messages
+
+def owner(chat_id: int, message_id: int) -> Optional[HouseListing]:
+    """The listing a message in a target chat is a copy of."""
+    return (HouseListing
+            .select()
+            .join(Delivery)
+            .where((Delivery.target_chat_id == chat_id) & (Delivery.message_id == message_id))
+            .first())
+
+def forget_messages(messages: dict) -> int:
+    """Drop the rows of {chat_id: [message_id, ...]} (copies that were actually deleted)."""
+    pairs = [(int(chat_id), message_id) for chat_id, message_ids in messages.items() for message_id in message_ids]
+    removed = 0
+    for start in range(0, len(pairs), 100):
+        chunk = pairs[start:start + 100]
+        removed += (Delivery.delete()
+                    .where(Tuple(Delivery.target_chat_id, Delivery.message_id).in_(chunk))
+                    .execute())
+    return removed
+
+def chats() -> list:
+    return [row.target_chat_id for row in Delivery.select(Delivery.target_chat_id).distinct()]
+
+def stale(chat_id: int, keep: int, limit: int) -> tuple:
+    """
+    Copies in `chat_id` older than its latest `keep` (at most `limit` of them):
+    returns (delivery row ids, message ids).
+    """
+    old_copies = (Delivery
+                  .select(Delivery.listing, Delivery.cycle)
+                  .where(Delivery.target_chat_id == chat_id)
+                  .group_by(Delivery.listing, Delivery.cycle)
+                  .order_by(fn.MAX(Delivery.id).desc())
+                  .offset(keep)
+                  .limit(limit)
+                  .tuples())
+    pairs = list(old_copies)
+    if not pairs:
+        return [], []
+    rows = list(Delivery
+                .select(Delivery.id, Delivery.message_id)
+                .where((Delivery.target_chat_id == chat_id) &
+                       (Tuple(Delivery.listing, Delivery.cycle).in_(pairs)))
+                .tuples())
+    return [row_id for row_id, _ in rows], [message_id for _, message_id in rows]
+
+def remove(row_ids: list) -> int:
+    return Delivery.delete().where(Delivery.id.in_(row_ids)).execute() if row_ids else 0
@@ -0,0 +1,149 @@
+import re
+from typing import NamedTuple, Optional
+
+# E'lon matnidan ID (KV123 / КВ-0123 / ҚВ 123), xonalar soni, narx va hudud bitta o'tishda olinadi.
+# Matn avval kichik harflarga o'tkaziladi va kirill harflari lotinchaga transliteratsiya
+# qilinadi (str.translate), shuning uchun barcha naqshlar faqat lotin yozuvida.
+
+_CYRILLIC = {
+    "а": "a", "б": "b", "в": "v", "г": "g", "д": "d", "е": "e", "ё": "yo", "ж": "j",
+    "з": "z", "и": "i", "й": "y", "к": "k", "л": "l", "м": "m", "н": "n", "о": "o",
+    "п": "p", "р": "r", "с": "s", "т": "t", "у": "u", "ф": "f", "х": "x", "ц": "ts",
+    "ч": "ch", "ш": "sh", "щ": "sh", "ъ": "'", "ы": "i", "ь": "", "э": "e", "ю": "yu",
+    "я": "ya", "ў": "o'", "қ": "q", "ғ": "g'", "ҳ": "h",
+    # o'zbek lotin yozuvidagi apostrof variantlari
+    "ʻ": "'", "ʼ": "'", "‘": "'", "’": "'", "`": "'",
+}
+_FOLD = str.maketrans(_CYRILLIC)
+
+_NUMBER = r"\d{1,3}(?:[ .,']\d{3})+|\d+(?:[.,]\d+)?"
+_CURRENCY = r"\$|u\.?e\.?|y\.?e\.?|dollar\w*|so'?m\w*|sum\w*"
+
+_DISTRICTS = {
+    "karmana": "Karmana",
+    "zarafsh[ao]n": "Zarafshon",
+    "navbah?x?or": "Navbahor",
+    "q[iy]z[iy]l-?tepa|k[iy]z[iy]l-?tepa": "Qiziltepa",
+    "xatirchi|hatirchi": "Xatirchi",
+    "nurota|nurata": "Nurota",
+    "uchquduq|uchkuduk": "Uchquduq",
+    "konimex|kanimeh": "Konimex",
+    "tomdi|tamdi": "Tomdi",
+    "g'ozg'on|gozgon": "G'ozg'on",
+}
+
+# Dashboard filtri uchun ma'lum tumanlar/shaharlar (mavzelar "N-mavze" ko'rinishida saqlanadi)
+DISTRICTS = list(_DISTRICTS.values())
+
+_PATTERNS = {
+    "kv": r"\b[kq]v[\s:_#№.\-]*0*(?P<kv_id>\d+)\b",
+    "rooms": r"\b(?P<rooms>\d{1,2})[ \t]*-?[ \t]*(?:xonali|xona|x|komnat\w*)(?![\w'])",
+    "rooms_label": r"\b(?:xonalar\s+soni|xona|komnat\w*)\s*[:\-]\s*(?P<rooms_label>\d{1,2})\b",
+    "price_label": (r"\b(?:narx\w*|tsena|price)\s*[:\-]?\s*(?P<price_label>" + _NUMBER + r")\s*"
+                    r"(?P<price_label_mult>ming|min|mln|million)?\s*(?P<price_label_cur>" + _CURRENCY + r")?"),
+    "price_prefix": r"\$\s*(?P<price_prefix>" + _NUMBER + r")",
+    "price": (r"(?<![\w.,])(?P<price>" + _NUMBER + r")\s*(?P<price_mult>ming|min|mln|million)?\s*"
+              r"(?P<price_cur>" + _CURRENCY + r")"),
+    "mavze": r"\b(?P<mavze>\d{1,2})[ \t]*-?[ \t]*(?:mavze|mikrorayon|mkr)\b",
+    "mavze_label": r"\b(?:mavze|mikrorayon|mkr)\s*[:\-\s]\s*(?P<mavze_label>\d{1,2})\b",
+    "district": r"\b(?P<district>" + "|".join(f"(?:{name})" for name in _DISTRICTS) + r")",
+}
+
+# Har bir naqsh boshlanishi mumkin bo'lgan birinchi belgilar (qo'lda yozilgan; yangi naqsh yoki tuman
+# qo'shilganda shu yerga uning birinchi harfini ham qo'shing — tests/test_extraction.py buni tekshiradi):
+#   $ va raqamlar — narx, xonalar, mavze; k q — kv ID; x k — xona/komnat; n t p — narx/tsena/price;
+#   m — mavze/mikrorayon/mkr; k z n q x h t u g — tumanlar (hatirchi uchun h).
+# Lookahead qolgan pozitsiyalarni barcha alternativalarni sinab ko'rmasdan o'tkazib yuboradi.
+_FIRST_CHARS = r"$\dghkmnpqtuxz"
+
+
+def _combine(patterns: list) -> re.Pattern:
+    """All patterns as one precompiled alternation behind the first-character lookahead."""
+    return re.compile(f"(?=[{_FIRST_CHARS}])(?:" + "|".join(f"(?:{pattern})" for pattern in patterns) + ")")
+
+
+_combined = _combine(list(_PATTERNS.values()))
+_district_names = [(re.compile(f"(?:{name})$"), canonical) for name, canonical in _DISTRICTS.items()]
+_grouped_number = re.compile(r"\d{1,3}(?:[ .,']\d{3})+")
+_non_digit = re.compile(r"\D")
+_command_id = re.compile(r"^(?:(?:[kq]v|id|#)[\s:_#№.\-]*)?0*(\d+)$")  # ajratgich faqat prefiksdan keyin
+
+_MULTIPLIERS = {"ming": 1000, "min": 1000, "mln": 1000000, "million": 1000000}
+
+
+class ListingFields(NamedTuple):
+    post_id: Optional[int] = None
+    rooms: Optional[int] = None
+    price: Optional[int] = None
+    currency: Optional[str] = None  # USD yoki UZS
+    district: Optional[str] = None
+
+    def attributes(self) -> dict:
+        """HouseListing attribute columns (everything except post_id)."""
+        return {"rooms": self.rooms, "price": self.price, "currency": self.currency, "district": self.district}
+
+
+def fold(text: str) -> str:
+    """Lowercase and transliterate Cyrillic to Latin so one pattern set covers both scripts."""
+    return text.lower().translate(_FOLD)
+
+
+def _parse_number(raw: str) -> float:
+    if _grouped_number.fullmatch(raw):
+        return float(_non_digit.sub("", raw))
+    return float(raw.replace(",", "."))
+
+
+def _price(raw: str, multiplier: Optional[str], currency: Optional[str]):
+    value = int(_parse_number(raw) * _MULTIPLIERS.get(multiplier, 1))
+    if currency is None:
+        # Valyuta ko'rsatilmagan: uy narxlari odatda dollarda, katta summalar — so'mda.
+        currency = "UZS" if value >= 5000000 else "USD"
+    elif currency.startswith(("so", "su")):
+        currency = "UZS"
+    else:
+        currency = "USD"
+    return value, currency
+
+
+def extract(text: str) -> ListingFields:
+    """All structured fields from one pass of the combined pattern over the folded caption."""
+    post_id = rooms = price = currency = district = None
+    for match in _combined.finditer(fold(text or "")):
+        kind = match.lastgroup
+        if kind == "kv_id":
+            if post_id is None:
+                post_id = int(match.group("kv_id"))
+        elif kind in ("rooms", "rooms_label"):
+            if rooms is None:
+                rooms = int(match.group(kind))
+        elif kind in ("price_label", "price_label_mult", "price_label_cur"):
+            if price is None:
+                price, currency = _price(match.group("price_label"), match.group("price_label_mult"),
+                                         match.group("price_label_cur"))
+        elif kind == "price_prefix":
+            if price is None:
+                price, currency = _price(match.group("price_prefix"), None, "$")
+        elif kind in ("price_mult", "price_cur"):
+            if price is None:
+                price, currency = _price(match.group("price"), match.group("price_mult"), match.group("price_cur"))
+        elif kind in ("mavze", "mavze_label"):
+            if district is None:
+                district = f"{int(match.group(kind))}-mavze"
+        elif kind == "district":
+            if district is None:
+                name = match.group("district")
+                district = next(canonical for pattern, canonical in _district_names if pattern.match(name))
+        if None not in (post_id, rooms, price, district):
+            break
+    return ListingFields(post_id, rooms, price, currency, district)
+
+
+def extract_post_id(text: str) -> Optional[int]:
+    return extract(text).post_id
+
+
+def parse_command_id(arg: str) -> Optional[int]:
+    """`/boost` argument -> post_id: accepts 123, KV123, КВ-0123, ID 123, #123."""
+    match = _command_id.match(fold(arg.strip()))
+    return int(match.group(1)) if match else None
@@ -1,122 +1,288 @@
 import asyncio
-import logging
 import json
+import logging
 import datetime
+import time
 from models import HouseListing
-from config import TARGET_GROUPS, SOURCE_GROUPS, FORWARD_INTERVAL, BOOST_EVERY_N, ADMIN_IDS
+from config import (POSTS_PER_HOUR, QUIET_HOURS, TIMEZONE, REGULAR_WEIGHT, BOOST_WEIGHT,
+                    FORWARD_BATCH_SIZE, CHAT_SEND_BURST, RETRY_POLL_INTERVAL)
 from aiogram import Bot
-from aiogram.types import InputMediaPhoto, InputMediaVideo, InputMediaDocument
 import state
+from ratelimit import limiter
+import send_queue
+import deliveries
+import retries
+import storage
+import stats
+from scheduler import StrideScheduler, QuietHours, boosted
+from media_cache import payload_cache
+from routing import router
+from metrics import (FORWARD_SENDS, FORWARD_SEND_SECONDS, FORWARD_LISTING_SECONDS, FORWARD_BATCH_LISTINGS,
+                     DELIVERY_RETRIES)
+from deletion import delete_chat_messages
+
+async def send_to_target(bot: Bot, listing: HouseListing, target: int, input_media: list = None) -> list:
+    """Send one listing to one target chat through the rate limiter; returns the new message ids."""
+    label = str(target)
+    start = time.perf_counter()
+    try:
+        message_ids = await _send(bot, listing, target, input_media)
+    except Exception:
+        FORWARD_SENDS.labels(label, "error").inc()
+        raise
+    FORWARD_SENDS.labels(label, "ok").inc()
+    FORWARD_SEND_SECONDS.labels(label).observe(time.perf_counter() - start)
+    return message_ids
+
+async def _send(bot: Bot, listing: HouseListing, target: int, input_media: list = None) -> list:
+    if input_media:
+        messages = await limiter.call(
+            target,
+            lambda: bot.send_media_group(chat_id=target, media=input_media),
+            cost=len(input_media),
+        )
+        return [msg.message_id for msg in messages]
+    msg = await limiter.call(
+        target,
+        lambda: bot.forward_message(
+            chat_id=target,
+            from_chat_id=listing.source_group_id,
+            message_id=listing.source_message_id
+        ),
+    )
+    return [msg.message_id]
 
-async def forward_listing(bot: Bot, listing: HouseListing):
+async def forward_listing(bot: Bot, listing: HouseListing, targets: list = None, cycle: int = 0) -> dict:
     """
     If the listing is a media group, combine all media elements and send them;
     otherwise forward the single message.
-    A short delay is added for each target group.
+    Targets default to the routed chats for this listing (routing.py); they are sent to
+    concurrently and pacing is left to the per-chat rate limiter.
+    The new message ids are recorded in the delivery ledger under `cycle`; failed and
+    circuit-paused targets go to the retry queue (retries.py).
+    Returns {target: [message_id, ...]} for the targets that succeeded.
     """
+    if targets is None:
+        targets = router.targets(listing)
+    paused = [target for target in targets if not retries.breaker.allow(target)]
+    if paused:
+        await retries.deferred(listing, paused, cycle)
+        targets = [target for target in targets if target not in paused]
+    input_media = None
+    if listing.media_group_id and listing.media_group_data:
+        input_media = payload_cache.get(listing).media
+
+    with FORWARD_LISTING_SECONDS.time():
+        results = await asyncio.gather(
+            *(send_to_target(bot, listing, target, input_media) for target in targets),
+            return_exceptions=True,
+        )
+
     forwarded = {}
-    for target in TARGET_GROUPS:
+    for target, result in zip(targets, results):
+        if isinstance(result, Exception):
+            logging.error(f"🚫 Xato: E'lon {listing.post_id} ni {target} ga yuborishda: {result}")
+            await retries.failed(listing, target, cycle, result)  # admin hisobotga qo'shiladi
+        else:
+            retries.succeeded(target)
+            forwarded[target] = result
+    if forwarded:
+        await storage.write(deliveries.record, listing.id, cycle, forwarded)
+    return forwarded
+
+async def deliver_queue_item(bot: Bot, cursor, item):
+    """
+    Deliver one queue item to every target that has not acked it in this cycle,
+    then move the cursor past it.
+    """
+    listing = item.listing
+    done = await storage.read(send_queue.acked_targets, listing, cursor.cycle)
+    targets = [t for t in router.targets(listing) if t not in done]
+    await storage.write(send_queue.lease, listing, cursor.cycle, targets)
+    forwarded = await forward_listing(bot, listing, targets, cursor.cycle)
+    await storage.write(send_queue.ack, listing, cursor.cycle, list(forwarded))
+    await storage.write(send_queue.complete, cursor, item)
+    stats.status_changed(listing.status, "sent")
+
+class PartialBatch(Exception):
+    """forwardMessages skipped some messages, so the new ids cannot be matched to listings."""
+
+async def send_batch_to_target(bot: Bot, target: int, listings: list) -> dict:
+    """
+    Forward single-message listings from one source group to one target with a single
+    forwardMessages call; returns {listing_id: [message_id]}.
+    """
+    ordered = sorted(listings, key=lambda listing: listing.source_message_id)  # API talabi: o'sish tartibida
+    message_ids = [listing.source_message_id for listing in ordered]
+    label = str(target)
+    start = time.perf_counter()
+    try:
+        result = await limiter.call(
+            target,
+            lambda: bot.request("forwardMessages", {
+                "chat_id": target,
+                "from_chat_id": ordered[0].source_group_id,
+                "message_ids": json.dumps(message_ids),
+            }),
+            cost=len(message_ids),
+        )
+        new_ids = [message["message_id"] for message in result]
+        if len(new_ids) != len(message_ids):
+            # Qaysi xabar o'tkazib yuborilgani noma'lum: yuborilganlarini o'chirib, alohida yuboramiz.
+            if new_ids:
+                await delete_chat_messages(bot, target, new_ids)
+            raise PartialBatch(f"{len(new_ids)}/{len(message_ids)} ta xabar yuborildi")
+    except Exception:
+        FORWARD_SENDS.labels(label, "error").inc(len(listings))
+        raise
+    FORWARD_SENDS.labels(label, "ok").inc(len(listings))
+    FORWARD_SEND_SECONDS.labels(label).observe(time.perf_counter() - start)
+    return {listing.id: [new_id] for listing, new_id in zip(ordered, new_ids)}
+
+async def forward_batch(bot: Bot, target: int, listings: list, cycle: int) -> dict:
+    """Batched send to one target, falling back to one forward_listing per listing on any error."""
+    if len(listings) > 1 and not retries.breaker.blocked(target):
         try:
-            if listing.media_group_id and listing.media_group_data:
-                media_items = json.loads(listing.media_group_data)
-                input_media = []
-                for i, item in enumerate(media_items):
-                    if item["type"] == "photo":
-                        media = InputMediaPhoto(media=item["file_id"])
-                    elif item["type"] == "video":
-                        media = InputMediaVideo(media=item["file_id"])
-                    elif item["type"] == "document":
-                        # Make sure to import InputMediaDocument from aiogram.types at the top.
-                        from aiogram.types import InputMediaDocument
-                        media = InputMediaDocument(media=item["file_id"])
-                    else:
-                        continue
-                    # Add caption only to the first media item.
-                    if i == 0 and listing.caption:
-                        media.caption = listing.caption + """\n\nhttps://t.me/navoiy_1x_uylar
-https://t.me/navoiy_1_2x_uylar
-https://t.me/navoiy_2x_uylar
-https://t.me/navoiy_2_3x_uylar
-https://t.me/navoiy_3x_uylar
-https://t.me/navoiy_3_4x_uylar
-https://t.me/navoiy_4x_uylar
-https://t.me/navoiy_4_5x_uylar
-https://t.me/navoiy_5x_uylar
-https://t.me/navoiy_reklama_uylar
-https://t.me/navoiy_hovli_kottedj
-https://t.me/navoiy_ijaragaa_uylar
-https://t.me/navoiy_karopka_uylar\n\nhttps://taplink.cc/rieltor24"""
-                        media.parse_mode = "HTML"
-                    input_media.append(media)
-                messages = await bot.send_media_group(chat_id=target, media=input_media)
-                forwarded[str(target)] = [msg.message_id for msg in messages]
-            else:
-                msg = await bot.forward_message(
-                    chat_id=target,
-                    from_chat_id=listing.source_group_id,
-                    message_id=listing.source_message_id
-                )
-                forwarded[str(target)] = [msg.message_id]
+            sent = await send_batch_to_target(bot, target, listings)
+            retries.succeeded(target)
+            await storage.write(deliveries.record_batch, cycle, target, sent)
+            return sent
         except Exception as e:
-            logging.error(f"🚫 Xato: E'lon {listing.post_id} ni {target} ga yuborishda: {e}")
-            await bot.send_message(chat_id=ADMIN_IDS[0], text=f"🚫 Xato: E'lon {listing.post_id} ni {target} ga yuborishda: {e}")
-            # listing.status = "error"
-            # listing.error_details = str(e)
-            # listing.save()
-        await asyncio.sleep(1)
-    if forwarded:
-        listing.forwarded_message_ids = json.dumps(forwarded)
-        listing.save()
+            logging.warning(f"⚠️ {target} ga {len(listings)} ta e'lon bitta so'rovda yuborilmadi, "
+                            f"alohida yuboriladi: {e}")
+    sent = {}
+    for listing in listings:
+        forwarded = await forward_listing(bot, listing, [target], cycle)
+        if target in forwarded:
+            sent[listing.id] = forwarded[target]
+    return sent
+
+async def deliver_batch(bot: Bot, cursor, items: list):
+    """
+    deliver_queue_item() for a run of single-message listings (send_queue.peek_batch):
+    one forwardMessages call per target instead of one forwardMessage per listing and target.
+    """
+    listings = {item.listing.id: item.listing for item in items}
+    acked = await storage.read(send_queue.acked_targets_many, list(listings), cursor.cycle)
+    plan = {}  # target -> [listing, ...]
+    for listing in listings.values():
+        for target in router.targets(listing):
+            if target not in acked.get(listing.id, ()):
+                plan.setdefault(target, []).append(listing)
+    leases = {}
+    for target, group in plan.items():
+        for listing in group:
+            leases.setdefault(listing.id, []).append(target)
+    await storage.write(send_queue.lease_many, cursor.cycle, leases)
+    FORWARD_BATCH_LISTINGS.observe(len(items))
+
+    with FORWARD_LISTING_SECONDS.time():
+        results = await asyncio.gather(*(forward_batch(bot, target, group, cursor.cycle)
+                                         for target, group in plan.items()))
+    delivered = {}
+    for target, sent in zip(plan, results):
+        for listing_id in sent:
+            delivered.setdefault(listing_id, []).append(target)
+    await storage.write(send_queue.ack_many, cursor.cycle, delivered)
+    await storage.write(send_queue.complete_batch, cursor, items)
+    for listing in listings.values():
+        stats.status_changed(listing.status, "sent")
+
+async def retry_task(bot: Bot):
+    """Re-send due FailedDelivery rows; forward_listing reschedules the ones that fail again."""
+    while True:
+        await asyncio.sleep(RETRY_POLL_INTERVAL)
+        try:
+            if not state.SENDING_ENABLED:
+                continue
+            cycle = await storage.read(send_queue.current_cycle)
+            for row in await storage.read(retries.due):
+                listing, target = row.listing, row.target_chat_id
+                if retries.breaker.blocked(target):
+                    continue
+                if row.cycle < cycle or listing.status == "deleted":
+                    # Yangi siklda e'lon baribir qayta yuboriladi (yoki o'chirilgan).
+                    await storage.write(retries.resolve, row.id)
+                    DELIVERY_RETRIES.labels("expired").inc()
+                    continue
+                forwarded = await forward_listing(bot, listing, [target], row.cycle)
+                if target in forwarded:
+                    await storage.write(retries.resolve, row.id)
+                    await storage.write(send_queue.ack, listing, row.cycle, [target])
+                    DELIVERY_RETRIES.labels("ok").inc()
+        except Exception as e:
+            logging.error(f"❌ Qayta yuborishda xato: {e}")
 
 async def forwarding_task(bot: Bot):
-    counter = 0
+    # Slotlar soatiga POSTS_PER_HOUR ta: keyingi slot oldingi slot boshlanishidan hisoblanadi,
+    # shuning uchun yuborishga ketgan vaqt oraliqdan ayiriladi. /on, /off, /refresh esa
+    # state.wait_for_change() orqali kutishni darhol to'xtatadi.
+    interval = 3600 / POSTS_PER_HOUR if POSTS_PER_HOUR > 0 else 0.0
+    scheduler = StrideScheduler(interval)
+    scheduler.add_flow("regular", REGULAR_WEIGHT)
+    scheduler.add_flow("boosted", BOOST_WEIGHT)
+    quiet = QuietHours(QUIET_HOURS, TIMEZONE)
+    # To'plam kanal limiti chelagiga sig'ishi kerak, aks holda bitta so'rov limitni chetlab o'tadi.
+    batch_size = min(FORWARD_BATCH_SIZE, CHAT_SEND_BURST)
+    await storage.write(send_queue.sync)  # bazada bor, lekin navbatga qo'yilmagan e'lonlar
+    cursor = None
     while True:
         if state.REFRESH_REQUESTED:
             logging.info("🔄 /refresh buyrug'i qabul qilindi: Bazadagi o'zgarishlar yangilandi!")
             state.REFRESH_REQUESTED = False
-            await asyncio.sleep(1)
+            boosted.invalidate()
+            await storage.write(send_queue.sync)
             continue
 
         if not state.SENDING_ENABLED:
-            await asyncio.sleep(FORWARD_INTERVAL)
+            await state.wait_for_change()
+            continue
+
+        quiet_left = quiet.seconds_left()
+        if quiet_left:
+            logging.info(f"🌙 Tinch soatlar: yuborish {quiet_left / 60:.0f} daqiqadan keyin davom etadi.")
+            await state.wait_for_change(quiet_left)
+            continue
+
+        # Keyingi slot vaqtigacha kutish; buyruq kelsa holatni qaytadan tekshiramiz.
+        delay = scheduler.delay()
+        if delay and await state.wait_for_change(delay):
             continue
 
         try:
-            # Yangi e'lonlarni (status "active") yuborish
-            listings = []
-            for src in SOURCE_GROUPS:
-                listings.extend(list(HouseListing.select().where(
-                    (HouseListing.source_group_id == src) & (HouseListing.status == "active")
-                )))
-            listings.sort(key=lambda x: int(x.post_id))
-            
-            for listing in listings:
-                if not state.SENDING_ENABLED:
-                    break
-                
-                await forward_listing(bot, listing)
-                listing.status = "sent"
-                listing.save()
-                counter += 1
-                await asyncio.sleep(FORWARD_INTERVAL)  # Har bir e'lon yuborilganidan keyin kutish
-
-                # BOOSTED e'lonlarni yuborish har N tadan keyin
-                if counter % BOOST_EVERY_N == 0:
-                    boosted_listings = HouseListing.select().where(HouseListing.boost_status == "boosted")
-                    for boosted in boosted_listings:
-                        await forward_listing(bot, boosted)
-                        await asyncio.sleep(FORWARD_INTERVAL)  # BOOSTED e'lonlarni yuborishda ham kutish qo'shildi
-
-            # Agar aktiv post qolmasa, barcha "sent" postlarni qayta "active" qilamiz.
-            active_count = HouseListing.select().where(HouseListing.status == "active").count()
-            if active_count == 0:
-                sent_listings = HouseListing.select().where(HouseListing.status == "sent")
-                for listing in sent_listings:
-                    listing.status = "active"
-                    listing.save()
+            # Navbatdagi e'lonlarni kursor bo'yicha yuborish
+            if cursor is None:
+                cursor = await storage.write(send_queue.get_cursor)
+            item = await storage.read(send_queue.peek, cursor)
+            if item is None:
+                # Navbat oxiriga yetildi: kursorni boshiga qaytaramiz (navbat bo'sh bo'lsa, sikl o'zgarmaydi).
+                reset = await storage.write(send_queue.recycle, cursor)
+                stats.status_changed("sent", "active", reset)
+                await storage.write(send_queue.sync)
+                if await storage.read(send_queue.peek, cursor) is None:
+                    # Navbat bo'sh: yangi e'lonlar kelishini bir oraliq kutamiz.
+                    await state.wait_for_change(max(interval, 1.0))
+                continue
+
+            ready = ["regular", "boosted"] if await storage.read(boosted.has_any) else ["regular"]
+            flow = scheduler.pick(ready)
+            if flow == "boosted":
+                # BOOSTED e'lonlar oddiy e'lonlar orasiga og'irlik bo'yicha qo'shiladi
+                listing = await storage.read(boosted.next_listing)
+                if listing is not None:
+                    await forward_listing(bot, listing, cycle=cursor.cycle)
+                scheduler.slot_done()
+            else:
+                items = [item]
+                if batch_size > 1:
+                    items = await storage.read(send_queue.peek_batch, cursor, batch_size) or items
+                if len(items) > 1:
+                    await deliver_batch(bot, cursor, items)
+                else:
+                    await deliver_queue_item(bot, cursor, item)
+                scheduler.slot_done(len(items))
 
         except Exception as e:
             logging.error(f"❌ Xatolik: {e}")
-            await asyncio.sleep(FORWARD_INTERVAL)
-        
-        await asyncio.sleep(FORWARD_INTERVAL)  # Asosiy siklga ham kutish qo'shildi
\ No newline at end of file
+            cursor = None
+            await state.wait_for_change(max(interval, 1.0))
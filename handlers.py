@@ -1,4 +1,4 @@
-import re
+import datetime
 import logging
 import json
 from aiogram import types
@@ -6,39 +6,45 @@ from aiogram.dispatcher import Dispatcher
 from models import HouseListing
 from config import ADMIN_IDS, SOURCE_GROUPS
 import state
+import stats
+import storage
+from ingest import ingest_buffer
+from extraction import extract, parse_command_id
+from deletion import listing_messages, delete_and_forget
+import deliveries
+from media_group import MediaGroupAssembler, ALBUM_MAX_ITEMS
+from scheduler import invalidate_boosted
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
-import asyncio
 
-# E'lon ID larini aniqlash uchun regex
-id_regex = re.compile(r"(?i)\bKV[\s:_-]*0*(\d+)\b")
+def get_listing_by_id(post_id: int) -> HouseListing:
+    listing = HouseListing.select().where(HouseListing.post_id == int(post_id)).first()
+    if listing is None:
+        raise HouseListing.DoesNotExist
+    return listing
 
-media_group_cache = {}
-
-def get_listing_by_id(post_id: str) -> HouseListing:
-    candidates = HouseListing.select().where(HouseListing.post_id == str(post_id))
-    if candidates.exists():
-        return candidates.get()
-    raise HouseListing.DoesNotExist
-
-async def process_media_group(group_id: str, chat_id: int):
-    # Wait a short time to allow all parts of the group to arrive.
-    await asyncio.sleep(2)
-    messages = media_group_cache.pop(group_id, [])
-    if not messages:
-        return
+def merge_late_parts(chat_id: int, group_id: str, media_items: list):
+    """
+    Album parts that arrived after their album was already stored (runs on the DB writer thread):
+    append them to that listing. Returns its post_id, or None if no such album was stored recently.
+    """
+    recent = datetime.datetime.now() - datetime.timedelta(minutes=10)
+    listing = (HouseListing
+               .select()
+               .where((HouseListing.updated_at >= recent) &
+                      (HouseListing.source_group_id == chat_id) &
+                      (HouseListing.media_group_id == group_id))
+               .first())
+    if listing is None:
+        return None
+    media = json.loads(listing.media_group_data or "[]")
+    known = {item["file_id"] for item in media}
+    media.extend(item for item in media_items if item["file_id"] not in known)
+    listing.media_group_data = json.dumps(media[:ALBUM_MAX_ITEMS])
+    listing.save()
+    return listing.post_id
 
-    # Combine texts from all messages (if a caption or text exists).
-    combined_text = " ".join(m.caption or m.text or "" for m in messages)
-    match = id_regex.search(combined_text)
-    if not match:
-        logging.error(f"⚠️ Media guruh {group_id} ichida haqiqiy e'lon ID topilmadi. Saqlanmadi.")
-        return
-
-    extracted_id = str(int(match.group(1)))
-    try:
-        post_url = messages[0].url
-    except Exception:
-        post_url = ""
+async def process_media_group(group_id: str, chat_id: int, messages: list):
+    # Called by the assembler once the album is complete (quiet period or 10 parts).
 
     # Build media_data from each message (support photo, video, and document)
     media_data = []
@@ -53,10 +59,29 @@ async def process_media_group(group_id: str, chat_id: int):
         if media_item:
             media_data.append(media_item)
 
+    # Combine texts from all messages (if a caption or text exists).
+    combined_text = " ".join(m.caption or m.text or "" for m in messages)
+    fields = extract(combined_text)
+    extracted_id = fields.post_id
+    if extracted_id is None:
+        # Albomning kechikib kelgan (izohsiz) qismlari: avval saqlangan shu albomga qo'shamiz.
+        merged_into = await storage.write(merge_late_parts, chat_id, group_id, media_data) if media_data else None
+        if merged_into is not None:
+            logging.info(f"🧩 Media guruh {group_id} ning {len(media_data)} ta kechikkan qismi "
+                         f"e'lon {merged_into} ga qo'shildi.")
+        else:
+            logging.error(f"⚠️ Media guruh {group_id} ichida haqiqiy e'lon ID topilmadi. Saqlanmadi.")
+        return
+
+    try:
+        post_url = messages[0].url
+    except Exception:
+        post_url = ""
+
     # Use the caption from the first message if available; otherwise use the combined text.
     caption = messages[0].caption if messages[0].caption else combined_text
 
-    listing = HouseListing.create(
+    await ingest_buffer.submit(
         post_id=extracted_id,
         post_url=post_url,
         source_message_id=messages[0].message_id,  # using the first message as the representative
@@ -66,10 +91,12 @@ async def process_media_group(group_id: str, chat_id: int):
         media_group_id=group_id,
         media_group_data=json.dumps(media_data),
         caption=caption,
+        **fields.attributes(),
     )
-    listing.save()
     logging.info(f"✅ Media guruhidagi yangi e'lon saqlandi: {extracted_id}")
 
+media_group_assembler = MediaGroupAssembler(process_media_group)
+
 async def handle_new_message(message: types.Message):
     if message.chat.id not in SOURCE_GROUPS:
         return
@@ -77,11 +104,11 @@ async def handle_new_message(message: types.Message):
     # If this message is not part of a media group, process it immediately.
     if not message.media_group_id:
         text = message.text or message.caption or ""
-        match = id_regex.search(text)
-        if not match:
+        fields = extract(text)
+        extracted_id = fields.post_id
+        if extracted_id is None:
             logging.error("⚠️ Xabarda haqiqiy e'lon ID topilmadi. Saqlanmadi.")
             return
-        extracted_id = str(int(match.group(1)))
         try:
             post_url = message.url
         except Exception:
@@ -100,7 +127,7 @@ async def handle_new_message(message: types.Message):
             return
         media_data.append(media_item)
         
-        listing = HouseListing.create(
+        await ingest_buffer.submit(
             post_id=extracted_id,
             post_url=post_url,
             source_message_id=message.message_id,
@@ -109,39 +136,28 @@ async def handle_new_message(message: types.Message):
             source_group_id=message.chat.id,
             media_group_id=None,
             media_group_data=json.dumps(media_data),
-            caption=message.caption if message.caption else ""
+            caption=message.caption if message.caption else "",
+            **fields.attributes(),
         )
-        listing.save()
         logging.info(f"✅ Yangi e'lon saqlandi: {extracted_id}")
         return
 
     # ----- Media Group Handling -----
-    # If the message belongs to a media group, cache it.
-    global media_group_cache
-    group_id = message.media_group_id
-    if group_id not in media_group_cache:
-        media_group_cache[group_id] = []
-        # Schedule processing of this media group after a short delay.
-        asyncio.create_task(process_media_group(group_id, message.chat.id))
-    media_group_cache[group_id].append(message)
+    # Album parts are collected by the assembler and processed together.
+    media_group_assembler.add(message)
 
 async def start_command(message: types.Message):
     if message.from_user.id in ADMIN_IDS:
-        total = HouseListing.select().count()
-        active = HouseListing.select().where(HouseListing.status == "active").count()
-        sent = HouseListing.select().where(HouseListing.status == "sent").count()
-        boosted = HouseListing.select().where(HouseListing.boost_status == "boosted").count()
-        deleted = HouseListing.select().where(HouseListing.status == "deleted").count()
-        error_count = HouseListing.select().where(HouseListing.status == "error").count()
+        counts = await stats.current()
 
         stats_message = (
             f"📊 <b>Bot Statistika:</b>\n"
-            f"📝 Jami e'lonlar: {total}\n"
-            f"✅ Faol: {active}\n"
-            f"📤 Yuborilgan: {sent}\n"
-            f"🚀 Boost qilingan: {boosted}\n"
-            f"🗑️ O'chirilgan: {deleted}\n"
-            f"❗ Xatoliklar: {error_count}\n\n"
+            f"📝 Jami e'lonlar: {counts['total']}\n"
+            f"✅ Faol: {counts['active']}\n"
+            f"📤 Yuborilgan: {counts['sent']}\n"
+            f"🚀 Boost qilingan: {counts['boosted']}\n"
+            f"🗑️ O'chirilgan: {counts['deleted']}\n"
+            f"❗ Xatoliklar: {counts['error']}\n\n"
             f"Manba guruhlar: {SOURCE_GROUPS}\n"
             f"Maqsad guruhlari: (config da belgilangan)\n"
         )
@@ -179,15 +195,17 @@ async def boost_command(message: types.Message):
     if not args:
         await message.answer("ℹ️ Foydalanish: /boost <e'lon_id>")
         return
-    try:
-        post_id = str(int(args.replace("ID", "").replace("id", "").strip()))
-    except ValueError:
+    post_id = parse_command_id(args)
+    if post_id is None:
         await message.answer("❌ Noto'g'ri e'lon ID formati.")
         return
     try:
-        listing = get_listing_by_id(post_id)
+        listing = await storage.read(get_listing_by_id, post_id)
+        old_boost = listing.boost_status
         listing.boost_status = "boosted"
-        listing.save()
+        await storage.write(listing.save)
+        stats.boost_changed(old_boost, "boosted")
+        invalidate_boosted()
         await message.answer(f"🚀 E'lon {post_id} boost holatiga o'tkazildi!")
     except HouseListing.DoesNotExist:
         await message.answer(f"❌ E'lon {post_id} topilmadi.")
@@ -200,18 +218,19 @@ async def unboost_command(message: types.Message):
     if not args:
         await message.answer("ℹ️ Foydalanish: /unboost <e'lon_id>")
         return
-    try:
-        post_id = str(int(args.replace("ID", "").replace("id", "").strip()))
-    except ValueError:
+    post_id = parse_command_id(args)
+    if post_id is None:
         await message.answer("❌ Noto'g'ri e'lon ID formati.")
         return
     try:
-        listing = get_listing_by_id(post_id)
+        listing = await storage.read(get_listing_by_id, post_id)
         if listing.boost_status != "boosted":
             await message.answer(f"ℹ️ E'lon {post_id} boost qilingan emas.")
             return
         listing.boost_status = "unboosted"
-        listing.save()
+        await storage.write(listing.save)
+        stats.boost_changed("boosted", "unboosted")
+        invalidate_boosted()
         await message.answer(f"🔄 E'lon {post_id} boost holatidan chiqarildi.")
     except HouseListing.DoesNotExist:
         await message.answer(f"❌ E'lon {post_id} topilmadi.")
@@ -221,36 +240,35 @@ async def delete_command(message: types.Message):
         await message.answer("🚫 Ruxsatsiz buyruq.")
         return
     args = message.get_args().strip()
+    reply = message.reply_to_message
+    if not args and reply is not None and reply.forward_from_chat is not None:
+        # Kanaldan forward qilingan nusxaga javoban /del: e'lonni delivery jadvalidan topamiz.
+        owner = await storage.read(deliveries.owner, reply.forward_from_chat.id, reply.forward_from_message_id)
+        if owner is None:
+            await message.answer("❌ Bu xabar hech qaysi e'longa tegishli emas.")
+            return
+        args = str(owner.post_id)
     if not args:
-        await message.answer("ℹ️ Foydalanish: /del <e'lon_id>")
+        await message.answer("ℹ️ Foydalanish: /del <e'lon_id> (yoki kanal xabariga javob sifatida /del)")
         return
-    try:
-        post_id = str(int(args.replace("ID", "").replace("id", "").strip()))
-    except ValueError:
+    post_id = parse_command_id(args)
+    if post_id is None:
         await message.answer("❌ Noto'g'ri e'lon ID formati.")
         return
     try:
-        listing = get_listing_by_id(post_id)
-        if listing.forwarded_message_ids:
-            try:
-                fwd_data = json.loads(listing.forwarded_message_ids)
-            except Exception as e:
-                fwd_data = {}
-                logging.error(f"❌ E'lon {post_id} uchun forwarded_message_ids ni tahlil qilishda xato: {e}")
-            for chat_id, msg_ids in fwd_data.items():
-                for msg_id in msg_ids:
-                    try:
-                        await message.bot.delete_message(chat_id=int(chat_id), message_id=msg_id)
-                    except Exception as e:
-                        logging.error(f"❌ Guruh {chat_id} dan {msg_id} xabarni o'chirishda xato: {e}")
-        try:
-            await message.bot.delete_message(chat_id=listing.source_group_id,
-                                             message_id=listing.source_message_id)
-        except Exception as e:
-            logging.error(f"❌ E'lon {post_id} uchun manba xabarni o'chirishda xato: {e}")
+        listing = await storage.read(get_listing_by_id, post_id)
+        messages = await storage.read(listing_messages, listing, include_source=True)
+        failures = await delete_and_forget(message.bot, messages)
+        old_status = listing.status
         listing.status = "deleted"
-        listing.save()
-        await message.answer(f"🗑️ E'lon {post_id} to'liq o'chirildi.")
+        await storage.write(listing.save)
+        stats.status_changed(old_status, "deleted")
+        invalidate_boosted()
+        if failures:
+            failed = ", ".join(str(chat_id) for chat_id in failures)
+            await message.answer(f"⚠️ E'lon {post_id} o'chirildi, lekin {len(failures)} ta guruhda xato bo'ldi: {failed}")
+        else:
+            await message.answer(f"🗑️ E'lon {post_id} to'liq o'chirildi.")
     except HouseListing.DoesNotExist:
         await message.answer(f"❌ E'lon {post_id} topilmadi.")
 
@@ -258,21 +276,21 @@ async def on_command(message: types.Message):
     if message.from_user.id not in ADMIN_IDS:
         await message.answer("🚫 Ruxsatsiz buyruq.")
         return
-    state.SENDING_ENABLED = True
+    state.set_sending(True)
     await message.answer("✅ Yuborish rejimi yoqildi!")
 
 async def off_command(message: types.Message):
     if message.from_user.id not in ADMIN_IDS:
         await message.answer("🚫 Ruxsatsiz buyruq.")
         return
-    state.SENDING_ENABLED = False
+    state.set_sending(False)
     await message.answer("⛔ Yuborish rejimi o'chirildi!")
 
 async def refresh_command(message: types.Message):
     if message.from_user.id not in ADMIN_IDS:
         await message.answer("🚫 Ruxsatsiz buyruq.")
         return
-    state.REFRESH_REQUESTED = True
+    state.request_refresh()
     await message.answer("🔄 Bazani yangilash buyruqi qabul qilindi!")
 
 def register_handlers(dp: Dispatcher):
@@ -0,0 +1,141 @@
+import asyncio
+import datetime
+import logging
+import time
+from models import HouseListing, QueueItem
+from config import INGEST_BATCH_SIZE, INGEST_FLUSH_MS, BACKFILL_BATCH
+from extraction import extract
+from metrics import INGEST_LISTINGS, INGEST_BATCH_ITEMS, INGEST_FLUSH_SECONDS
+import stats
+import storage
+
+# Manba guruhlardan kelgan e'lonlar bufferga yig'iladi va har INGEST_BATCH_SIZE ta
+# yoki INGEST_FLUSH_MS millisoniyada bitta yozuv tranzaksiyasida saqlanadi.
+
+def store_listings(rows: list) -> tuple:
+    """
+    Upsert a batch of listings and put them on the send queue (runs on the DB writer thread).
+    Returns (results, changes): (listing, created) for every input row, in input order, and
+    (listing, previous or None) per stored listing for count_stored() once the batch has committed.
+    """
+    stored = HouseListing.upsert_many(rows)
+    QueueItem.insert_many(
+        [{"listing": listing.id} for listing, _ in stored.values()]
+    ).on_conflict_ignore().execute()
+    results = []
+    for fields in rows:
+        listing, previous = stored[(fields["source_group_id"], fields["post_id"])]
+        results.append((listing, previous is None))
+    return results, list(stored.values())
+
+def count_stored(changes: list):
+    # Hisoblagichlar tranzaksiya commit bo'lgandan keyin o'zgartiriladi (rollback ularni buzmaydi).
+    for listing, previous in changes:
+        if previous is None:
+            stats.listing_created(listing.status, listing.boost_status)
+        else:
+            stats.status_changed(previous[0], listing.status)
+
+
+class IngestBuffer:
+    def __init__(self, batch_size: int = INGEST_BATCH_SIZE, flush_ms: float = INGEST_FLUSH_MS):
+        self.batch_size = batch_size
+        self.flush_delay = flush_ms / 1000
+        self.pending = []  # [(fields, future)]
+        self.timer = None
+        self.tasks = set()
+
+    async def submit(self, **fields):
+        """Queue one parsed listing; resolves to (listing, created) after its batch commits."""
+        future = asyncio.get_running_loop().create_future()
+        self.pending.append((fields, future))
+        if len(self.pending) >= self.batch_size:
+            self._start_flush()
+        elif self.timer is None:
+            self.timer = asyncio.get_running_loop().call_later(self.flush_delay, self._start_flush)
+        return await future
+
+    def _start_flush(self):
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        batch, self.pending = self.pending, []
+        if not batch:
+            return
+        task = asyncio.ensure_future(self._flush(batch))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    async def _flush(self, batch: list):
+        INGEST_BATCH_ITEMS.observe(len(batch))
+        start = time.perf_counter()
+        try:
+            results, changes = await storage.write(store_listings, [fields for fields, _ in batch])
+            INGEST_FLUSH_SECONDS.observe(time.perf_counter() - start)
+        except Exception as e:
+            # Bitta noto'g'ri e'lon butun to'plamni yo'qotmasligi uchun birma-bir qayta urinamiz.
+            logging.error(f"❌ {len(batch)} ta e'lonni saqlashda xato, alohida saqlanadi: {e}")
+            await asyncio.gather(*(self._store_one(fields, future) for fields, future in batch))
+            return
+        count_stored(changes)
+        for (_, future), result in zip(batch, results):
+            INGEST_LISTINGS.labels("created" if result[1] else "updated").inc()
+            if not future.done():
+                future.set_result(result)
+
+    async def _store_one(self, fields: dict, future: asyncio.Future):
+        try:
+            results, changes = await storage.write(store_listings, [fields])
+            count_stored(changes)
+            INGEST_LISTINGS.labels("created" if results[0][1] else "updated").inc()
+            if not future.done():
+                future.set_result(results[0])
+        except Exception as e:
+            INGEST_LISTINGS.labels("error").inc()
+            if not future.done():
+                future.set_exception(e)
+
+    async def drain(self):
+        """Commit whatever is buffered (used on shutdown and by the benchmark)."""
+        self._start_flush()
+        if self.tasks:
+            await asyncio.gather(*self.tasks, return_exceptions=True)
+
+
+ingest_buffer = IngestBuffer()
+
+
+def _backfill_batch(after_id: int, batch_size: int, only_missing: bool):
+    """Re-parse one id-ordered batch of captions; read and update in the same write transaction."""
+    query = (HouseListing
+             .select(HouseListing.id, HouseListing.caption, HouseListing.rooms, HouseListing.price,
+                     HouseListing.currency, HouseListing.district)
+             .where(HouseListing.id > after_id))
+    if only_missing:
+        query = query.where(HouseListing.rooms.is_null() & HouseListing.price.is_null() &
+                            HouseListing.district.is_null())
+    rows = list(query.order_by(HouseListing.id).limit(batch_size))
+    updated = 0
+    now = datetime.datetime.now()
+    for row in rows:
+        attributes = extract(row.caption).attributes()
+        if attributes != {name: getattr(row, name) for name in attributes}:
+            HouseListing.update(updated_at=now, **attributes).where(HouseListing.id == row.id).execute()
+            updated += 1
+    return (rows[-1].id if rows else after_id), len(rows), updated
+
+
+async def backfill_attributes(only_missing: bool = True, batch_size: int = BACKFILL_BATCH) -> int:
+    """
+    Fill rooms/price/currency/district for existing listings, one write transaction
+    per batch so ingest writes keep interleaving. `only_missing=False` re-parses every row.
+    """
+    after_id, total = 0, 0
+    while True:
+        after_id, scanned, updated = await storage.write(_backfill_batch, after_id, batch_size, only_missing)
+        total += updated
+        if scanned < batch_size:
+            break
+    if total:
+        logging.info(f"🏷️ {total} ta e'lonning xonalar/narx/hudud ustunlari to'ldirildi.")
+    return total
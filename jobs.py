@@ -0,0 +1,182 @@
+import asyncio
+import datetime
+import json
+import logging
+import time
+from aiogram import Bot
+from peewee import fn
+from models import Job
+from config import JOB_POLL_INTERVAL, JOB_BATCH, JOB_RETENTION_DAYS, JOB_MAX_ATTEMPTS
+from deletion import delete_and_forget, purge_listing
+from scheduler import invalidate_boosted
+from metrics import JOBS, FAILED_JOBS
+from retries import backoff
+import state
+import stats
+import storage
+
+# Veb panel bot obyektiga va bot jarayoni xotirasidagi holatga (boosted to'plami, flaglar)
+# to'g'ridan-to'g'ri murojaat qilmaydi: amal bazadagi "job" jadvaliga yoziladi, bot
+# jarayonidagi job_worker() uni o'qib bajaradi. Shu sababli veb panel bir nechta workerda,
+# bot esa alohida jarayonda ishlashi mumkin. Joblar idempotent: bazadagi o'zgarishni veb
+# panelning o'zi qiladi, job faqat bot tomonidagi ta'sirni (xabarlarni o'chirish va h.k.) bajaradi.
+# Xato bilan tugagan job backoff bilan qayta "pending" bo'ladi; JOB_MAX_ATTEMPTS urinishdan keyin "dead".
+
+HANDLERS = {}
+
+_wakeup = None  # shu jarayonda worker ishlayotgan bo'lsa, yangi job uni darhol uyg'otadi
+
+class JobFailed(Exception):
+    """Raised by a handler that did only part of its work; `payload` (what is left) replaces the job's payload."""
+
+    def __init__(self, message: str, payload: dict = None):
+        super().__init__(message)
+        self.payload = payload
+
+def handler(kind: str):
+    def register(fn):
+        HANDLERS[kind] = fn
+        return fn
+    return register
+
+def enqueue(kind: str, payload: dict) -> int:
+    return Job.create(kind=kind, payload=json.dumps(payload)).id
+
+async def submit(kind: str, **payload) -> int:
+    """Queue a job for the bot process; returns the job id."""
+    if kind not in HANDLERS:
+        raise ValueError(f"Noma'lum job turi: {kind}")
+    job_id = await storage.write(enqueue, kind, payload)
+    if _wakeup is not None:
+        _wakeup.set()
+    return job_id
+
+def job_status(job_id: int) -> str:
+    job = Job.get_or_none(Job.id == job_id)
+    if job is None:
+        return "missing"
+    return "retrying" if job.status == "pending" and job.attempts else job.status
+
+async def wait(job_id: int, timeout: float) -> bool:
+    """Poll until the job has run: True if it succeeded, False if it failed or `timeout` passed (bot down)."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        status = await storage.read(job_status, job_id)
+        if status != "pending":
+            return status == "done"
+        await asyncio.sleep(0.05)
+    return False
+
+def pending(limit: int) -> list:
+    """Jobs that are due: new ones and failed ones whose backoff has passed."""
+    return list(Job.select()
+                .where((Job.status == "pending") &
+                       (Job.next_attempt_at.is_null() | (Job.next_attempt_at <= datetime.datetime.now())))
+                .order_by(Job.id)
+                .limit(limit))
+
+def finish(results: list):
+    """Mark a processed batch: [(job, error or None, remaining payload or None)] in one transaction."""
+    now = datetime.datetime.now()
+    done = [job.id for job, error, _ in results if error is None]
+    if done:
+        Job.update(status="done", finished_at=now).where(Job.id.in_(done)).execute()
+    for job, error, payload in results:
+        if error is None:
+            continue
+        attempts = job.attempts + 1
+        fields = {"error": error, "attempts": attempts}
+        if attempts >= JOB_MAX_ATTEMPTS:
+            fields.update(status="dead", finished_at=now)
+        else:
+            fields["next_attempt_at"] = now + datetime.timedelta(seconds=backoff(attempts))
+        if payload is not None:
+            fields["payload"] = json.dumps(payload)
+        Job.update(**fields).where(Job.id == job.id).execute()
+
+def counts() -> dict:
+    """Failed jobs: waiting for another attempt ("retrying") and given up ("dead")."""
+    retrying = Job.select().where((Job.status == "pending") & (Job.attempts > 0)).count()
+    dead = Job.select(fn.COUNT(Job.id)).where(Job.status == "dead").scalar()
+    return {"retrying": retrying, "dead": dead}
+
+def prune(days: int = JOB_RETENTION_DAYS) -> int:
+    # "dead" joblar o'chirilmaydi: ular panelda va /metrics da ko'rinib turishi kerak.
+    cutoff = datetime.datetime.now() - datetime.timedelta(days=days)
+    return Job.delete().where((Job.status == "done") & (Job.finished_at < cutoff)).execute()
+
+async def job_worker(bot: Bot):
+    global _wakeup
+    _wakeup = asyncio.Event()
+    await storage.write(prune)
+    pruned_at = time.monotonic()
+    while True:
+        try:
+            jobs = await storage.read(pending, JOB_BATCH)
+            results = []
+            for job in jobs:
+                error = remaining = None
+                try:
+                    await HANDLERS[job.kind](bot, **json.loads(job.payload))
+                except JobFailed as e:
+                    logging.error(f"❌ Job #{job.id} ({job.kind}) qisman bajarildi "
+                                  f"({job.attempts + 1}/{JOB_MAX_ATTEMPTS}-urinish): {e}")
+                    error, remaining = str(e), e.payload
+                except Exception as e:
+                    logging.error(f"❌ Job #{job.id} ({job.kind}) bajarilmadi "
+                                  f"({job.attempts + 1}/{JOB_MAX_ATTEMPTS}-urinish): {e}")
+                    error = str(e)
+                JOBS.labels(job.kind, "error" if error else "done").inc()
+                results.append((job, error, remaining))
+            if results:
+                await storage.write(finish, results)
+            if time.monotonic() - pruned_at > 3600:
+                await storage.write(prune)
+                pruned_at = time.monotonic()
+        except Exception as e:
+            logging.error(f"❌ Job navbatini o'qishda xato: {e}")
+            jobs = []
+        if len(jobs) < JOB_BATCH:
+            try:
+                await asyncio.wait_for(_wakeup.wait(), JOB_POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            _wakeup.clear()
+
+
+# ----- Job turlari -----
+@handler("delete_messages")
+async def _delete_messages(bot: Bot, messages: dict, label: str, purge: int = None):
+    # Job o'chirish tugagandan keyingina "done" bo'ladi; jarayon o'rtada to'xtasa yoki ba'zi guruhlarda
+    # o'chirish muvaffaqiyatsiz bo'lsa, u "pending" qoladi va (faqat qolgan guruhlar uchun) qayta
+    # bajariladi (deleteMessages topilmagan xabarlarni o'tkazib yuboradi).
+    messages = {int(chat_id): ids for chat_id, ids in messages.items()}  # JSON kalitlari satr bo'lib qaytadi
+    failures = await delete_and_forget(bot, messages)
+    if failures:
+        details = "; ".join(f"{chat_id}: {error}" for chat_id, error in failures.items())
+        raise JobFailed(f"{label}: {len(failures)}/{len(messages)} guruhda o'chirish muvaffaqiyatsiz ({details})",
+                        {"messages": {chat_id: messages[chat_id] for chat_id in failures}, "label": label,
+                         "purge": purge})
+    logging.info(f"🗑️ {label}: {sum(len(ids) for ids in messages.values())} ta xabar "
+                 f"{len(messages)} ta guruhdan o'chirildi.")
+    if purge is not None:
+        # Barcha nusxalar o'chirildi: endi e'lon qatorini delivery yozuvlari bilan olib tashlash mumkin.
+        boost_status = await storage.write(purge_listing, purge)
+        if boost_status is not None:
+            stats.listing_removed("deleted", boost_status)
+
+@handler("invalidate_boosted")
+async def _invalidate_boosted(bot: Bot):
+    invalidate_boosted()
+
+@handler("set_sending")
+async def _set_sending(bot: Bot, enabled: bool):
+    state.set_sending(enabled)
+
+@handler("refresh")
+async def _refresh(bot: Bot):
+    state.request_refresh()
+
+
+for _status in ("retrying", "dead"):
+    FAILED_JOBS.labels(_status).set_function(lambda key=_status: counts()[key])
@@ -0,0 +1,193 @@
+import re
+import json
+import hashlib
+import datetime
+from typing import NamedTuple, Optional, Tuple
+from peewee import Tuple as RowValue
+from models import HouseListing
+import storage
+
+# Dashboard/API uchun e'lonlar so'rovlari: saralash, sahifalash va qidiruv SQLite ichida bajariladi.
+
+_token_regex = re.compile(r"\w+", re.UNICODE)
+
+
+class ListingFilter(NamedTuple):
+    """Attribute filters; every condition is served by the rooms/price/district indexes."""
+    rooms: Optional[int] = None
+    price_min: Optional[int] = None
+    price_max: Optional[int] = None
+    district: Optional[str] = None
+    currency: Optional[str] = None
+
+    @classmethod
+    def from_params(cls, rooms: str = "", price_min: str = "", price_max: str = "",
+                    district: str = "", currency: str = "") -> "ListingFilter":
+        """Form/query-string values (empty string = no filter); raises ValueError on bad numbers."""
+        def number(value):
+            value = value.strip().replace(" ", "")
+            return int(value) if value else None
+        return cls(number(rooms), number(price_min), number(price_max),
+                   district.strip() or None, currency.strip().upper() or None)
+
+    def active(self) -> bool:
+        return any(value is not None for value in self)
+
+    def conditions(self) -> list:
+        conditions = []
+        if self.rooms is not None:
+            conditions.append(HouseListing.rooms == self.rooms)
+        if self.price_min is not None:
+            conditions.append(HouseListing.price >= self.price_min)
+        if self.price_max is not None:
+            conditions.append(HouseListing.price <= self.price_max)
+        if self.district is not None:
+            conditions.append(HouseListing.district == self.district)
+        if self.currency is not None:
+            conditions.append(HouseListing.currency == self.currency)
+        return conditions
+
+    def apply(self, query):
+        for condition in self.conditions():
+            query = query.where(condition)
+        return query
+
+    def sql(self, alias: str = "h"):
+        """The same conditions as a raw SQL fragment (" AND ..."), for the FTS query."""
+        columns = [("rooms", "=", self.rooms), ("price", ">=", self.price_min), ("price", "<=", self.price_max),
+                   ("district", "=", self.district), ("currency", "=", self.currency)]
+        used = [(column, op, value) for column, op, value in columns if value is not None]
+        return "".join(f" AND {alias}.{column} {op} ?" for column, op, _ in used), [value for _, _, value in used]
+
+NO_FILTER = ListingFilter()
+
+def encode_cursor(listing: HouseListing) -> str:
+    return f"{listing.post_id}:{listing.id}"
+
+def decode_cursor(cursor: str) -> Optional[Tuple[int, int]]:
+    try:
+        post_id, listing_id = cursor.split(":", 1)
+        return int(post_id), int(listing_id)
+    except ValueError:
+        return None
+
+def page_listings(after: str = "", before: str = "", per_page: int = 10, filters: ListingFilter = NO_FILTER):
+    """
+    Keyset pagination over (post_id, id), newest first.
+    Returns (listings, has_older, has_newer).
+    """
+    key = RowValue(HouseListing.post_id, HouseListing.id)
+    query = filters.apply(HouseListing.select())
+    after_key = decode_cursor(after) if after else None
+    before_key = decode_cursor(before) if before and not after_key else None
+    if before_key:
+        query = query.where(key > RowValue(*before_key)).order_by(HouseListing.post_id, HouseListing.id)
+    else:
+        if after_key:
+            query = query.where(key < RowValue(*after_key))
+        query = query.order_by(HouseListing.post_id.desc(), HouseListing.id.desc())
+    rows = list(query.limit(per_page + 1))
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    if before_key:
+        rows.reverse()
+        return rows, True, has_more
+    return rows, has_more, bool(after_key)
+
+def fts_match_expression(q: str) -> str:
+    """Every word of the query must match, as a prefix (FTS5 MATCH syntax)."""
+    tokens = _token_regex.findall(q)
+    return " ".join('"{}"*'.format(token.replace('"', '""')) for token in tokens)
+
+def search_listings(q: str, page: int = 1, per_page: int = 10, filters: ListingFilter = NO_FILTER):
+    """
+    Ranked full-text search over captions (bm25 via FTS5 rank).
+    A numeric query also matches post_id exactly and that listing comes first.
+    Returns (listings, has_more).
+    """
+    match = fts_match_expression(q)
+    if not match:
+        return [], False
+    offset = (max(page, 1) - 1) * per_page
+    exact_id = int(q) if q.strip().isdigit() else None
+    filter_sql, filter_params = filters.sql("h")
+    fts_sql = ("SELECT h.*, f.rank AS score FROM listing_fts AS f "
+               "JOIN houselisting AS h ON h.id = f.rowid "
+               "WHERE listing_fts MATCH ?" + filter_sql)
+    params = [match, *filter_params]
+    if exact_id is not None:
+        sql = ("SELECT h.*, -1e300 AS score FROM houselisting AS h WHERE h.post_id = ?" + filter_sql +
+               " UNION ALL " + fts_sql + " AND h.post_id != ?")
+        params = [exact_id, *filter_params, match, *filter_params, exact_id]
+    else:
+        sql = fts_sql
+    sql += " ORDER BY score LIMIT ? OFFSET ?"
+    rows = list(HouseListing.raw(sql, *params, per_page + 1, offset))
+    return rows[:per_page], len(rows) > per_page
+
+
+# ----- /api/listings -----
+API_FIELDS = list(HouseListing._meta.sorted_field_names)
+
+def parse_fields(fields: str) -> list:
+    """`fields=post_id,status` -> list of column names; raises ValueError on unknown names."""
+    if not fields:
+        return list(API_FIELDS)
+    names = [name.strip() for name in fields.split(",") if name.strip()]
+    unknown = [name for name in names if name not in API_FIELDS]
+    if unknown:
+        raise ValueError(", ".join(unknown))
+    return names
+
+def encode_api_cursor(updated_at, listing_id: int) -> str:
+    return f"{updated_at.isoformat()}|{listing_id}"
+
+def decode_api_cursor(cursor: str):
+    updated_at, listing_id = cursor.rsplit("|", 1)
+    return datetime.datetime.fromisoformat(updated_at), int(listing_id)
+
+def _change_feed(query, cursor: str, since, filters: ListingFilter = NO_FILTER):
+    """
+    Change-feed order: (updated_at, id) ascending, served by the
+    houselisting_updated_at_id index. `since` and `cursor` both just move the start key.
+    """
+    query = filters.apply(query)
+    if cursor:
+        updated_at, listing_id = decode_api_cursor(cursor)
+        query = query.where(RowValue(HouseListing.updated_at, HouseListing.id) > RowValue(updated_at, listing_id))
+    if since:
+        query = query.where(HouseListing.updated_at >= since)
+    return query.order_by(HouseListing.updated_at, HouseListing.id)
+
+def api_query(fields: list, cursor: str = "", since: datetime.datetime = None, filters: ListingFilter = NO_FILTER):
+    columns = {HouseListing.id, HouseListing.updated_at}
+    columns.update(HouseListing._meta.fields[name] for name in fields)
+    query = HouseListing.select(*sorted(columns, key=lambda f: f._sort_key))
+    return _change_feed(query, cursor, since, filters)
+
+def page_keys(cursor: str, since, limit: int, filters: ListingFilter = NO_FILTER) -> list:
+    """(id, updated_at) of one page, read from the covering index when unfiltered (used for ETag)."""
+    query = HouseListing.select(HouseListing.id, HouseListing.updated_at)
+    return list(_change_feed(query, cursor, since, filters).limit(limit).tuples())
+
+def page_etag(keys: list, fields: list) -> str:
+    digest = hashlib.sha1(repr((keys, fields)).encode()).hexdigest()
+    return f'W/"{digest}"'
+
+def project(row: dict, fields: list) -> dict:
+    return {name: row[name] for name in fields}
+
+async def stream_ndjson(fields: list, since=None, filters: ListingFilter = NO_FILTER, chunk_size: int = 500):
+    """
+    Full export as NDJSON. Rows are fetched in keyset chunks on the DB read pool,
+    so no long read transaction is held and the event loop is never blocked.
+    """
+    cursor = ""
+    while True:
+        query = api_query(fields, cursor, since, filters).limit(chunk_size).dicts()
+        rows = await storage.read(list, query)
+        for row in rows:
+            yield json.dumps(project(row, fields), default=str, ensure_ascii=False) + "\n"
+        if len(rows) < chunk_size:
+            return
+        cursor = encode_api_cursor(rows[-1]["updated_at"], rows[-1]["id"])
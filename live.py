@@ -0,0 +1,199 @@
+import asyncio
+import datetime
+import json
+import logging
+import time
+from models import QueueCursor
+from config import LIVE_POLL_INTERVAL, LIVE_HEARTBEAT, LIVE_QUEUE_SIZE, LIVE_BATCH, LIVE_STATS_INTERVAL
+from listings import api_query, encode_api_cursor
+from metrics import LIVE_SUBSCRIBERS, LIVE_EVENTS, LIVE_DROPPED
+import retries
+import send_queue
+import state
+import stats
+import storage
+
+# Veb panelga jonli yangilanishlar (Server-Sent Events, /dashboard/events).
+# Har veb jarayonda bitta LiveFeed bor: u faqat kamida bitta panel ochiq bo'lsa ishlaydi va har
+# LIVE_POLL_INTERVAL soniyada (yoki panel amalidan keyin darhol) bazadan o'qiydi:
+#   - o'zgargan e'lonlar: /api/listings?since= dagi (updated_at, id) indeksi bo'yicha;
+#   - navbat holati: kursor, keyingi e'lon va qolganlar soni;
+#   - yuboruvchi holati: yuborish rejimi, qayta urinish/dead-letter sonlari va statistika.
+# Faqat o'zgargan maydonlar bitta marta JSON ga aylantiriladi va barcha ulangan panellarga yuboriladi:
+# N ta panel N ta sahifa render emas, bitta so'rov va bitta xabar.
+# Bot alohida jarayonda bo'lsa ham ishlaydi — barcha ma'lumot bazadan o'qiladi.
+
+LISTING_FIELDS = ["post_id", "status", "boost_status"]
+# updated_at commitdan biroz oldin olinadi: oxirgi COMMIT_LAG oralig'i har safar qayta o'qiladi,
+# shunda kechroq commit qilingan o'zgarish o'tkazib yuborilmaydi (takrorlar `seen` bilan olib tashlanadi).
+COMMIT_LAG = datetime.timedelta(seconds=1)
+HEARTBEAT = b": ping\n\n"
+
+
+def frame(event: str, data) -> bytes:
+    return f"event: {event}\ndata: {json.dumps(data, default=str, ensure_ascii=False)}\n\n".encode()
+
+
+class Broadcaster:
+    """Encodes each event once and puts the same bytes on every subscriber's queue."""
+
+    def __init__(self, queue_size: int = LIVE_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self.subscribers = set()
+
+    def subscribe(self) -> asyncio.Queue:
+        queue = asyncio.Queue(self.queue_size)
+        self.subscribers.add(queue)
+        LIVE_SUBSCRIBERS.set(len(self.subscribers))
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        self.subscribers.discard(queue)
+        LIVE_SUBSCRIBERS.set(len(self.subscribers))
+
+    def publish(self, event: str, data):
+        if not self.subscribers:
+            return
+        LIVE_EVENTS.labels(event).inc()
+        message = frame(event, data)
+        for queue in list(self.subscribers):
+            try:
+                queue.put_nowait(message)
+            except asyncio.QueueFull:
+                # Sekin mijoz: oqimni yopamiz, EventSource qayta ulanib to'liq holatni oladi.
+                self.unsubscribe(queue)
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(None)
+                LIVE_DROPPED.inc()
+
+
+def collect(cursor: tuple, queue_key: tuple, limit: int) -> dict:
+    """One poll on the read pool; the queue head and backlog are only re-read when something moved."""
+    rows = list(api_query(LISTING_FIELDS, encode_api_cursor(*cursor)).limit(limit).dicts())
+    result = {
+        "rows": rows,
+        "forwarder": {"sending": state.load_sending(), **retries.counts()},
+        "stats": stats.snapshot(),
+    }
+    queue_cursor = (QueueCursor.get_or_none(QueueCursor.name == send_queue.CURSOR_NAME)
+                    or QueueCursor(name=send_queue.CURSOR_NAME))
+    if (queue_cursor.cycle, queue_cursor.position) != queue_key or rows:
+        head = send_queue.peek(queue_cursor)
+        result["queue"] = {
+            "cycle": queue_cursor.cycle,
+            "position": queue_cursor.position,
+            "next_id": head.listing.id if head else None,
+            "next_post_id": head.listing.post_id if head else None,
+            "backlog": send_queue.backlog(),
+        }
+    return result
+
+
+class LiveFeed:
+    def __init__(self, broadcaster: Broadcaster, interval: float = LIVE_POLL_INTERVAL):
+        self.broadcaster = broadcaster
+        self.interval = interval
+        self.recount_stats = False  # alohida veb jarayonda (main.py web) hisoblagichlar bazadan qayta sanaladi
+        self.sections = {}  # "forwarder"/"queue"/"stats" -> panellarga oxirgi yuborilgan holat
+        self.cursor = None  # (updated_at, id): o'zgarishlar shundan keyin o'qiladi
+        self.seen = {}      # listing id -> (updated_at, status, boost_status), kursordan keyingi qatorlar
+        self.queue_key = None
+        self.recounted_at = 0.0
+        self.task = None
+        self.wakeup = None
+
+    def wake(self):
+        """Poll now instead of at the next tick (after a dashboard action)."""
+        if self.wakeup is not None:
+            self.wakeup.set()
+
+    def removed(self, listing):
+        """A hard-deleted listing is invisible to the change feed, so announce it directly."""
+        self.broadcaster.publish("listings", [{"id": listing.id, "post_id": listing.post_id, "removed": True}])
+        self.wake()
+
+    def ensure_running(self):
+        if self.task is None or self.task.done():
+            self.wakeup = asyncio.Event()
+            self.task = asyncio.ensure_future(self.run())
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+
+    async def run(self):
+        self.cursor = (datetime.datetime.now(), 0)
+        self.seen.clear()
+        self.queue_key = None
+        while self.broadcaster.subscribers:
+            try:
+                await self.poll()
+            except Exception as e:
+                logging.error(f"❌ Jonli yangilanishlarni o'qishda xato: {e}")
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self.wakeup.clear()
+        # Oxirgi panel yopildi: keyingi ulanish holatni boshidan oladi.
+        self.sections.clear()
+
+    async def poll(self):
+        floor = datetime.datetime.now() - COMMIT_LAG
+        result = await storage.read(collect, self.cursor, self.queue_key, LIVE_BATCH)
+        rows = result["rows"]
+        changed = []
+        for row in rows:
+            current = (row["updated_at"], row["status"], row["boost_status"])
+            if self.seen.get(row["id"]) != current:
+                self.seen[row["id"]] = current
+                changed.append({"id": row["id"], "post_id": row["post_id"],
+                                "status": row["status"], "boost_status": row["boost_status"]})
+        if len(rows) == LIVE_BATCH:
+            self.cursor = (rows[-1]["updated_at"], rows[-1]["id"])  # qolganlari keyingi tekshiruvda
+        else:
+            self.cursor = max(self.cursor, (floor, 0))
+        self.seen = {key: value for key, value in self.seen.items() if value[0] >= self.cursor[0]}
+        if changed:
+            self.broadcaster.publish("listings", changed)
+
+        if self.recount_stats and changed and time.monotonic() - self.recounted_at >= LIVE_STATS_INTERVAL:
+            self.recounted_at = time.monotonic()
+            await storage.read(stats.reconcile)
+            result["stats"] = stats.snapshot()
+        if "queue" in result:
+            self.queue_key = (result["queue"]["cycle"], result["queue"]["position"])
+        for name in ("forwarder", "queue", "stats"):
+            if name not in result:
+                continue
+            previous = self.sections.get(name, {})
+            delta = {key: value for key, value in result[name].items() if previous.get(key) != value}
+            if delta:
+                self.sections[name] = result[name]
+                self.broadcaster.publish(name, delta)
+
+    async def stream(self):
+        """SSE body for one dashboard: the current state first, then the shared deltas."""
+        queue = self.broadcaster.subscribe()
+        self.ensure_running()
+        try:
+            yield b"retry: 3000\n\n"
+            for name, values in list(self.sections.items()):
+                yield frame(name, values)
+            while True:
+                try:
+                    message = await asyncio.wait_for(queue.get(), LIVE_HEARTBEAT)
+                except asyncio.TimeoutError:
+                    yield HEARTBEAT
+                    continue
+                if message is None:
+                    return
+                yield message
+        finally:
+            self.broadcaster.unsubscribe(queue)
+
+
+broadcaster = Broadcaster()
+feed = LiveFeed(broadcaster)
@@ -1,12 +1,18 @@
 import asyncio
 import logging
 import json
+import sys
+import time
 import uvicorn
+from contextlib import asynccontextmanager
 from datetime import timedelta
+from typing import Optional
+from urllib.parse import quote
 import datetime
 
 from fastapi import FastAPI, Depends, HTTPException, status, Request, Form
-from fastapi.responses import HTMLResponse, RedirectResponse, JSONResponse
+from fastapi.responses import HTMLResponse, RedirectResponse, JSONResponse, StreamingResponse, Response
+from fastapi.encoders import jsonable_encoder
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from fastapi.templating import Jinja2Templates
 
@@ -14,21 +20,54 @@ from aiogram import Bot, Dispatcher
 from aiogram.types import InputMediaPhoto, InputMediaVideo, BotCommand
 
 from models import initialize_db, User, HouseListing, pwd_context
-from config import BOT_TOKEN, ADMIN_IDS, SOURCE_GROUPS, TARGET_GROUPS, FORWARD_INTERVAL, BOOST_EVERY_N
-from security import create_access_token, verify_token
-from handlers import register_handlers
-from forwarding import forwarding_task
+from config import (BOT_TOKEN, ADMIN_IDS, SOURCE_GROUPS, TARGET_GROUPS, FORWARD_INTERVAL, BOOST_EVERY_N, METRICS_TOKEN,
+                    WEB_HOST, WEB_PORT, WEB_WORKERS, BOT_METRICS_PORT, UPDATE_MODE, WEBHOOK_URL, WEBHOOK_PATH,
+                    WEBHOOK_SECRET)
+from security import create_access_token, verify_token, token_cache, check_password, hash_password
+from handlers import register_handlers, media_group_assembler
+from ingest import ingest_buffer, backfill_attributes
+from extraction import parse_command_id, DISTRICTS
+from forwarding import forwarding_task, retry_task
+import jobs
+import retries
+import updates
+import live
 import state
+import stats
+import storage
+import send_queue
+import metrics
+from metrics import (SEND_QUEUE_BACKLOG, MEDIA_GROUPS_PENDING, LISTINGS, HTTP_REQUESTS,
+                     HTTP_REQUEST_SECONDS)
+from deletion import listing_messages, cleanup_task
+from listings import (page_listings, search_listings, encode_cursor, parse_fields, api_query,
+                      page_keys, page_etag, project, stream_ndjson, encode_api_cursor, decode_api_cursor,
+                      ListingFilter, NO_FILTER)
 from peewee import Cast
 
 logging.basicConfig(level=logging.INFO)
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Alohida veb jarayonida (main.py web) statistika hisoblagichlarini vaqti-vaqti bilan bazadan yangilaymiz.
+    task = None
+    if not getattr(app.state, "with_bot", False):
+        task = asyncio.create_task(stats.reconcile_task())
+        live.feed.recount_stats = True
+    yield
+    if task is not None:
+        task.cancel()
+    await live.feed.stop()
+
+app = FastAPI(lifespan=lifespan)
 templates = Jinja2Templates(directory="templates")
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
-def get_current_user(token: str = Depends(oauth2_scheme)) -> User:
+async def get_current_user(token: str = Depends(oauth2_scheme)) -> User:
+    user = token_cache.get(token)
+    if user is not None:
+        return user
     payload = verify_token(token)
     if payload is None:
         raise HTTPException(
@@ -41,9 +80,10 @@ def get_current_user(token: str = Depends(oauth2_scheme)) -> User:
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="❌ Noto'g'ri autentifikatsiya ma'lumotlari"
         )
-    user = User.get_or_none(User.username == username)
+    user = await storage.read(User.get_or_none, User.username == username)
     if user is None:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="❌ Foydalanuvchi topilmadi")
+    token_cache.put(token, user, payload["exp"])
     return user
 
 def get_token_from_cookie(request: Request) -> str:
@@ -58,44 +98,50 @@ async def get_current_user_from_cookie(request: Request) -> User:
     token = get_token_from_cookie(request)
     if not token:
         raise HTTPException(status_code=401, detail="Autentifikatsiya qilinmagan")
+    user = token_cache.get(token)
+    if user is not None:
+        return user
     payload = verify_token(token)
     if payload is None:
         raise HTTPException(status_code=401, detail="Noto'g'ri token")
     username: str = payload.get("sub")
-    user = User.get_or_none(User.username == username)
+    user = await storage.read(User.get_or_none, User.username == username)
     if not user:
         raise HTTPException(status_code=401, detail="Foydalanuvchi topilmadi")
+    token_cache.put(token, user, payload["exp"])
     return user
 
 def get_listing(post_id: str) -> HouseListing:
-    try:
-        int_id = int(post_id)
-    except ValueError:
+    int_id = parse_command_id(post_id)
+    if int_id is None:
         raise HTTPException(status_code=400, detail="❌ Noto'g'ri e'lon ID formati")
-    candidates = HouseListing.select().where(HouseListing.post_id.in_([post_id, str(int_id)]))
-    for candidate in candidates:
-        try:
-            if int(candidate.post_id) == int_id:
-                return candidate
-        except Exception:
-            continue
-    raise HTTPException(status_code=404, detail="❌ E'lon topilmadi")
-
-async def delete_forwarded_messages(listing: HouseListing):
-    if listing.forwarded_message_ids:
-        try:
-            fwd_data = json.loads(listing.forwarded_message_ids)
-        except Exception as e:
-            logging.error(f"❌ E'lon {listing.post_id} uchun forwarded_message_ids ni tahlil qilishda xato: {e}")
-            fwd_data = {}
-        for chat_id, msg_ids in fwd_data.items():
-            for msg_id in msg_ids:
-                try:
-                    await global_bot.delete_message(chat_id=int(chat_id), message_id=msg_id)
-                except Exception as e:
-                    logging.error(f"❌ Guruh {chat_id} dan {msg_id} xabarni o'chirishda xato: {e}")
-        listing.forwarded_message_ids = None
-        listing.save()
+    listing = HouseListing.select().where(HouseListing.post_id == int_id).first()
+    if listing is None:
+        raise HTTPException(status_code=404, detail="❌ E'lon topilmadi")
+    return listing
+
+async def authenticate(username: str, password: str):
+    """DB lookup on the read pool, bcrypt on its own threads (neither blocks the event loop)."""
+    user = await storage.read(User.get_or_none, User.username == username)
+    if not await check_password(user, password):
+        return None
+    if pwd_context.needs_update(user.hashed_password):
+        # BCRYPT_ROUNDS o'zgargan: parol ma'lum bo'lgan shu paytda qayta hashlaymiz.
+        user.hashed_password = await hash_password(password)
+        await storage.write(user.save)
+    return user
+
+async def delete_forwarded_messages(listing: HouseListing, include_source: bool = False, purge: bool = False):
+    """
+    Queue deletion of the listing's forwarded copies for the bot process (deleteMessages
+    batches, all chats in parallel), so the request returns at once. The bot drops the
+    ledger rows only for chats where the deletion succeeded. With `purge` the (already
+    soft-deleted) listing row itself is removed by the bot once every copy is gone.
+    """
+    messages = await storage.read(listing_messages, listing, include_source)
+    if messages or purge:
+        await jobs.submit("delete_messages", messages=messages, label=f"E'lon {listing.post_id}",
+                          purge=listing.id if purge else None)
 
 @app.get("/", response_class=HTMLResponse)
 def landing_page(request: Request):
@@ -106,9 +152,9 @@ def login_get(request: Request):
     return templates.TemplateResponse("login.html", {"request": request, "msg": ""})
 
 @app.post("/login", response_class=HTMLResponse)
-def login_post(request: Request, username: str = Form(...), password: str = Form(...)):
-    user = User.get_or_none(User.username == username)
-    if not user or not user.verify_password(password):
+async def login_post(request: Request, username: str = Form(...), password: str = Form(...)):
+    user = await authenticate(username, password)
+    if not user:
         return templates.TemplateResponse("login.html", {"request": request, "msg": "❌ Noto'g'ri ma'lumotlar."})
     access_token_expires = timedelta(minutes=30)
     access_token = create_access_token(data={"sub": user.username}, expires_delta=access_token_expires)
@@ -116,27 +162,109 @@ def login_post(request: Request, username: str = Form(...), password: str = Form
     response.set_cookie(key="access_token", value=f"Bearer {access_token}", httponly=True)
     return response
 
-@app.get("/dashboard", response_class=HTMLResponse)
-def dashboard(request: Request, q: str = "", page: int = 1, current_user: User = Depends(get_current_user_from_cookie)):
-    query = HouseListing.select()
+def load_dashboard_page(q: str, page: int, after: str, before: str, per_page: int,
+                        filters: ListingFilter = NO_FILTER) -> dict:
+    next_cursor = prev_cursor = None
     if q:
-        query = query.where((HouseListing.post_id.contains(q)) | (HouseListing.caption.contains(q)))
-    query = sorted(query, key=lambda x: int(x.post_id), reverse=True)
-    total_count = len(query)
-    per_page = 10
-    total_pages = (total_count + per_page - 1) // per_page
-    listings = query[(page-1)*per_page: page*per_page]
-    sending_status = "ON" if state.SENDING_ENABLED else "OFF"
+        listings, has_next = search_listings(q, page, per_page, filters)
+        has_prev = page > 1
+        total_count = None
+    else:
+        listings, has_next, has_prev = page_listings(after, before, per_page, filters)
+        if listings:
+            next_cursor = encode_cursor(listings[-1])
+            prev_cursor = encode_cursor(listings[0])
+        total_count = None if filters.active() else stats.total_listings()
+    total_pages = (total_count + per_page - 1) // per_page if total_count is not None else None
+    return {
+        "listings": listings,
+        "total_pages": total_pages,
+        "total_count": total_count,
+        "has_next": has_next,
+        "has_prev": has_prev,
+        "next_cursor": next_cursor,
+        "prev_cursor": prev_cursor
+    }
+
+@app.get("/dashboard", response_class=HTMLResponse)
+async def dashboard(request: Request, q: str = "", page: int = 1, after: str = "", before: str = "",
+                    rooms: str = "", price_min: str = "", price_max: str = "", district: str = "",
+                    current_user: User = Depends(get_current_user_from_cookie)):
+    try:
+        filters = ListingFilter.from_params(rooms, price_min, price_max, district)
+    except ValueError:
+        filters = NO_FILTER
+    context = await storage.read(load_dashboard_page, q, page, after, before, 10, filters)
+    sending_status = "ON" if await storage.read(state.load_sending) else "OFF"
+    failed_counts = await storage.read(retries.counts)
+    dead_letters = await storage.read(retries.dead_letters) if failed_counts["dead"] else []
+    filter_params = {name: value for name, value in filters._asdict().items() if value is not None}
     return templates.TemplateResponse("dashboard.html", {
         "request": request,
         "user": current_user,
-        "listings": listings,
         "sending_status": sending_status,
+        "stats": await stats.current(),
         "q": q,
         "page": page,
-        "total_pages": total_pages
+        "filters": filters,
+        "filter_query": "".join(f"&{name}={quote(str(value))}" for name, value in filter_params.items()),
+        "districts": DISTRICTS,
+        "failed_counts": failed_counts,
+        "dead_letters": dead_letters,
+        **context
     })
 
+# ----- Metrikalar -----
+SEND_QUEUE_BACKLOG.set_function(send_queue.backlog)
+MEDIA_GROUPS_PENDING.set_function(lambda: len(media_group_assembler.groups))
+for _status in ("active", "sent", "deleted", "error"):
+    LISTINGS.labels(_status).set_function(lambda key=_status: stats.snapshot()[key])
+
+@app.middleware("http")
+async def record_http_metrics(request: Request, call_next):
+    start = time.perf_counter()
+    status_code = 500
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+        return response
+    finally:
+        route = request.scope.get("route")
+        path = route.path if route is not None else "unmatched"
+        HTTP_REQUESTS.labels(request.method, path, str(status_code)).inc()
+        HTTP_REQUEST_SECONDS.labels(request.method, path).observe(time.perf_counter() - start)
+
+@app.get("/metrics")
+async def metrics_endpoint(request: Request):
+    if METRICS_TOKEN and request.headers.get("authorization") != f"Bearer {METRICS_TOKEN}":
+        raise HTTPException(status_code=401, detail="Noto'g'ri metrics token")
+    # Ba'zi gauge'lar scrape vaqtida bazadan o'qiladi, shuning uchun read pool'da.
+    body = await storage.read(metrics.render)
+    return Response(content=body, media_type="text/plain; version=0.0.4; charset=utf-8")
+
+async def telegram_webhook(request: Request):
+    if not updates.authorized(request.headers.get("x-telegram-bot-api-secret-token")):
+        return Response(status_code=403)
+    return Response(status_code=await updates.accept(await request.body()))
+
+if UPDATE_MODE == "webhook":
+    app.add_api_route(WEBHOOK_PATH, telegram_webhook, methods=["POST"])
+
+@app.get("/dashboard/stats")
+async def dashboard_stats(current_user: User = Depends(get_current_user_from_cookie)):
+    return {
+        **await stats.current(),
+        "sending_status": "ON" if await storage.read(state.load_sending) else "OFF",
+        "media_groups": media_group_assembler.metrics(),
+        "failed_jobs": await storage.read(jobs.counts),
+    }
+
+@app.get("/dashboard/events")
+async def dashboard_events(current_user: User = Depends(get_current_user_from_cookie)):
+    # Barcha ochiq panellar bitta LiveFeed dan bir xil deltalarni oladi (live.py).
+    return StreamingResponse(live.feed.stream(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
 @app.get("/logout", response_class=HTMLResponse)
 async def logout(request: Request):
     response = RedirectResponse(url="/login", status_code=303)
@@ -160,11 +288,13 @@ async def profile_post(
 ):
     if not current_user.is_admin:
         raise HTTPException(status_code=403, detail="Faqat adminlar ma'lumotlarni yangilay oladi.")
-    if not current_user.verify_password(current_password):
+    # Keshdagi obyektni o'zgartirmaslik uchun yangi nusxa bilan ishlaymiz.
+    current_user = await storage.read(User.get_by_id, current_user.id)
+    if not await check_password(current_user, current_password):
         msg = "❌ Joriy parol noto'g'ri."
         return templates.TemplateResponse("profile.html", {"request": request, "user": current_user, "msg": msg})
     if new_username and new_username != current_user.username:
-        if User.get_or_none(User.username == new_username):
+        if await storage.read(User.get_or_none, User.username == new_username):
             msg = "❌ Bu foydalanuvchi nomi allaqachon mavjud."
             return templates.TemplateResponse("profile.html", {"request": request, "user": current_user, "msg": msg})
         current_user.username = new_username
@@ -172,83 +302,153 @@ async def profile_post(
         if new_password != confirm_new_password:
             msg = "❌ Yangi parol va tasdiq mos kelmadi."
             return templates.TemplateResponse("profile.html", {"request": request, "user": current_user, "msg": msg})
-        current_user.hashed_password = pwd_context.hash(new_password)
-    current_user.save()
+        current_user.hashed_password = await hash_password(new_password)
+    await storage.write(current_user.save)
+    # Boshqa veb jarayonlardagi keshlar TOKEN_CACHE_TTL ichida eskiradi.
+    token_cache.invalidate_user(current_user.id)
     msg = "✅ Ma'lumotlar muvaffaqiyatli yangilandi!"
     return templates.TemplateResponse("profile.html", {"request": request, "user": current_user, "msg": msg})
 
 @app.post("/dashboard/listings/{post_id}/toggle")
 async def dashboard_toggle_boost_listing(post_id: str, current_user: User = Depends(get_current_user_from_cookie)):
-    listing = get_listing(post_id)
+    listing = await storage.read(get_listing, post_id)
     await delete_forwarded_messages(listing)
     # Boost statusini almashtiramiz
+    old_boost = listing.boost_status
     listing.boost_status = "unboosted" if listing.boost_status == "boosted" else "boosted"
-    listing.save()
-    return RedirectResponse(url="/dashboard", status_code=303)
+    await storage.write(listing.save)
+    stats.boost_changed(old_boost, listing.boost_status)
+    await jobs.submit("invalidate_boosted")
+    live.feed.wake()
+    return {"msg": f"🚀 E'lon {listing.post_id} boost holati: {listing.boost_status}.",
+            "listing": {"id": listing.id, "post_id": listing.post_id, "status": listing.status,
+                        "boost_status": listing.boost_status}}
 
 @app.post("/dashboard/listings/{post_id}/delete")
 async def dashboard_delete_listing(post_id: str, current_user: User = Depends(get_current_user_from_cookie)):
-    listing = get_listing(post_id)
-    await delete_forwarded_messages(listing)
-    try:
-        await global_bot.delete_message(chat_id=listing.source_group_id, message_id=listing.source_message_id)
-    except Exception as e:
-        logging.error(f"❌ E'lon {post_id} uchun manba xabarni o'chirishda xato: {e}")
-    listing.delete_instance()
-    return RedirectResponse(url="/dashboard", status_code=303)
+    listing = await storage.read(get_listing, post_id)
+    # Avval soft-delete (/del kabi): e'lon qatori va uning delivery yozuvlari bot barcha nusxalarni
+    # o'chirgandan keyingina olib tashlanadi, aks holda qolgan nusxalarni qayta o'chirib bo'lmaydi.
+    old_status = listing.status
+    listing.status = "deleted"
+    await storage.write(listing.save)
+    stats.status_changed(old_status, "deleted")
+    await delete_forwarded_messages(listing, include_source=True, purge=True)
+    await jobs.submit("invalidate_boosted")
+    live.feed.removed(listing)
+    return {"msg": f"🗑️ E'lon {listing.post_id} o'chirildi.",
+            "listing": {"id": listing.id, "post_id": listing.post_id, "removed": True}}
+
+@app.post("/dashboard/dead_letters/{row_id}/retry")
+async def dashboard_retry_dead_letter(row_id: int, current_user: User = Depends(get_current_user_from_cookie)):
+    # Bot jarayonidagi retry_task uni keyingi tekshiruvda oladi.
+    if not await storage.write(retries.requeue, row_id):
+        raise HTTPException(status_code=404, detail="❌ Yozuv topilmadi")
+    live.feed.wake()
+    return {"msg": "🔁 Qayta yuborish navbatiga qo'yildi.", "id": row_id}
+
+@app.post("/dashboard/dead_letters/{row_id}/dismiss")
+async def dashboard_dismiss_dead_letter(row_id: int, current_user: User = Depends(get_current_user_from_cookie)):
+    await storage.write(retries.resolve, row_id)
+    live.feed.wake()
+    return {"msg": "✖️ Ro'yxatdan olib tashlandi.", "id": row_id}
 
 @app.post("/dashboard/toggle_sending")
 async def dashboard_toggle_sending(current_user: User = Depends(get_current_user_from_cookie)):
     if not current_user.is_admin:
         raise HTTPException(status_code=403, detail="Faqat adminlar bu amalni bajarishi mumkin.")
-    state.SENDING_ENABLED = not state.SENDING_ENABLED
-    return RedirectResponse(url="/dashboard", status_code=303)
+    enabled = not await storage.read(state.load_sending)
+    job_id = await jobs.submit("set_sending", enabled=enabled)
+    # Yangi holat panellarga jonli oqim orqali boradi; javobda bot uni qo'llaganmi — shuni aytamiz.
+    applied = await jobs.wait(job_id, timeout=2)
+    live.feed.wake()
+    msg = f"Yuborish rejimi: {'ON' if enabled else 'OFF'}"
+    if not applied:
+        msg += " (bot hali qo'llamadi)"
+    return {"msg": msg, "sending": enabled, "applied": applied}
 
 @app.post("/dashboard/refresh")
 async def dashboard_refresh(current_user: User = Depends(get_current_user_from_cookie)):
     if not current_user.is_admin:
         raise HTTPException(status_code=403, detail="Faqat adminlar bu amalni bajarishi mumkin.")
-    state.REFRESH_REQUESTED = True
-    return RedirectResponse(url="/dashboard", status_code=303)
+    await jobs.submit("refresh")
+    live.feed.wake()
+    return {"msg": "🔄 Yangilash so'raldi."}
+
+def load_api_page(field_names: list, cursor: str, since_dt, limit: int, if_none_match: str,
+                  filters: ListingFilter = NO_FILTER):
+    keys = page_keys(cursor, since_dt, limit, filters)
+    etag = page_etag(keys, field_names)
+    if if_none_match == etag:
+        return etag, None
+    return etag, list(api_query(field_names, cursor, since_dt, filters).limit(limit).dicts())
 
 @app.get("/api/listings")
-def api_get_listings(current_user: User = Depends(get_current_user)):
-    listings = HouseListing.select()
-    return {"listings": [listing.__data__ for listing in listings]}
+async def api_get_listings(request: Request, cursor: str = "", since: str = "", fields: str = "",
+                           limit: int = 100, format: str = "json",
+                           rooms: Optional[int] = None, price_min: Optional[int] = None,
+                           price_max: Optional[int] = None, district: Optional[str] = None,
+                           currency: Optional[str] = None,
+                           current_user: User = Depends(get_current_user)):
+    try:
+        field_names = parse_fields(fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"❌ Noma'lum maydon(lar): {e}")
+    try:
+        since_dt = datetime.datetime.fromisoformat(since) if since else None
+        if cursor:
+            decode_api_cursor(cursor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="❌ Noto'g'ri cursor yoki since qiymati")
+
+    filters = ListingFilter(rooms, price_min, price_max, district, currency.upper() if currency else None)
+
+    if format == "ndjson":
+        # To'liq eksport: butun jadvalni xotiraga yuklamasdan oqim sifatida yuboramiz.
+        return StreamingResponse(stream_ndjson(field_names, since_dt, filters), media_type="application/x-ndjson")
+
+    limit = max(1, min(limit, 1000))
+    etag, rows = await storage.read(load_api_page, field_names, cursor, since_dt, limit,
+                                    request.headers.get("if-none-match"), filters)
+    if rows is None:
+        return Response(status_code=304, headers={"ETag": etag})
+    next_cursor = encode_api_cursor(rows[-1]["updated_at"], rows[-1]["id"]) if len(rows) == limit else None
+    body = {"listings": [project(row, field_names) for row in rows], "next_cursor": next_cursor}
+    return JSONResponse(content=jsonable_encoder(body), headers={"ETag": etag})
 
 @app.post("/api/listings/{post_id}/boost")
 async def api_boost_listing(post_id: str, current_user: User = Depends(get_current_user)):
-    listing = get_listing(post_id)
+    listing = await storage.read(get_listing, post_id)
     await delete_forwarded_messages(listing)
+    old_boost = listing.boost_status
     listing.boost_status = "unboosted" if listing.boost_status == "boosted" else "boosted"
-    listing.save()
+    await storage.write(listing.save)
+    stats.boost_changed(old_boost, listing.boost_status)
+    await jobs.submit("invalidate_boosted")
     return {"msg": f"🔄 E'lon {post_id} boost holati o'zgartirildi."}
 
 @app.delete("/api/listings/{post_id}")
 async def api_delete_listing(post_id: str, current_user: User = Depends(get_current_user)):
-    listing = get_listing(post_id)
-    await delete_forwarded_messages(listing)
-    try:
-        await global_bot.delete_message(chat_id=listing.source_group_id, message_id=listing.source_message_id)
-    except Exception as e:
-        logging.error(f"❌ E'lon {post_id} uchun manba xabarni o'chirishda xato: {e}")
+    listing = await storage.read(get_listing, post_id)
+    await delete_forwarded_messages(listing, include_source=True)
+    old_status = listing.status
     listing.status = "deleted"
-    listing.save()
+    await storage.write(listing.save)
+    stats.status_changed(old_status, "deleted")
+    await jobs.submit("invalidate_boosted")
     return {"msg": f"🗑️ E'lon {post_id} o'chirildi."}
 
 @app.post("/token")
-def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends()):
-    user = User.get_or_none(User.username == form_data.username)
-    if not user or not user.verify_password(form_data.password):
+async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends()):
+    user = await authenticate(form_data.username, form_data.password)
+    if not user:
         raise HTTPException(status_code=400, detail="❌ Foydalanuvchi nomi yoki parol noto'g'ri")
     access_token_expires = timedelta(minutes=30)
     access_token = create_access_token(data={"sub": user.username}, expires_delta=access_token_expires)
     return {"access_token": access_token, "token_type": "bearer"}
 
 async def start_bot():
-    global global_bot
     bot = Bot(token=BOT_TOKEN)
-    global_bot = bot
     dp = Dispatcher(bot)
     register_handlers(dp)
     await bot.set_my_commands([
@@ -260,20 +460,84 @@ async def start_bot():
         BotCommand(command="off", description="Yuborish rejimini o'chirish"),
         BotCommand(command="refresh", description="Bazani yangilash")
     ])
+    state.publish_sending()  # veb panel uchun boshlang'ich holat (OFF)
+    asyncio.create_task(jobs.job_worker(bot))
     asyncio.create_task(forwarding_task(bot))
-    await dp.start_polling()
+    asyncio.create_task(retry_task(bot))
+    asyncio.create_task(retries.alert_digest_task(bot))
+    asyncio.create_task(stats.reconcile_task())
+    asyncio.create_task(backfill_attributes())  # atributlari hali to'ldirilmagan e'lonlar uchun
+    asyncio.create_task(cleanup_task(bot))  # KEEP_COPIES_PER_CHAT dan eski nusxalarni o'chirish
+    try:
+        if UPDATE_MODE == "webhook":
+            dispatcher = updates.start(dp)
+            if WEBHOOK_URL:
+                await bot.set_webhook(WEBHOOK_URL.rstrip("/") + WEBHOOK_PATH, secret_token=WEBHOOK_SECRET)
+            logging.info(f"🪝 Webhook rejimi: yangilanishlar {WEBHOOK_PATH} da qabul qilinadi.")
+            try:
+                await asyncio.Event().wait()
+            finally:
+                await dispatcher.stop()
+        else:
+            await dp.start_polling()
+    finally:
+        await ingest_buffer.drain()  # bufferda qolgan e'lonlarni saqlash
 
 async def start_uvicorn():
-    config = uvicorn.Config(app, host="0.0.0.0", port=8000, log_level="info")
+    config = uvicorn.Config(app, host=WEB_HOST, port=WEB_PORT, log_level="info")
     server = uvicorn.Server(config)
     await server.serve()
 
-async def main():
+async def start_bot_server():
+    """/metrics (and the webhook) of the bot process when the web panel runs separately (main.py bot)."""
+    from aiohttp import web
+
+    async def handle(request):
+        if METRICS_TOKEN and request.headers.get("Authorization") != f"Bearer {METRICS_TOKEN}":
+            return web.Response(status=401, text="Noto'g'ri metrics token")
+        body = await storage.read(metrics.render)
+        return web.Response(body=body.encode(), headers={"Content-Type": "text/plain; version=0.0.4; charset=utf-8"})
+
+    async def webhook(request):
+        if not updates.authorized(request.headers.get("X-Telegram-Bot-Api-Secret-Token")):
+            return web.Response(status=403)
+        return web.Response(status=await updates.accept(await request.read()))
+
+    metrics_app = web.Application()
+    metrics_app.router.add_get("/metrics", handle)
+    if UPDATE_MODE == "webhook":
+        metrics_app.router.add_post(WEBHOOK_PATH, webhook)
+    runner = web.AppRunner(metrics_app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, WEB_HOST, BOT_METRICS_PORT).start()
+
+async def main(mode: str = "all"):
+    updates.check_config()
     initialize_db()
+    await storage.read(stats.reconcile)  # hisoblagichlarni bitta GROUP BY bilan yuklash
+    if mode == "bot":
+        if BOT_METRICS_PORT:
+            await start_bot_server()
+        await start_bot()
+        return
+    app.state.with_bot = True
     await asyncio.gather(
         start_uvicorn(),
         start_bot()
     )
 
+def run_web():
+    """Web panel only, in WEB_WORKERS processes; dashboard actions reach the bot through jobs."""
+    updates.check_config()
+    initialize_db()
+    uvicorn.run("main:app", host=WEB_HOST, port=WEB_PORT, workers=WEB_WORKERS, log_level="info")
+
 if __name__ == "__main__":
-    asyncio.run(main())
+    # python main.py [all|web|bot]
+    mode = sys.argv[1] if len(sys.argv) > 1 else "all"
+    if mode not in ("all", "web", "bot"):
+        sys.exit("Foydalanish: python main.py [all|web|bot]")
+    if mode == "web":
+        run_web()
+    else:
+        asyncio.run(main(mode))
@@ -0,0 +1,74 @@
+from collections import OrderedDict
+from typing import NamedTuple, Optional
+import json
+from aiogram.types import InputMediaPhoto, InputMediaVideo, InputMediaDocument
+from config import MEDIA_CACHE_SIZE, CHANNEL_LINKS_FOOTER
+
+MEDIA_TYPES = {
+    "photo": InputMediaPhoto,
+    "video": InputMediaVideo,
+    "document": InputMediaDocument,
+}
+
+
+class PreparedPayload(NamedTuple):
+    media: list  # InputMedia objects, ready for send_media_group
+    caption: Optional[str]
+    parse_mode: Optional[str]
+
+
+def content_hash(listing) -> int:
+    return hash((listing.media_group_data, listing.caption))
+
+def prepare(listing) -> PreparedPayload:
+    """
+    Decode media_group_data and build the InputMedia list.
+    The caption (with the channel links footer) goes on the first media item only.
+    """
+    caption = listing.caption + CHANNEL_LINKS_FOOTER if listing.caption else None
+    parse_mode = "HTML" if caption else None
+    input_media = []
+    for i, item in enumerate(json.loads(listing.media_group_data)):
+        media_cls = MEDIA_TYPES.get(item["type"])
+        if media_cls is None:
+            continue
+        media = media_cls(media=item["file_id"])
+        if i == 0 and caption:
+            media.caption = caption
+            media.parse_mode = parse_mode
+        input_media.append(media)
+    return PreparedPayload(input_media, caption, parse_mode)
+
+
+class PayloadCache:
+    """
+    LRU cache of prepared payloads keyed by listing id.
+    An entry is rebuilt when the listing's media/caption hash no longer matches.
+    """
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()  # listing id -> (content hash, PreparedPayload)
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, listing) -> PreparedPayload:
+        digest = content_hash(listing)
+        entry = self.entries.get(listing.id)
+        if entry is not None and entry[0] == digest:
+            self.entries.move_to_end(listing.id)
+            self.hits += 1
+            return entry[1]
+        self.misses += 1
+        payload = prepare(listing)
+        self.entries[listing.id] = (digest, payload)
+        self.entries.move_to_end(listing.id)
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+        return payload
+
+    def invalidate(self, listing_id: int):
+        self.entries.pop(listing_id, None)
+
+
+payload_cache = PayloadCache(MEDIA_CACHE_SIZE)
@@ -0,0 +1,117 @@
+import asyncio
+import logging
+import time
+from config import MEDIA_GROUP_MIN_QUIET, MEDIA_GROUP_MAX_QUIET, MEDIA_GROUP_TTL
+
+# Telegram albomida 10 tadan ortiq element bo'lmaydi.
+ALBUM_MAX_ITEMS = 10
+
+
+class _PendingGroup:
+    __slots__ = ("chat_id", "messages", "first_seen", "last_seen", "timer")
+
+    def __init__(self, chat_id: int, now: float):
+        self.chat_id = chat_id
+        self.messages = []
+        self.first_seen = now
+        self.last_seen = now
+        self.timer = None
+
+
+class MediaGroupAssembler:
+    """
+    Collects album parts by media_group_id and hands the complete album to
+    `on_complete(group_id, chat_id, messages)`.
+
+    The quiet-period timer restarts on every new part; its length adapts to the
+    gap between parts observed in the same chat (3x that chat's moving average,
+    clamped to [min_quiet, max_quiet]). An album flushes immediately at 10 parts, and any
+    group older than `ttl` is flushed on the next add so nothing is left behind.
+    """
+
+    def __init__(self, on_complete, min_quiet: float = MEDIA_GROUP_MIN_QUIET,
+                 max_quiet: float = MEDIA_GROUP_MAX_QUIET, ttl: float = MEDIA_GROUP_TTL,
+                 clock=time.monotonic):
+        self.on_complete = on_complete
+        self.min_quiet = min_quiet
+        self.max_quiet = max_quiet
+        self.ttl = ttl
+        self.clock = clock
+        self.groups = {}
+        self.avg_gap = {}  # chat_id -> qismlar orasidagi o'rtacha vaqt (har chatda yetkazish tezligi har xil)
+        self.tasks = set()
+        # metrics
+        self.assembled = 0
+        self.expired = 0
+        self.last_latency = 0.0
+        self.max_latency = 0.0
+        self.total_latency = 0.0
+
+    def quiet_period(self, chat_id: int = None) -> float:
+        """Quiet period for one chat; without a chat, the longest one currently in use."""
+        if chat_id is None:
+            return max((self.quiet_period(chat) for chat in self.avg_gap), default=self.max_quiet)
+        avg_gap = self.avg_gap.get(chat_id)
+        if avg_gap is None:
+            return self.max_quiet
+        return min(self.max_quiet, max(self.min_quiet, 3 * avg_gap))
+
+    def add(self, message):
+        now = self.clock()
+        self._evict_expired(now)
+        group_id = message.media_group_id
+        group = self.groups.get(group_id)
+        if group is None:
+            group = self.groups[group_id] = _PendingGroup(message.chat.id, now)
+        else:
+            gap = now - group.last_seen
+            avg_gap = self.avg_gap.get(group.chat_id)
+            self.avg_gap[group.chat_id] = gap if avg_gap is None else 0.8 * avg_gap + 0.2 * gap
+        group.messages.append(message)
+        group.last_seen = now
+        if group.timer is not None:
+            group.timer.cancel()
+            group.timer = None
+        if len(group.messages) >= ALBUM_MAX_ITEMS:
+            self.flush(group_id)
+        else:
+            loop = asyncio.get_running_loop()
+            group.timer = loop.call_later(self.quiet_period(group.chat_id), self.flush, group_id)
+
+    def flush(self, group_id: str):
+        group = self.groups.pop(group_id, None)
+        if group is None:
+            return
+        if group.timer is not None:
+            group.timer.cancel()
+        latency = self.clock() - group.first_seen
+        self.assembled += 1
+        self.last_latency = latency
+        self.max_latency = max(self.max_latency, latency)
+        self.total_latency += latency
+        task = asyncio.ensure_future(self._complete(group_id, group))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    async def _complete(self, group_id: str, group: _PendingGroup):
+        try:
+            await self.on_complete(group_id, group.chat_id, group.messages)
+        except Exception as e:
+            logging.error(f"❌ Media guruh {group_id} ni qayta ishlashda xato: {e}")
+
+    def _evict_expired(self, now: float):
+        expired = [group_id for group_id, group in self.groups.items() if now - group.first_seen > self.ttl]
+        for group_id in expired:
+            self.expired += 1
+            self.flush(group_id)
+
+    def metrics(self) -> dict:
+        return {
+            "pending_groups": len(self.groups),
+            "assembled": self.assembled,
+            "expired": self.expired,
+            "quiet_period": round(self.quiet_period(), 3),
+            "last_latency": round(self.last_latency, 3),
+            "max_latency": round(self.max_latency, 3),
+            "avg_latency": round(self.total_latency / self.assembled, 3) if self.assembled else 0.0,
+        }
@@ -0,0 +1,245 @@
+import bisect
+import threading
+import time
+
+# Prometheus matn formatidagi metrikalar (tashqi kutubxonasiz). Yozish arzon: label qiymatlari
+# bo'yicha bola obyekt bir marta yaratiladi va keshlanadi, keyin faqat qulf ostida qo'shish.
+# Gauge qiymatini scrape vaqtida funksiya orqali hisoblash ham mumkin (set_function).
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_registry = []
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _label_text(names: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.children = {}
+        self.lock = threading.Lock()
+        _registry.append(self)
+
+    def labels(self, *values):
+        child = self.children.get(values)
+        if child is None:
+            with self.lock:
+                child = self.children.setdefault(values, self._new_child())
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def _default(self):
+        return self.labels()
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for values, child in list(self.children.items()):
+            lines.extend(child.render(self.name, self.labelnames, values))
+        return lines
+
+
+class _CounterChild:
+    __slots__ = ("value", "lock")
+
+    def __init__(self):
+        self.value = 0.0
+        self.lock = threading.Lock()
+
+    def inc(self, amount: float = 1):
+        with self.lock:
+            self.value += amount
+
+    def render(self, name, labelnames, values):
+        return [f"{name}{_label_text(labelnames, values)} {_number(self.value)}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1):
+        self._default().inc(amount)
+
+
+class _GaugeChild(_CounterChild):
+    __slots__ = ("function",)
+
+    def __init__(self):
+        super().__init__()
+        self.function = None
+
+    def set(self, value: float):
+        self.value = value
+
+    def dec(self, amount: float = 1):
+        self.inc(-amount)
+
+    def set_function(self, function):
+        """Evaluate `function()` at scrape time instead of storing a value."""
+        self.function = function
+
+    def render(self, name, labelnames, values):
+        value = self.value
+        if self.function is not None:
+            try:
+                value = self.function()
+            except Exception:
+                return []
+        return [f"{name}{_label_text(labelnames, values)} {_number(value)}"]
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def set(self, value: float):
+        self._default().set(value)
+
+    def inc(self, amount: float = 1):
+        self._default().inc(amount)
+
+    def dec(self, amount: float = 1):
+        self._default().dec(amount)
+
+    def set_function(self, function):
+        self._default().set_function(function)
+
+
+class _Timer:
+    __slots__ = ("child", "start")
+
+    def __init__(self, child):
+        self.child = child
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.child.observe(time.perf_counter() - self.start)
+
+
+class _HistogramChild:
+    __slots__ = ("buckets", "counts", "sum", "lock")
+
+    def __init__(self, buckets: tuple):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # oxirgisi +Inf
+        self.sum = 0.0
+        self.lock = threading.Lock()
+
+    def observe(self, value: float):
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    def time(self) -> _Timer:
+        return _Timer(self)
+
+    def render(self, name, labelnames, values):
+        with self.lock:
+            counts, total = list(self.counts), self.sum
+        lines, cumulative = [], 0
+        for bound, count in zip(self.buckets + (float("inf"),), counts):
+            cumulative += count
+            le = 'le="{}"'.format(_number(bound))
+            lines.append(f"{name}_bucket{_label_text(labelnames, values, le)} {cumulative}")
+        lines.append(f"{name}_sum{_label_text(labelnames, values)} {_number(total)}")
+        lines.append(f"{name}_count{_label_text(labelnames, values)} {cumulative}")
+        return lines
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = (), buckets: tuple = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float):
+        self._default().observe(value)
+
+    def time(self) -> _Timer:
+        return self._default().time()
+
+
+def render() -> str:
+    """All registered metrics in the Prometheus text exposition format (0.0.4)."""
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# ----- Ilova metrikalari -----
+INGEST_LISTINGS = Counter("ingest_listings_total", "Listings stored from source groups", ("result",))
+INGEST_BATCH_ITEMS = Histogram("ingest_batch_size", "Listings per ingest write batch",
+                               buckets=(1, 2, 5, 10, 25, 50, 100, 200, 500))
+INGEST_FLUSH_SECONDS = Histogram("ingest_flush_seconds", "Time to commit one ingest batch")
+
+FORWARD_SENDS = Counter("forward_sends_total", "Listing sends per target chat", ("target", "result"))
+FORWARD_SEND_SECONDS = Histogram("forward_send_seconds", "One listing send to one target (including rate-limit wait)",
+                                 ("target",), buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60))
+FORWARD_LISTING_SECONDS = Histogram("forward_listing_seconds", "Full fan-out of one listing to its targets",
+                                    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60))
+FORWARD_BATCH_LISTINGS = Histogram("forward_batch_listings", "Listings per batched forwardMessages call",
+                                   buckets=(1, 2, 5, 10, 25, 50, 100))
+RETRY_AFTER = Counter("telegram_retry_after_total", "RetryAfter (429) responses from the Bot API", ("chat",))
+SEND_QUEUE_BACKLOG = Gauge("send_queue_backlog", "Deliverable queue items after the cursor in this cycle")
+LISTINGS = Gauge("listings", "Listings by status (in-memory counters)", ("status",))
+MEDIA_GROUPS_PENDING = Gauge("media_groups_pending", "Albums still being assembled")
+
+DELIVERY_RETRIES = Counter("delivery_retries_total", "Failed deliveries by what happened next", ("result",))
+FAILED_DELIVERIES = Gauge("failed_deliveries", "Deliveries waiting for a retry or dead-lettered", ("status",))
+CIRCUITS_OPEN = Gauge("circuits_open", "Target chats paused by the circuit breaker")
+
+DELETED_MESSAGES = Counter("deleted_messages_total", "Forwarded/source messages deleted", ("result",))
+DELETE_BATCH_SECONDS = Histogram("delete_batch_seconds", "One deleteMessages call")
+
+DB_READ_SECONDS = Histogram("db_read_seconds", "DB read on the read pool (including queue wait)", ("op",))
+DB_WRITE_SECONDS = Histogram("db_write_seconds", "DB write until commit (including queue wait)", ("op",))
+DB_WRITE_BATCH_SIZE = Histogram("db_write_batch_size", "Writes committed per writer transaction",
+                                buckets=(1, 2, 5, 10, 25, 50, 100))
+DB_WRITE_QUEUE = Gauge("db_write_queue_depth", "Writes waiting for the writer thread")
+
+HTTP_REQUESTS = Counter("http_requests_total", "HTTP requests", ("method", "route", "status"))
+HTTP_REQUEST_SECONDS = Histogram("http_request_seconds", "HTTP request latency", ("method", "route"))
+
+JOBS = Counter("jobs_total", "Dashboard jobs processed by the bot process", ("kind", "result"))
+FAILED_JOBS = Gauge("failed_jobs", "Dashboard jobs waiting for a retry or dead-lettered", ("status",))
+UPDATES = Counter("telegram_updates_total", "Webhook updates processed", ("result",))
+UPDATE_SECONDS = Histogram("telegram_update_seconds", "Webhook update from receipt to handled (including queue wait)")
+UPDATE_QUEUE = Gauge("telegram_update_queue_depth", "Webhook updates waiting for a worker")
+
+LIVE_SUBSCRIBERS = Gauge("live_subscribers", "Open dashboard event streams in this process")
+LIVE_EVENTS = Counter("live_events_total", "Dashboard events broadcast (once for all subscribers)", ("event",))
+LIVE_DROPPED = Counter("live_dropped_total", "Dashboard streams closed because the client fell behind")
@@ -0,0 +1,204 @@
+import json
+import logging
+
+# Schema versions are tracked in SQLite's PRAGMA user_version.
+# Every migration runs in its own transaction and only uses plain SQL,
+# so old migrations keep working when the models change later on.
+
+def get_version(database) -> int:
+    return database.execute_sql("PRAGMA user_version").fetchone()[0]
+
+def set_version(database, version: int):
+    database.execute_sql(f"PRAGMA user_version = {int(version)}")
+
+def table_exists(database, name: str) -> bool:
+    return name in database.get_tables()
+
+def merge_forwarded_message_ids(database):
+    """Copy the forwarded message ids of collapsed duplicates into the kept houselisting_new row."""
+    rows = database.execute_sql("""
+        SELECT new.id, old.forwarded_message_ids
+        FROM houselisting AS old
+        JOIN houselisting_new AS new
+          ON new.source_group_id = old.source_group_id AND new.post_id = CAST(old.post_id AS INTEGER)
+        WHERE old.forwarded_message_ids IS NOT NULL AND json_valid(old.forwarded_message_ids)
+          AND new.id IN (SELECT MAX(id) FROM houselisting
+                         GROUP BY source_group_id, CAST(post_id AS INTEGER) HAVING COUNT(*) > 1)
+        ORDER BY new.id, old.id""").fetchall()
+    merged = {}
+    for listing_id, value in rows:
+        forwarded = merged.setdefault(listing_id, {})
+        for chat_id, message_ids in json.loads(value).items():
+            ids = forwarded.setdefault(chat_id, [])
+            ids.extend(message_id for message_id in message_ids if message_id not in ids)
+    for listing_id, forwarded in merged.items():
+        database.execute_sql("UPDATE houselisting_new SET forwarded_message_ids = ? WHERE id = ?",
+                             (json.dumps(forwarded), listing_id))
+
+def migrate_integer_post_id(database):
+    """
+    houselisting.post_id: TEXT -> indexed INTEGER, unique per source group.
+    SQLite cannot change a column type, so the table is rebuilt
+    (create new, copy, drop old, rename). Reposted duplicates are collapsed
+    into the newest row; a boost on any of the copies is kept, and so are the
+    forwarded message ids of all copies (otherwise they could never be deleted).
+    """
+    database.execute_sql("""
+        CREATE TABLE houselisting_new (
+            id INTEGER NOT NULL PRIMARY KEY,
+            post_id INTEGER NOT NULL,
+            post_url VARCHAR(255) NOT NULL,
+            source_message_id INTEGER,
+            status VARCHAR(255) NOT NULL,
+            boost_status VARCHAR(255) NOT NULL,
+            source_group_id INTEGER NOT NULL,
+            timestamp DATETIME NOT NULL,
+            media_group_id VARCHAR(255),
+            media_group_data TEXT,
+            caption TEXT,
+            error_details TEXT,
+            forwarded_message_ids TEXT
+        )""")
+    database.execute_sql("""
+        INSERT INTO houselisting_new
+        SELECT id, CAST(post_id AS INTEGER), post_url, source_message_id, status, boost_status,
+               source_group_id, timestamp, media_group_id, media_group_data, caption,
+               error_details, forwarded_message_ids
+        FROM houselisting
+        WHERE id IN (SELECT MAX(id) FROM houselisting
+                     GROUP BY source_group_id, CAST(post_id AS INTEGER))""")
+    database.execute_sql("""
+        UPDATE houselisting_new SET boost_status = 'boosted'
+        WHERE EXISTS (SELECT 1 FROM houselisting AS old
+                      WHERE old.source_group_id = houselisting_new.source_group_id
+                        AND CAST(old.post_id AS INTEGER) = houselisting_new.post_id
+                        AND old.boost_status = 'boosted')""")
+    merge_forwarded_message_ids(database)
+    before = database.execute_sql("SELECT COUNT(*) FROM houselisting").fetchone()[0]
+    after = database.execute_sql("SELECT COUNT(*) FROM houselisting_new").fetchone()[0]
+    database.execute_sql("DROP TABLE houselisting")
+    database.execute_sql("ALTER TABLE houselisting_new RENAME TO houselisting")
+    database.execute_sql("CREATE INDEX houselisting_post_id ON houselisting (post_id)")
+    database.execute_sql("CREATE INDEX houselisting_boost_status ON houselisting (boost_status)")
+    database.execute_sql(
+        "CREATE UNIQUE INDEX houselisting_source_group_id_post_id ON houselisting (source_group_id, post_id)")
+    database.execute_sql(
+        "CREATE INDEX houselisting_status_source_group_id ON houselisting (status, source_group_id)")
+    for table in ("send_queue", "deliverylease"):
+        if table_exists(database, table):
+            database.execute_sql(f"DELETE FROM {table} WHERE listing_id NOT IN (SELECT id FROM houselisting)")
+    if before != after:
+        logging.info(f"🧹 Migratsiya: {before - after} ta takroriy e'lon birlashtirildi.")
+
+def create_search_index(database):
+    """
+    FTS5 index over houselisting.caption (external content table, kept in
+    sync by triggers). Idempotent: called on every start, also for fresh databases.
+    """
+    database.execute_sql("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS listing_fts USING fts5(
+            caption, content='houselisting', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2'
+        )""")
+    database.execute_sql("""
+        CREATE TRIGGER IF NOT EXISTS houselisting_fts_ai AFTER INSERT ON houselisting BEGIN
+            INSERT INTO listing_fts(rowid, caption) VALUES (new.id, new.caption);
+        END""")
+    database.execute_sql("""
+        CREATE TRIGGER IF NOT EXISTS houselisting_fts_ad AFTER DELETE ON houselisting BEGIN
+            INSERT INTO listing_fts(listing_fts, rowid, caption) VALUES ('delete', old.id, old.caption);
+        END""")
+    database.execute_sql("""
+        CREATE TRIGGER IF NOT EXISTS houselisting_fts_au AFTER UPDATE OF caption ON houselisting BEGIN
+            INSERT INTO listing_fts(listing_fts, rowid, caption) VALUES ('delete', old.id, old.caption);
+            INSERT INTO listing_fts(rowid, caption) VALUES (new.id, new.caption);
+        END""")
+
+def migrate_caption_search_index(database):
+    create_search_index(database)
+    database.execute_sql("INSERT INTO listing_fts(listing_fts) VALUES ('rebuild')")
+
+def migrate_listing_updated_at(database):
+    database.execute_sql(
+        "ALTER TABLE houselisting ADD COLUMN updated_at DATETIME NOT NULL DEFAULT '1970-01-01 00:00:00'")
+    database.execute_sql("UPDATE houselisting SET updated_at = timestamp")
+    database.execute_sql("CREATE INDEX houselisting_updated_at_id ON houselisting (updated_at, id)")
+
+def migrate_listing_attributes(database):
+    # Qiymatlar ingest.backfill_attributes() tomonidan to'ldiriladi.
+    database.execute_sql("ALTER TABLE houselisting ADD COLUMN rooms INTEGER")
+    database.execute_sql("ALTER TABLE houselisting ADD COLUMN price INTEGER")
+    database.execute_sql("ALTER TABLE houselisting ADD COLUMN currency VARCHAR(255)")
+    database.execute_sql("ALTER TABLE houselisting ADD COLUMN district VARCHAR(255)")
+    database.execute_sql("CREATE INDEX houselisting_rooms_price ON houselisting (rooms, price)")
+    database.execute_sql("CREATE INDEX houselisting_price ON houselisting (price)")
+    database.execute_sql("CREATE INDEX houselisting_district_rooms ON houselisting (district, rooms)")
+
+def migrate_delivery_ledger(database):
+    """
+    houselisting.forwarded_message_ids (JSON {chat_id: [message_id, ...]}) -> delivery rows,
+    one per forwarded message, then the column is dropped. The old JSON only kept the
+    latest copy per chat, so that is all that can be carried over.
+    """
+    database.execute_sql("""
+        CREATE TABLE delivery (
+            id INTEGER NOT NULL PRIMARY KEY,
+            listing_id INTEGER NOT NULL REFERENCES houselisting (id) ON DELETE CASCADE,
+            target_chat_id INTEGER NOT NULL,
+            message_id INTEGER NOT NULL,
+            sent_at DATETIME NOT NULL,
+            cycle INTEGER NOT NULL
+        )""")
+    database.execute_sql(
+        "CREATE INDEX delivery_listing_id_target_chat_id_cycle ON delivery (listing_id, target_chat_id, cycle)")
+    database.execute_sql(
+        "CREATE UNIQUE INDEX delivery_target_chat_id_message_id ON delivery (target_chat_id, message_id)")
+    cycle = 0
+    if table_exists(database, "queuecursor"):
+        row = database.execute_sql("SELECT cycle FROM queuecursor WHERE name = 'forwarding'").fetchone()
+        cycle = row[0] if row else 0
+    database.execute_sql("""
+        INSERT OR IGNORE INTO delivery (listing_id, target_chat_id, message_id, sent_at, cycle)
+        SELECT h.id, CAST(chat.key AS INTEGER), message.value, h.updated_at, ?
+        FROM houselisting AS h, json_each(h.forwarded_message_ids) AS chat, json_each(chat.value) AS message
+        WHERE h.forwarded_message_ids IS NOT NULL AND json_valid(h.forwarded_message_ids)""", (cycle,))
+    count = database.execute_sql("SELECT COUNT(*) FROM delivery").fetchone()[0]
+    database.execute_sql("ALTER TABLE houselisting DROP COLUMN forwarded_message_ids")
+    if count:
+        logging.info(f"📬 Migratsiya: {count} ta yuborilgan xabar delivery jadvaliga ko'chirildi.")
+
+def migrate_job_retries(database):
+    """
+    job.attempts / job.next_attempt_at: failed jobs are retried with a backoff instead of
+    being left as "error". Jobs that already failed get another round of attempts.
+    """
+    if not table_exists(database, "job"):
+        return  # jadval create_tables() da yangi ustunlar bilan yaratiladi
+    database.execute_sql("ALTER TABLE job ADD COLUMN attempts INTEGER NOT NULL DEFAULT 0")
+    database.execute_sql("ALTER TABLE job ADD COLUMN next_attempt_at DATETIME")
+    count = database.execute_sql("UPDATE job SET status = 'pending', attempts = 1 WHERE status = 'error'").rowcount
+    if count:
+        logging.info(f"🔁 Migratsiya: {count} ta xato bilan tugagan job qayta navbatga qo'yildi.")
+
+
+MIGRATIONS = [
+    (1, migrate_integer_post_id),
+    (2, migrate_caption_search_index),
+    (3, migrate_listing_updated_at),
+    (4, migrate_listing_attributes),
+    (5, migrate_delivery_ledger),
+    (6, migrate_job_retries),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+def run_migrations(database):
+    version = get_version(database)
+    for target, migration in MIGRATIONS:
+        if target <= version:
+            continue
+        logging.info(f"🛠️ Ma'lumotlar bazasi migratsiyasi: v{version} -> v{target} ({migration.__name__})")
+        with database.atomic():
+            migration(database)
+            set_version(database, target)
+        version = target
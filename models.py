@@ -1,12 +1,19 @@
 import datetime
 from peewee import *
+from playhouse.sqlite_ext import AutoIncrementField
 from passlib.context import CryptContext
+from config import BCRYPT_ROUNDS
+from migrations import run_migrations, set_version, create_search_index, LATEST_VERSION
 
-# SQLite ma'lumotlar bazasi
-db = SqliteDatabase('house_listings.db')
+# SQLite ma'lumotlar bazasi (WAL: o'qish yozishni kutmaydi)
+db = SqliteDatabase('house_listings.db', pragmas={
+    'journal_mode': 'wal',
+    'synchronous': 'normal',
+    'busy_timeout': 5000,
+})
 
 # Parol hashing uchun kontekst
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
 
 class User(Model):
     username = CharField(unique=True)
@@ -25,22 +32,195 @@ class User(Model):
         return cls.create(username=username, hashed_password=hashed, is_admin=is_admin)
 
 class HouseListing(Model):
-    post_id = CharField()
+    post_id = IntegerField(index=True)
     post_url = CharField()
     source_message_id = IntegerField(null=True)
     status = CharField(default="active")  # active, sent, deleted, error
-    boost_status = CharField(default="unboosted")  # yangi ustun: boosted, unboosted
+    boost_status = CharField(default="unboosted", index=True)  # yangi ustun: boosted, unboosted
     source_group_id = BigIntegerField()
     timestamp = DateTimeField(default=datetime.datetime.now)
     media_group_id = CharField(null=True)
     media_group_data = TextField(null=True)
     caption = TextField(null=True)
     error_details = TextField(null=True)
-    forwarded_message_ids = TextField(null=True)  # JSON formatida
+    updated_at = DateTimeField(default=datetime.datetime.now)  # /api/listings?since= uchun
+    # Matndan ajratib olingan atributlar (extraction.extract), filtrlash uchun indekslangan
+    rooms = IntegerField(null=True)
+    price = IntegerField(null=True, index=True)
+    currency = CharField(null=True)  # USD yoki UZS
+    district = CharField(null=True)
 
     class Meta:
         database = db
+        indexes = (
+            (("source_group_id", "post_id"), True),
+            (("status", "source_group_id"), False),
+            (("updated_at", "id"), False),
+            (("rooms", "price"), False),
+            (("district", "rooms"), False),
+        )
+
+    def save(self, *args, **kwargs):
+        self.updated_at = datetime.datetime.now()
+        return super().save(*args, **kwargs)
+
+    @classmethod
+    def _on_repost(cls, query):
+        """ON CONFLICT clause of upsert(): the repost's fields win, but a deleted listing stays deleted."""
+        return query.on_conflict(
+            conflict_target=[cls.source_group_id, cls.post_id],
+            preserve=[cls.post_url, cls.source_message_id, cls.timestamp, cls.updated_at,
+                      cls.media_group_id, cls.media_group_data, cls.caption,
+                      cls.rooms, cls.price, cls.currency, cls.district],
+            update={cls.status: Case(None, [(cls.status == "deleted", cls.status)], EXCLUDED.status)},
+        )
+
+    @classmethod
+    def upsert(cls, **fields):
+        """
+        Reposted listing (same source group and post_id) replaces the old media and caption.
+        Returns (listing, previous) where previous is the replaced row's
+        (status, boost_status), or None if the listing was created.
+        """
+        key = (cls.source_group_id == fields["source_group_id"]) & (cls.post_id == fields["post_id"])
+        previous = cls.select(cls.status, cls.boost_status).where(key).tuples().first()
+        cls._on_repost(cls.insert(**fields)).execute()
+        return cls.get(key), previous
+
+    @classmethod
+    def upsert_many(cls, rows: list, chunk_size: int = 100) -> dict:
+        """
+        Batched upsert(): a repost inside the batch wins over earlier copies.
+        Returns {(source_group_id, post_id): (listing, previous)}.
+        """
+        latest = {}
+        for fields in rows:
+            latest[(fields["source_group_id"], fields["post_id"])] = fields
+        keys = list(latest)
+        key = Tuple(cls.source_group_id, cls.post_id)
+        previous = {}
+        for chunk in chunked(keys, chunk_size):
+            query = (cls.select(cls.source_group_id, cls.post_id, cls.status, cls.boost_status)
+                     .where(key.in_(chunk)).tuples())
+            for group_id, post_id, status, boost_status in query:
+                previous[(group_id, post_id)] = (status, boost_status)
+        for chunk in chunked(list(latest.values()), chunk_size):
+            cls._on_repost(cls.insert_many(chunk)).execute()
+        result = {}
+        for chunk in chunked(keys, chunk_size):
+            for listing in cls.select().where(key.in_(chunk)):
+                group_key = (listing.source_group_id, listing.post_id)
+                result[group_key] = (listing, previous.get(group_key))
+        return result
+
+class QueueItem(Model):
+    # AUTOINCREMENT: seq values are never reused, so the cursor only moves forward.
+    seq = AutoIncrementField()
+    listing = ForeignKeyField(HouseListing, unique=True, backref="queue_items", on_delete="CASCADE")
+
+    class Meta:
+        database = db
+        table_name = "send_queue"
+
+class QueueCursor(Model):
+    name = CharField(primary_key=True)
+    position = IntegerField(default=0)  # oxirgi to'liq yuborilgan QueueItem.seq
+    cycle = IntegerField(default=0)
+
+    class Meta:
+        database = db
+
+class DeliveryLease(Model):
+    listing = ForeignKeyField(HouseListing, backref="leases", on_delete="CASCADE")
+    target_chat_id = BigIntegerField()
+    cycle = IntegerField()
+    status = CharField(default="leased")  # leased, acked
+    leased_at = DateTimeField(default=datetime.datetime.now)
+    acked_at = DateTimeField(null=True)
+
+    class Meta:
+        database = db
+        indexes = (
+            (("listing", "cycle", "target_chat_id"), True),
+        )
+
+class Delivery(Model):
+    # Kanalga yuborilgan har bir xabar (albomda har bir qism alohida qator).
+    listing = ForeignKeyField(HouseListing, backref="deliveries", on_delete="CASCADE", index=False)
+    target_chat_id = BigIntegerField()
+    message_id = BigIntegerField()
+    sent_at = DateTimeField(default=datetime.datetime.now)
+    cycle = IntegerField(default=0)
+
+    class Meta:
+        database = db
+        indexes = (
+            (("listing", "target_chat_id", "cycle"), False),  # e'lonning barcha nusxalari
+            (("target_chat_id", "message_id"), True),          # xabar qaysi e'longa tegishli
+        )
+
+class FailedDelivery(Model):
+    # Yuborilmagan (e'lon, kanal) juftliklari: qayta urinish navbati va dead-letter ro'yxati (retries.py).
+    listing = ForeignKeyField(HouseListing, backref="failed_deliveries", on_delete="CASCADE", index=False)
+    target_chat_id = BigIntegerField()
+    cycle = IntegerField(default=0)
+    attempts = IntegerField(default=0)
+    status = CharField(default="retrying")  # retrying, dead
+    next_attempt_at = DateTimeField(default=datetime.datetime.now)
+    last_error = TextField(null=True)
+    created_at = DateTimeField(default=datetime.datetime.now)
+    updated_at = DateTimeField(default=datetime.datetime.now)
+
+    class Meta:
+        database = db
+        indexes = (
+            (("listing", "target_chat_id"), True),
+            (("status", "next_attempt_at"), False),
+        )
+
+class Job(Model):
+    # Veb panel amallari bot jarayoniga shu navbat orqali yuboriladi (jobs.py).
+    kind = CharField()
+    payload = TextField(default="{}")
+    status = CharField(default="pending")  # pending, done, dead
+    error = TextField(null=True)
+    attempts = IntegerField(default=0)
+    next_attempt_at = DateTimeField(null=True)  # qayta urinish shu vaqtgacha kutadi
+    created_at = DateTimeField(default=datetime.datetime.now)
+    finished_at = DateTimeField(null=True)
+
+    class Meta:
+        database = db
+        indexes = (
+            (("status", "id"), False),
+        )
+
+class Setting(Model):
+    # Jarayonlar o'rtasida bo'lishiladigan kichik holat (masalan, yuborish rejimi).
+    name = CharField(primary_key=True)
+    value = TextField()
+    updated_at = DateTimeField(default=datetime.datetime.now)
+
+    class Meta:
+        database = db
+
+    @classmethod
+    def put(cls, name: str, value: str):
+        cls.replace(name=name, value=value, updated_at=datetime.datetime.now()).execute()
+
+    @classmethod
+    def get_value(cls, name: str, default: str = None) -> str:
+        row = cls.get_or_none(cls.name == name)
+        return row.value if row is not None else default
 
 def initialize_db():
     db.connect()
-    db.create_tables([User, HouseListing], safe=True)
\ No newline at end of file
+    if db.table_exists(HouseListing._meta.table_name):
+        # Mavjud bazani joriy sxemaga yangilash (yangi jadvallardan oldin)
+        run_migrations(db)
+    else:
+        set_version(db, LATEST_VERSION)
+    db.create_tables([User, HouseListing, QueueItem, QueueCursor, DeliveryLease, Delivery, FailedDelivery,
+                      Job, Setting],
+                     safe=True)
+    create_search_index(db)
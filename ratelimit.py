@@ -0,0 +1,92 @@
+import asyncio
+import logging
+import time
+from aiogram.utils.exceptions import RetryAfter
+from metrics import RETRY_AFTER
+from config import GLOBAL_SEND_RATE, CHAT_SEND_PER_MINUTE, CHAT_SEND_BURST
+
+
+class TokenBucket:
+    """
+    Classic token bucket: `rate` tokens per second, at most `capacity` stored.
+    A bucket can also be blocked for a while (Telegram RetryAfter).
+    """
+
+    def __init__(self, rate: float, capacity: float, clock=time.monotonic):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.clock = clock
+        self.updated_at = clock()
+        self.blocked_until = 0.0
+        self._lock = None  # created lazily inside the running loop
+
+    def _refill(self, now: float):
+        elapsed = now - self.updated_at
+        if elapsed > 0:
+            self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+            self.updated_at = now
+
+    def block(self, seconds: float):
+        self.blocked_until = max(self.blocked_until, self.clock() + seconds)
+
+    async def acquire(self, tokens: float = 1):
+        # An album bigger than the bucket would never fit otherwise.
+        tokens = min(tokens, self.capacity)
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:  # waiters are served in FIFO order
+            while True:
+                now = self.clock()
+                if now < self.blocked_until:
+                    await asyncio.sleep(self.blocked_until - now)
+                    continue
+                self._refill(now)
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return
+                await asyncio.sleep((tokens - self.tokens) / self.rate)
+
+
+class RateLimiter:
+    """
+    Per-chat buckets plus one global bucket for the whole bot.
+    RetryAfter only blocks the bucket of the chat that returned it.
+    """
+
+    def __init__(self, global_rate: float, chat_rate: float, chat_burst: float):
+        self.global_bucket = TokenBucket(global_rate, global_rate)
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.chat_buckets = {}
+
+    def bucket(self, chat_id: int) -> TokenBucket:
+        bucket = self.chat_buckets.get(chat_id)
+        if bucket is None:
+            bucket = self.chat_buckets[chat_id] = TokenBucket(self.chat_rate, self.chat_burst)
+        return bucket
+
+    async def acquire(self, chat_id: int, cost: float = 1):
+        await self.bucket(chat_id).acquire(cost)
+        await self.global_bucket.acquire(cost)
+
+    async def call(self, chat_id: int, request, cost: float = 1, max_retries: int = 3):
+        """
+        `request` is a zero-argument callable returning a fresh coroutine,
+        so it can be re-issued after RetryAfter.
+        """
+        attempt = 0
+        while True:
+            await self.acquire(chat_id, cost)
+            try:
+                return await request()
+            except RetryAfter as e:
+                attempt += 1
+                RETRY_AFTER.labels(str(chat_id)).inc()
+                logging.warning(f"⏳ {chat_id} uchun RetryAfter: {e.timeout} soniya (urinish {attempt})")
+                self.bucket(chat_id).block(e.timeout)
+                if attempt > max_retries:
+                    raise
+
+
+limiter = RateLimiter(GLOBAL_SEND_RATE, CHAT_SEND_PER_MINUTE / 60, CHAT_SEND_BURST)
@@ -0,0 +1,220 @@
+"""
+Failed deliveries: retry queue, per-target circuit breaker and admin alert digest.
+
+A failed (listing, target) send becomes a FailedDelivery row that forwarding.retry_task
+re-sends after an exponential backoff with jitter. After RETRY_MAX_ATTEMPTS the row is
+dead-lettered and shown on the dashboard. A target that keeps failing is paused by the
+circuit breaker, so an outage costs neither the rate limit nor the admin chat; sends to it
+are deferred into the retry queue. Admin alerts are rolled up into one message per
+ALERT_DIGEST_INTERVAL.
+"""
+import asyncio
+import datetime
+import logging
+import random
+import time
+from typing import Optional
+from aiogram import Bot
+from peewee import fn
+from models import FailedDelivery, HouseListing
+from config import (RETRY_BASE_DELAY, RETRY_MAX_DELAY, RETRY_MAX_ATTEMPTS, CIRCUIT_FAILURES, CIRCUIT_COOLDOWN,
+                    ALERT_DIGEST_INTERVAL, ADMIN_IDS)
+from metrics import DELIVERY_RETRIES, FAILED_DELIVERIES, CIRCUITS_OPEN
+from ratelimit import limiter
+import storage
+
+
+class CircuitBreaker:
+    """
+    Per-target breaker. After `threshold` consecutive failures the target is open (paused)
+    for `cooldown` seconds; then a single probe send is let through (half-open). Success
+    closes it; a failed probe opens it again with the cooldown doubled, up to 8x.
+    """
+
+    def __init__(self, threshold: int, cooldown: float, clock=time.monotonic):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.clock = clock
+        self.failures = {}    # target -> ketma-ket xatolar
+        self.open_until = {}  # target -> qachongacha to'xtatilgan
+        self.trips = {}       # target -> ketma-ket ochilishlar soni
+        self.probing = set()
+
+    def blocked(self, target: int) -> bool:
+        """True while sends to `target` must not be attempted (no side effects)."""
+        until = self.open_until.get(target)
+        return until is not None and (target in self.probing or self.clock() < until)
+
+    def allow(self, target: int) -> bool:
+        """Like `not blocked()`, but a half-open target is handed out to one caller only."""
+        if self.blocked(target):
+            return False
+        if target in self.open_until:
+            self.probing.add(target)
+        return True
+
+    def retry_in(self, target: int) -> float:
+        until = self.open_until.get(target)
+        return max(0.0, until - self.clock()) if until is not None else 0.0
+
+    def success(self, target: int) -> bool:
+        """Returns True if this closed an open circuit."""
+        self.failures.pop(target, None)
+        self.probing.discard(target)
+        self.trips.pop(target, None)
+        return self.open_until.pop(target, None) is not None
+
+    def failure(self, target: int) -> bool:
+        """Returns True if this opened a closed circuit."""
+        self.probing.discard(target)
+        self.failures[target] = self.failures.get(target, 0) + 1
+        was_open = target in self.open_until
+        if not was_open and self.failures[target] < self.threshold:
+            return False
+        self.trips[target] = self.trips.get(target, 0) + 1
+        self.open_until[target] = self.clock() + self.cooldown * min(2 ** (self.trips[target] - 1), 8)
+        return not was_open
+
+    def open_targets(self) -> list:
+        return list(self.open_until)
+
+
+class AlertDigest:
+    """Collects failures and breaker events; render() returns one admin message and resets."""
+
+    def __init__(self):
+        self.failures = {}  # target -> [count, post_ids, last_error]
+        self.events = []
+
+    def failure(self, target: int, post_id: int, error: str):
+        entry = self.failures.setdefault(target, [0, [], ""])
+        entry[0] += 1
+        if len(entry[1]) < 10:
+            entry[1].append(post_id)
+        entry[2] = error
+
+    def event(self, text: str):
+        self.events.append(text)
+
+    def render(self) -> Optional[str]:
+        if not self.failures and not self.events:
+            return None
+        lines = [f"🚨 Oxirgi {ALERT_DIGEST_INTERVAL / 60:.0f} daqiqadagi yuborish xatolari:"]
+        for target, (count, post_ids, error) in sorted(self.failures.items(), key=lambda kv: -kv[1][0]):
+            more = "…" if count > len(post_ids) else ""
+            lines.append(f"• {target}: {count} ta xato (e'lonlar: {', '.join(map(str, post_ids))}{more}). "
+                         f"Oxirgisi: {error[:200]}")
+        lines.extend(self.events[-20:])
+        self.failures, self.events = {}, []
+        return "\n".join(lines)[:4000]
+
+
+breaker = CircuitBreaker(CIRCUIT_FAILURES, CIRCUIT_COOLDOWN)
+digest = AlertDigest()
+
+
+def backoff(attempts: int) -> float:
+    """Seconds before retry number `attempts`: exponential, capped, with ±50% jitter."""
+    delay = min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** max(0, attempts - 1))
+    return delay * random.uniform(0.5, 1.5)
+
+def schedule(listing_id: int, targets: list, cycle: int, error: str, min_delay: float = 0.0,
+             count_attempt: bool = True) -> dict:
+    """Upsert retry rows for one listing; returns {target: status} ("retrying" or "dead")."""
+    now = datetime.datetime.now()
+    existing = {row.target_chat_id: row for row in
+                FailedDelivery.select().where((FailedDelivery.listing == listing_id) &
+                                              (FailedDelivery.target_chat_id.in_(targets)))}
+    statuses = {}
+    for target in targets:
+        row = existing.get(target)
+        attempts = (row.attempts if row is not None else 0) + (1 if count_attempt else 0)
+        status = "dead" if attempts >= RETRY_MAX_ATTEMPTS else "retrying"
+        delay = max(min_delay, backoff(attempts)) if count_attempt else min_delay
+        fields = {"cycle": cycle, "attempts": attempts, "status": status, "last_error": error,
+                  "next_attempt_at": now + datetime.timedelta(seconds=delay), "updated_at": now}
+        if row is None:
+            FailedDelivery.create(listing=listing_id, target_chat_id=target, **fields)
+        else:
+            FailedDelivery.update(**fields).where(FailedDelivery.id == row.id).execute()
+        statuses[target] = status
+    return statuses
+
+def due(limit: int = 100) -> list:
+    return list(FailedDelivery
+                .select(FailedDelivery, HouseListing)
+                .join(HouseListing)
+                .where((FailedDelivery.status == "retrying") &
+                       (FailedDelivery.next_attempt_at <= datetime.datetime.now()))
+                .order_by(FailedDelivery.next_attempt_at)
+                .limit(limit))
+
+def resolve(row_id: int):
+    FailedDelivery.delete().where(FailedDelivery.id == row_id).execute()
+
+def requeue(row_id: int) -> int:
+    """Dashboard: give a dead-lettered delivery a fresh set of attempts."""
+    return (FailedDelivery
+            .update(status="retrying", attempts=0, next_attempt_at=datetime.datetime.now(),
+                    updated_at=datetime.datetime.now())
+            .where(FailedDelivery.id == row_id)
+            .execute())
+
+def counts() -> dict:
+    query = (FailedDelivery
+             .select(FailedDelivery.status, fn.COUNT(FailedDelivery.id))
+             .group_by(FailedDelivery.status)
+             .tuples())
+    return {"retrying": 0, "dead": 0, **dict(query)}
+
+def dead_letters(limit: int = 20) -> list:
+    return list(FailedDelivery
+                .select(FailedDelivery, HouseListing)
+                .join(HouseListing)
+                .where(FailedDelivery.status == "dead")
+                .order_by(FailedDelivery.updated_at.desc())
+                .limit(limit))
+
+
+async def failed(listing: HouseListing, target: int, cycle: int, error: Exception):
+    """One send to `target` failed: feed the breaker and the digest, schedule a retry."""
+    if breaker.failure(target):
+        digest.event(f"⛔ {target}: ketma-ket {breaker.threshold} ta xato, kanal "
+                     f"{breaker.retry_in(target):.0f} soniyaga to'xtatildi.")
+        logging.warning(f"⛔ Circuit breaker: {target} to'xtatildi")
+    digest.failure(target, listing.post_id, str(error))
+    statuses = await storage.write(schedule, listing.id, [target], cycle, str(error), breaker.retry_in(target))
+    if statuses[target] == "dead":
+        DELIVERY_RETRIES.labels("dead").inc()
+        digest.event(f"🪦 E'lon {listing.post_id} → {target}: {RETRY_MAX_ATTEMPTS} ta urinishdan keyin "
+                     f"dead-letter ro'yxatiga o'tdi.")
+    else:
+        DELIVERY_RETRIES.labels("scheduled").inc()
+
+async def deferred(listing: HouseListing, targets: list, cycle: int):
+    """Targets skipped because their circuit is open: retry after the pause, no attempt used."""
+    delay = max(breaker.retry_in(target) for target in targets)
+    await storage.write(schedule, listing.id, targets, cycle, "circuit open", delay, count_attempt=False)
+    DELIVERY_RETRIES.labels("deferred").inc(len(targets))
+
+def succeeded(target: int):
+    if breaker.success(target):
+        digest.event(f"✅ {target}: kanalga yuborish tiklandi.")
+        logging.info(f"✅ Circuit breaker: {target} qayta ochildi")
+
+
+async def alert_digest_task(bot: Bot):
+    while True:
+        await asyncio.sleep(ALERT_DIGEST_INTERVAL)
+        text = digest.render()
+        if not text or not ADMIN_IDS:
+            continue
+        try:
+            await limiter.call(ADMIN_IDS[0], lambda: bot.send_message(chat_id=ADMIN_IDS[0], text=text))
+        except Exception as e:
+            logging.error(f"❌ Adminga xatolar hisobotini yuborib bo'lmadi: {e}")
+
+
+CIRCUITS_OPEN.set_function(lambda: len(breaker.open_targets()))
+for _status in ("retrying", "dead"):
+    FAILED_DELIVERIES.labels(_status).set_function(lambda key=_status: counts()[key])
@@ -0,0 +1,100 @@
+import json
+import logging
+import os
+import re
+from collections import defaultdict
+from config import TARGET_GROUPS, ROUTING_RULES, ROUTING_RULES_FILE, ROUTING_FALLBACK
+from extraction import fold
+
+# E'lonni qaysi kanallarga yuborishni deklarativ qoidalar belgilaydi. Har bir qoidada bitta
+# shart va "targets" bo'ladi; shart qiymati bitta qiymat yoki ro'yxat bo'lishi mumkin:
+#   {"source": -1001, "targets": [-1002]}      manba guruh bo'yicha
+#   {"rooms": [3, 4], "targets": [-1003]}      xonalar soni bo'yicha (HouseListing.rooms)
+#   {"district": "Karmana", "targets": [...]}  hudud bo'yicha (HouseListing.district)
+#   {"keyword": "ijara", "targets": [...]}     matndagi so'z bo'yicha (kirill/lotin farqi yo'q)
+# Qoidalar ishga tushishda qidiruv jadvaliga kompilyatsiya qilinadi; e'lon barcha mos
+# qoidalar maqsadlari birlashmasiga yuboriladi. Hech bir qoida mos kelmasa — ROUTING_FALLBACK.
+
+RULE_KEYS = ("source", "rooms", "district", "keyword")
+
+
+def load_rules() -> list:
+    """ROUTING_RULES (JSON in env) takes precedence over ROUTING_RULES_FILE."""
+    if ROUTING_RULES:
+        return json.loads(ROUTING_RULES)
+    if ROUTING_RULES_FILE and os.path.exists(ROUTING_RULES_FILE):
+        with open(ROUTING_RULES_FILE, encoding="utf-8") as f:
+            return json.load(f)
+    return []
+
+
+def _as_list(value) -> list:
+    return value if isinstance(value, list) else [value]
+
+
+class Router:
+    def __init__(self, rules: list, fallback: list):
+        self.fallback = list(fallback)
+        self.by_source = defaultdict(set)
+        self.by_rooms = defaultdict(set)
+        self.by_district = defaultdict(set)
+        self.by_keyword = defaultdict(set)
+        self.order = {}  # maqsadlar qoidalarda birinchi uchragan tartibda qaytariladi
+        for number, rule in enumerate(rules, 1):
+            keys = [key for key in RULE_KEYS if key in rule]
+            if len(keys) != 1 or not rule.get("targets"):
+                raise ValueError(f"Routing qoidasi #{number} da bitta shart ({', '.join(RULE_KEYS)}) "
+                                 f"va bo'sh bo'lmagan 'targets' bo'lishi kerak: {rule}")
+            key = keys[0]
+            targets = [int(target) for target in _as_list(rule["targets"])]
+            for target in targets:
+                self.order.setdefault(target, len(self.order))
+            for value in _as_list(rule[key]):
+                if key == "source":
+                    self.by_source[int(value)].update(targets)
+                elif key == "rooms":
+                    self.by_rooms[int(value)].update(targets)
+                elif key == "district":
+                    self.by_district[str(value).lower()].update(targets)
+                else:
+                    self.by_keyword[fold(str(value))].update(targets)
+        for target in self.fallback:
+            self.order.setdefault(target, len(self.order))
+        self.keyword_regex = None
+        if self.by_keyword:
+            words = sorted(self.by_keyword, key=len, reverse=True)
+            self.keyword_regex = re.compile(r"\b(?:" + "|".join(re.escape(word) for word in words) + r")")
+        self.rule_count = len(rules)
+
+    def targets(self, listing) -> list:
+        """Target chats for one listing: dict lookups plus one keyword scan of the caption."""
+        matched = set()
+        matched |= self.by_source.get(listing.source_group_id, set())
+        if listing.rooms is not None:
+            matched |= self.by_rooms.get(listing.rooms, set())
+        if listing.district:
+            matched |= self.by_district.get(listing.district.lower(), set())
+        if self.keyword_regex is not None and listing.caption:
+            for word in set(self.keyword_regex.findall(fold(listing.caption))):
+                matched |= self.by_keyword[word]
+        if not matched:
+            return list(self.fallback)
+        return sorted(matched, key=self.order.__getitem__)
+
+    def all_targets(self) -> list:
+        return sorted(self.order, key=self.order.__getitem__)
+
+
+def build_router() -> Router:
+    rules = load_rules()
+    if not rules:
+        # Qoidalar yo'q: avvalgidek barcha TARGET_GROUPS ga yuboriladi.
+        return Router([], TARGET_GROUPS)
+    fallback = TARGET_GROUPS if ROUTING_FALLBACK == "all" else []
+    router = Router(rules, fallback)
+    logging.info(f"🧭 {router.rule_count} ta yo'naltirish qoidasi yuklandi "
+                 f"({len(router.all_targets())} ta maqsad kanal).")
+    return router
+
+
+router = build_router()
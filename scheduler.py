@@ -0,0 +1,160 @@
+import datetime
+import threading
+import time
+from typing import Optional
+import pytz
+from models import HouseListing
+
+
+class StrideScheduler:
+    """
+    Stride scheduling between named flows (e.g. "regular" and "boosted").
+    A flow with weight w gets w/(sum of weights) of the send slots, and slots
+    are spaced `interval` seconds apart on the injected clock.
+    """
+    STRIDE1 = 1 << 20
+
+    def __init__(self, interval: float, clock=time.monotonic):
+        self.interval = interval
+        self.clock = clock
+        self.flows = {}  # name -> [stride, pass]
+        self.global_pass = 0
+        self.next_at = None
+        self.slot_start = None
+
+    def add_flow(self, name: str, weight: int):
+        weight = max(1, int(weight))
+        stride = self.STRIDE1 // weight
+        self.flows[name] = [stride, self.global_pass + stride]
+
+    def pick(self, ready: list) -> Optional[str]:
+        """Choose the ready flow with the smallest pass value and charge it one stride."""
+        candidates = [name for name in ready if name in self.flows]
+        if not candidates:
+            return None
+        for name in candidates:
+            # A flow that sat idle must not bank credit and burst afterwards.
+            flow = self.flows[name]
+            flow[1] = max(flow[1], self.global_pass)
+        name = min(candidates, key=lambda n: (self.flows[n][1], list(self.flows).index(n)))
+        flow = self.flows[name]
+        self.global_pass = flow[1]
+        flow[1] += flow[0]
+        now = self.clock()
+        # Anchor on the planned slot time unless we were idle for a whole interval or more.
+        if self.next_at is None or now - self.next_at >= self.interval:
+            self.slot_start = now
+        else:
+            self.slot_start = self.next_at
+        return name
+
+    def delay(self) -> float:
+        """Seconds left until the current slot starts."""
+        if self.next_at is None:
+            return 0.0
+        return max(0.0, self.next_at - self.clock())
+
+    def slot_done(self, slots: int = 1):
+        """
+        Schedule the next slot one interval after this slot started, not after the send finished.
+        A batch that delivered several listings at once uses up `slots` intervals.
+        """
+        now = self.clock()
+        start = now if self.slot_start is None else self.slot_start
+        self.next_at = max(start + self.interval * slots, now)
+
+
+class QuietHours:
+    """Daily window such as "23:00-07:00" (may wrap midnight) during which nothing is sent."""
+
+    def __init__(self, spec: str, timezone: str):
+        self.tz = pytz.timezone(timezone)
+        self.window = None
+        if spec.strip():
+            try:
+                start, end = (self._minutes(part) for part in spec.split("-"))
+            except ValueError:
+                raise ValueError(f"QUIET_HOURS noto'g'ri: {spec!r} (masalan: 23:00-07:00)")
+            if start != end:
+                self.window = (start, end)
+
+    @staticmethod
+    def _minutes(text: str) -> int:
+        hours, minutes = text.strip().split(":")
+        value = int(hours) * 60 + int(minutes)
+        if not 0 <= value < 24 * 60:
+            raise ValueError(text)
+        return value
+
+    def seconds_left(self, now: datetime.datetime = None) -> float:
+        """0 outside quiet hours, otherwise seconds until they end."""
+        if self.window is None:
+            return 0.0
+        now = now.astimezone(self.tz) if now is not None else datetime.datetime.now(self.tz)
+        minute = now.hour * 60 + now.minute + (now.second + now.microsecond / 1e6) / 60
+        start, end = self.window
+        inside = start <= minute < end if start < end else (minute >= start or minute < end)
+        if not inside:
+            return 0.0
+        return ((end - minute) % (24 * 60)) * 60
+
+
+class BoostedSet:
+    """
+    In-memory round-robin over boosted listing ids, reloaded only after invalidate().
+
+    has_any()/next_listing() run on the DB read pool while invalidate() is called on the
+    event loop, so the state is guarded by a lock (never held during a query) and a load
+    that an invalidate() overtook is thrown away instead of caching stale ids.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.ids = None
+        self.position = 0
+        self.generation = 0
+
+    def invalidate(self):
+        with self.lock:
+            self.ids = None
+            self.generation += 1
+
+    def _query(self) -> list:
+        query = (HouseListing
+                 .select(HouseListing.id)
+                 .where((HouseListing.boost_status == "boosted") & (HouseListing.status != "deleted"))
+                 .order_by(HouseListing.id))
+        return [row.id for row in query]
+
+    def _load(self) -> list:
+        with self.lock:
+            if self.ids is not None:
+                return self.ids
+            generation = self.generation
+        ids = self._query()
+        with self.lock:
+            if self.generation == generation:
+                self.ids, self.position = ids, 0
+        return ids
+
+    def has_any(self) -> bool:
+        return bool(self._load())
+
+    def next_listing(self) -> Optional[HouseListing]:
+        ids = self._load()
+        if not ids:
+            return None
+        with self.lock:
+            listing_id = ids[self.position % len(ids)]
+            self.position = (self.position + 1) % len(ids)
+        listing = HouseListing.get_or_none(HouseListing.id == listing_id)
+        if listing is None or listing.boost_status != "boosted":
+            self.invalidate()
+            return None
+        return listing
+
+
+boosted = BoostedSet()
+
+def invalidate_boosted():
+    boosted.invalidate()
@@ -1,7 +1,14 @@
+import asyncio
 import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from typing import Optional
 import jwt
+from config import TOKEN_CACHE_SIZE, TOKEN_CACHE_TTL, PASSWORD_HASH_WORKERS
+from models import pwd_context
 
 # Ishlab chiqarishda ushbu kalitni atrof-muhit o'zgaruvchilardan olish tavsiya etiladi
 SECRET_KEY = "your-very-secret-key"
@@ -21,3 +28,71 @@ def verify_token(token: str) -> Optional[dict]:
         return payload
     except jwt.PyJWTError:
         return None
+
+
+class TokenCache:
+    """
+    LRU of token -> user for authenticated requests, so they skip the JWT decode and the
+    User query. An entry lives `ttl` seconds (never past the token's own exp); that also
+    bounds how long another web worker can serve a user changed elsewhere.
+    """
+
+    def __init__(self, maxsize: int = TOKEN_CACHE_SIZE, ttl: float = TOKEN_CACHE_TTL, clock=time.time):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock
+        self.entries = OrderedDict()  # token -> (user, expires_at)
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.maxsize > 0 and self.ttl > 0
+
+    def get(self, token: str):
+        if not self.enabled:
+            return None
+        with self.lock:
+            entry = self.entries.get(token)
+            if entry is None or entry[1] <= self.clock():
+                if entry is not None:
+                    del self.entries[token]
+                self.misses += 1
+                return None
+            self.entries.move_to_end(token)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, token: str, user, token_exp: float):
+        if not self.enabled:
+            return
+        with self.lock:
+            self.entries[token] = (user, min(self.clock() + self.ttl, token_exp))
+            self.entries.move_to_end(token)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def invalidate_user(self, user_id: int):
+        """Drop every cached token of a user (profile change)."""
+        with self.lock:
+            for token in [token for token, (user, _) in self.entries.items() if user.id == user_id]:
+                del self.entries[token]
+
+
+token_cache = TokenCache()
+
+# bcrypt ataylab sekin: alohida kichik pulda, shunda kirishlar oqimi event loop'ni ham,
+# DB o'qish pulini ham band qilmaydi (navbatda kutadi).
+_hash_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="bcrypt")
+
+async def check_password(user, password: str) -> bool:
+    """bcrypt verify off the event loop; with no user a dummy verify keeps the timing the same."""
+    loop = asyncio.get_running_loop()
+    if user is None:
+        await loop.run_in_executor(_hash_executor, pwd_context.dummy_verify)
+        return False
+    return await loop.run_in_executor(_hash_executor, pwd_context.verify, password, user.hashed_password)
+
+async def hash_password(password: str) -> str:
+    return await asyncio.get_running_loop().run_in_executor(_hash_executor, pwd_context.hash, password)
@@ -0,0 +1,160 @@
+"""
+Durable send queue for forwarding_task.
+
+Every listing gets one QueueItem with a monotonically increasing `seq`.
+A single QueueCursor row remembers the last fully delivered `seq` and the
+current cycle number, and DeliveryLease rows record each (listing, target)
+delivery of the cycle. After a crash the cursor still points at the item
+that was in flight, and its already acked targets are skipped.
+"""
+import datetime
+from typing import Optional
+from peewee import JOIN
+from models import db, HouseListing, QueueItem, QueueCursor, DeliveryLease
+from config import SOURCE_GROUPS
+
+CURSOR_NAME = "forwarding"
+
+def enqueue(listing: HouseListing):
+    QueueItem.insert(listing=listing).on_conflict_ignore().execute()
+
+def sync():
+    """Enqueue every listing that has no queue item yet (in post_id order)."""
+    missing = (HouseListing
+               .select(HouseListing.id)
+               .join(QueueItem, JOIN.LEFT_OUTER)
+               .where(QueueItem.seq.is_null())
+               .order_by(HouseListing.post_id, HouseListing.id))
+    QueueItem.insert_from(missing, [QueueItem.listing]).on_conflict_ignore().execute()
+
+def get_cursor() -> QueueCursor:
+    cursor, _ = QueueCursor.get_or_create(name=CURSOR_NAME)
+    return cursor
+
+def current_cycle() -> int:
+    cursor = QueueCursor.get_or_none(QueueCursor.name == CURSOR_NAME)
+    return cursor.cycle if cursor else 0
+
+def _deliverable(position: int):
+    return (QueueItem
+            .select(QueueItem, HouseListing)
+            .join(HouseListing)
+            .where((QueueItem.seq > position) &
+                   (HouseListing.status.not_in(["deleted", "error"])) &
+                   (HouseListing.source_group_id.in_(SOURCE_GROUPS))))
+
+def peek(cursor: QueueCursor) -> Optional[QueueItem]:
+    """Next deliverable item after the cursor: an index seek on send_queue.seq."""
+    return _deliverable(cursor.position).order_by(QueueItem.seq).first()
+
+def peek_batch(cursor: QueueCursor, limit: int) -> list:
+    """
+    The next item plus the deliverable items right after it, as long as they are
+    single messages from the same source group (one forwardMessages call per target).
+    """
+    items = []
+    for item in _deliverable(cursor.position).order_by(QueueItem.seq).limit(limit):
+        listing = item.listing
+        if listing.media_group_id or not listing.source_message_id:
+            break
+        if items and listing.source_group_id != items[0].listing.source_group_id:
+            break
+        items.append(item)
+    return items
+
+def backlog() -> int:
+    """Deliverable items still ahead of the cursor in the current cycle."""
+    cursor = QueueCursor.get_or_none(QueueCursor.name == CURSOR_NAME)
+    return _deliverable(cursor.position if cursor else 0).count()
+
+def acked_targets(listing: HouseListing, cycle: int) -> set:
+    query = (DeliveryLease
+             .select(DeliveryLease.target_chat_id)
+             .where((DeliveryLease.listing == listing) &
+                    (DeliveryLease.cycle == cycle) &
+                    (DeliveryLease.status == "acked")))
+    return {lease.target_chat_id for lease in query}
+
+def acked_targets_many(listing_ids: list, cycle: int) -> dict:
+    """{listing_id: {target, ...}} already acked in `cycle`."""
+    acked = {}
+    query = (DeliveryLease
+             .select(DeliveryLease.listing, DeliveryLease.target_chat_id)
+             .where((DeliveryLease.listing.in_(listing_ids)) &
+                    (DeliveryLease.cycle == cycle) &
+                    (DeliveryLease.status == "acked"))
+             .tuples())
+    for listing_id, target in query:
+        acked.setdefault(listing_id, set()).add(target)
+    return acked
+
+def lease(listing: HouseListing, cycle: int, targets: list):
+    if not targets:
+        return
+    now = datetime.datetime.now()
+    rows = [{"listing": listing, "target_chat_id": t, "cycle": cycle, "status": "leased", "leased_at": now}
+            for t in targets]
+    (DeliveryLease
+     .insert_many(rows)
+     .on_conflict(conflict_target=[DeliveryLease.listing, DeliveryLease.cycle, DeliveryLease.target_chat_id],
+                  update={DeliveryLease.leased_at: now})
+     .execute())
+
+def ack(listing: HouseListing, cycle: int, targets: list):
+    if not targets:
+        return
+    (DeliveryLease
+     .update(status="acked", acked_at=datetime.datetime.now())
+     .where((DeliveryLease.listing == listing) &
+            (DeliveryLease.cycle == cycle) &
+            (DeliveryLease.target_chat_id.in_(list(targets))))
+     .execute())
+
+def lease_many(cycle: int, targets_by_listing: dict):
+    for listing_id, targets in targets_by_listing.items():
+        lease(listing_id, cycle, targets)
+
+def ack_many(cycle: int, targets_by_listing: dict):
+    for listing_id, targets in targets_by_listing.items():
+        ack(listing_id, cycle, targets)
+
+def complete(cursor: QueueCursor, item: QueueItem):
+    """Move the cursor past `item` and mark its listing as sent, atomically."""
+    with db.atomic():
+        QueueCursor.update(position=item.seq).where(QueueCursor.name == cursor.name).execute()
+        (HouseListing
+         .update(status="sent", updated_at=datetime.datetime.now())
+         .where(HouseListing.id == item.listing_id)
+         .execute())
+    cursor.position = item.seq
+
+def complete_batch(cursor: QueueCursor, items: list):
+    """complete() for a peek_batch() result: the cursor moves past the last item."""
+    with db.atomic():
+        QueueCursor.update(position=items[-1].seq).where(QueueCursor.name == cursor.name).execute()
+        (HouseListing
+         .update(status="sent", updated_at=datetime.datetime.now())
+         .where(HouseListing.id.in_([item.listing_id for item in items]))
+         .execute())
+    cursor.position = items[-1].seq
+
+def recycle(cursor: QueueCursor):
+    """
+    Start a new cycle: reset the cursor and drop the previous cycle's leases.
+    Returns how many listings went back from "sent" to "active".
+    Does nothing while the cursor has not passed a deliverable item (empty queue):
+    a new cycle would make pending retries of the current one stale.
+    """
+    if not _deliverable(0).where(QueueItem.seq <= cursor.position).exists():
+        return 0
+    with db.atomic():
+        QueueCursor.update(position=0, cycle=QueueCursor.cycle + 1).where(QueueCursor.name == cursor.name).execute()
+        DeliveryLease.delete().where(DeliveryLease.cycle < cursor.cycle).execute()
+        # status is only a dashboard label now; the cursor decides what is sent next.
+        reset = (HouseListing
+                 .update(status="active", updated_at=datetime.datetime.now())
+                 .where(HouseListing.status == "sent")
+                 .execute())
+    cursor.position = 0
+    cursor.cycle += 1
+    return reset
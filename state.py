@@ -1,4 +1,47 @@
-# Global flaglar forwarding jarayonini boshqarish uchun
+import asyncio
+from models import Setting
+import storage
+
+# Global flaglar forwarding jarayonini boshqarish uchun.
+# Flaglarni faqat set_sending()/request_refresh() orqali o'zgartiring: ular forwarding_task ni
+# darhol uyg'otadi (asyncio.Event), flaglarni davriy tekshirish shart emas.
 
 SENDING_ENABLED = False      # Dastlab yuborish rejimi OCHIQ emas (default OFF)
 REFRESH_REQUESTED = False    # Agar True bo'lsa, bazadagi o'zgarishlar yangilanadi
+
+_changed = None  # asyncio.Event, ishlayotgan event loop ichida yaratiladi
+
+def _event() -> asyncio.Event:
+    global _changed
+    if _changed is None:
+        _changed = asyncio.Event()
+    return _changed
+
+def set_sending(enabled: bool):
+    global SENDING_ENABLED
+    SENDING_ENABLED = enabled
+    _event().set()
+    publish_sending()
+
+def publish_sending():
+    """Store the flag in the database so a separate web process (main.py web) can show it."""
+    return asyncio.ensure_future(storage.write(Setting.put, "sending_enabled", "1" if SENDING_ENABLED else "0"))
+
+def load_sending() -> bool:
+    """Sending flag as last published by the bot process (runs on the DB read pool)."""
+    return Setting.get_value("sending_enabled") == "1"
+
+def request_refresh():
+    global REFRESH_REQUESTED
+    REFRESH_REQUESTED = True
+    _event().set()
+
+async def wait_for_change(timeout: float = None) -> bool:
+    """Sleep until a flag changes or `timeout` seconds pass; returns True if woken by a change."""
+    event = _event()
+    try:
+        await asyncio.wait_for(event.wait(), timeout)
+    except asyncio.TimeoutError:
+        return False
+    event.clear()
+    return True
@@ -0,0 +1,114 @@
+import asyncio
+import logging
+import threading
+from collections import Counter
+from peewee import fn
+from models import HouseListing
+import storage
+from config import STATS_RECONCILE_INTERVAL
+
+# E'lonlar statistikasi xotirada saqlanadi: bitta GROUP BY so'rov bilan yuklanadi,
+# keyin har bir status/boost o'zgarishida +1/-1 qilinadi. O'qish O(1).
+# Hisoblagichlar yuklanmagan bo'lsa, o'zgarishlar e'tiborsiz qoldiriladi. O'zgarishlar faqat
+# storage.write() qaytgandan (commit) keyin qo'llanadi, yozuvchi funksiyalar ichida emas.
+
+_lock = threading.Lock()
+_status_counts = None  # Counter: status -> soni
+_boost_counts = None   # Counter: boost_status -> soni
+
+def compute():
+    """All status and boost buckets in a single GROUP BY query."""
+    status_counts, boost_counts = Counter(), Counter()
+    query = (HouseListing
+             .select(HouseListing.status, HouseListing.boost_status, fn.COUNT(HouseListing.id))
+             .group_by(HouseListing.status, HouseListing.boost_status)
+             .tuples())
+    for listing_status, boost_status, count in query:
+        status_counts[listing_status] += count
+        boost_counts[boost_status] += count
+    return status_counts, boost_counts
+
+def _ensure_loaded():
+    global _status_counts, _boost_counts
+    if _status_counts is None:
+        status_counts, boost_counts = compute()
+        with _lock:
+            if _status_counts is None:
+                _status_counts, _boost_counts = status_counts, boost_counts
+
+def snapshot() -> dict:
+    _ensure_loaded()
+    with _lock:
+        return {
+            "total": sum(_status_counts.values()),
+            "active": _status_counts["active"],
+            "sent": _status_counts["sent"],
+            "deleted": _status_counts["deleted"],
+            "error": _status_counts["error"],
+            "boosted": _boost_counts["boosted"],
+        }
+
+async def current() -> dict:
+    """snapshot() for the event loop: the first load's GROUP BY runs on the DB read pool."""
+    if _status_counts is None:
+        await storage.read(_ensure_loaded)
+    return snapshot()
+
+def total_listings() -> int:
+    _ensure_loaded()
+    with _lock:
+        return sum(_status_counts.values())
+
+def listing_created(status: str = "active", boost_status: str = "unboosted"):
+    with _lock:
+        if _status_counts is not None:
+            _status_counts[status] += 1
+            _boost_counts[boost_status] += 1
+
+def listing_removed(status: str, boost_status: str):
+    with _lock:
+        if _status_counts is not None:
+            _status_counts[status] = max(0, _status_counts[status] - 1)
+            _boost_counts[boost_status] = max(0, _boost_counts[boost_status] - 1)
+
+def status_changed(old: str, new: str, count: int = 1):
+    if old == new or not count:
+        return
+    with _lock:
+        if _status_counts is not None:
+            _status_counts[old] = max(0, _status_counts[old] - count)
+            _status_counts[new] += count
+
+def boost_changed(old: str, new: str):
+    if old == new:
+        return
+    with _lock:
+        if _boost_counts is not None:
+            _boost_counts[old] = max(0, _boost_counts[old] - 1)
+            _boost_counts[new] += 1
+
+def reconcile() -> dict:
+    """Recount from the database and replace the counters; returns the drift that was fixed."""
+    global _status_counts, _boost_counts
+    status_counts, boost_counts = compute()
+    with _lock:
+        drift = {}
+        if _status_counts is not None:
+            for key in set(status_counts) | set(_status_counts):
+                if status_counts[key] != _status_counts[key]:
+                    drift[key] = status_counts[key] - _status_counts[key]
+            for key in set(boost_counts) | set(_boost_counts):
+                if boost_counts[key] != _boost_counts[key]:
+                    drift[f"boost:{key}"] = boost_counts[key] - _boost_counts[key]
+        _status_counts, _boost_counts = status_counts, boost_counts
+    return drift
+
+async def reconcile_task():
+    while True:
+        await asyncio.sleep(STATS_RECONCILE_INTERVAL)
+        try:
+            drift = await storage.read(reconcile)
+            if drift:
+                logging.warning(f"📊 Statistika hisoblagichlari tuzatildi: {drift}")
+        except Exception as e:
+            logging.error(f"❌ Statistikani tekshirishda xato: {e}")
@@ -0,0 +1,101 @@
+import asyncio
+import functools
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from models import db
+from metrics import DB_READ_SECONDS, DB_WRITE_SECONDS, DB_WRITE_BATCH_SIZE, DB_WRITE_QUEUE
+from config import DB_READ_WORKERS, DB_WRITE_BATCH
+
+# Ma'lumotlar bazasi bilan ishlash event loop'dan tashqarida:
+#  - read():  DB_READ_WORKERS ta oqimli pool; har bir oqim o'z SQLite ulanishini
+#             qayta ishlatadi (peewee ulanishlari oqimga bog'langan), ya'ni bu ulanishlar puli.
+#  - write(): bitta yozuvchi oqim. Navbatda to'plangan yozuvlar bitta tranzaksiyada
+#             (har biri alohida savepoint ichida) commit qilinadi.
+# WAL rejimida o'quvchilar yozuvchini kutmaydi.
+
+_read_executor = ThreadPoolExecutor(max_workers=DB_READ_WORKERS, thread_name_prefix="db-read")
+
+
+def _op_name(fn) -> str:
+    return getattr(fn, "__name__", type(fn).__name__)
+
+
+async def read(fn, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    start = time.perf_counter()
+    try:
+        return await loop.run_in_executor(_read_executor, functools.partial(fn, *args, **kwargs))
+    finally:
+        DB_READ_SECONDS.labels(_op_name(fn)).observe(time.perf_counter() - start)
+
+
+def _resolve(future: asyncio.Future, result, error):
+    if future.cancelled():
+        return
+    if error is not None:
+        future.set_exception(error)
+    else:
+        future.set_result(result)
+
+
+class _Writer:
+    def __init__(self, batch_size: int):
+        self.batch_size = batch_size
+        self.queue = queue.Queue()
+        self.thread = None
+        self.lock = threading.Lock()
+
+    def submit(self, fn, args, kwargs) -> asyncio.Future:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        with self.lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name="db-write", daemon=True)
+                self.thread.start()
+        self.queue.put((loop, future, fn, args, kwargs))
+        return future
+
+    def _next_batch(self) -> list:
+        batch = [self.queue.get()]
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            DB_WRITE_BATCH_SIZE.observe(len(batch))
+            results = []
+            try:
+                with db.atomic():
+                    for loop, future, fn, args, kwargs in batch:
+                        try:
+                            # Savepoint: bitta yozuvdagi xato qolganlarini bekor qilmaydi.
+                            with db.atomic():
+                                results.append((loop, future, fn(*args, **kwargs), None))
+                        except Exception as e:
+                            results.append((loop, future, None, e))
+            except Exception as e:
+                logging.error(f"❌ Yozuvlar to'plamini commit qilishda xato: {e}")
+                results = [(loop, future, None, e) for loop, future, _, _, _ in batch]
+            # Natijalar faqat commit'dan keyin qaytariladi.
+            for loop, future, result, error in results:
+                loop.call_soon_threadsafe(_resolve, future, result, error)
+
+
+_writer = _Writer(DB_WRITE_BATCH)
+DB_WRITE_QUEUE.set_function(_writer.queue.qsize)
+
+
+async def write(fn, *args, **kwargs):
+    start = time.perf_counter()
+    try:
+        return await _writer.submit(fn, args, kwargs)
+    finally:
+        DB_WRITE_SECONDS.labels(_op_name(fn)).observe(time.perf_counter() - start)
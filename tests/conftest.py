@@ -0,0 +1,17 @@
+import os
+import sys
+
+import pytest
+
+# Modullar repo ildizida joylashgan (paket emas): testlar ularni benchmarks/ dagi skriptlar kabi import qiladi.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def database(tmp_path):
+    """A fresh SQLite database with the current schema, bound to the shared models.db."""
+    from models import db, initialize_db
+    db.init(str(tmp_path / "test.db"), pragmas=db._pragmas)
+    initialize_db()
+    yield db
+    db.close()
@@ -0,0 +1,70 @@
+import json
+import os
+import re
+
+import pytest
+
+import extraction
+from extraction import extract, fold, parse_command_id
+
+CORPUS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks", "captions.jsonl")
+
+with open(CORPUS, encoding="utf-8") as f:
+    CASES = [json.loads(line) for line in f if line.strip()]
+
+DISTRICT_SPELLINGS = {
+    "Karmana": ["karmana", "Кармана"],
+    "Zarafshon": ["zarafshon", "zarafshan", "Зарафшон"],
+    "Navbahor": ["navbahor", "navbaxor", "navbaor", "Навбаҳор"],
+    "Qiziltepa": ["qiziltepa", "kiziltepa", "qizil-tepa", "Қизилтепа"],
+    "Xatirchi": ["xatirchi", "hatirchi", "Хатирчи", "Ҳатирчи"],
+    "Nurota": ["nurota", "nurata", "Нурота"],
+    "Uchquduq": ["uchquduq", "uchkuduk", "Учқудуқ"],
+    "Konimex": ["konimex", "kanimeh", "Конимех"],
+    "Tomdi": ["tomdi", "tamdi", "Томди"],
+    "G'ozg'on": ["g'ozg'on", "gozgon", "Ғозғон"],
+}
+
+
+@pytest.mark.parametrize("case", CASES, ids=[case["text"].splitlines()[0][:30] for case in CASES])
+def test_corpus(case):
+    assert extract(case["text"])._asdict() == case["expected"]
+
+
+@pytest.mark.parametrize("canonical,spellings", DISTRICT_SPELLINGS.items())
+def test_district_spellings(canonical, spellings):
+    for spelling in spellings:
+        assert extract(f"Uy sotiladi, {spelling} tumani").district == canonical, spelling
+
+
+def test_first_chars_cover_every_pattern():
+    # Lookahead sinfidan tashqaridagi belgidan boshlanadigan moslik jimgina yo'qolardi.
+    first = re.compile(f"[{extraction._FIRST_CHARS}]")
+    texts = [fold(case["text"]) for case in CASES]
+    texts += [fold(spelling) for spellings in DISTRICT_SPELLINGS.values() for spelling in spellings]
+    for name, pattern in extraction._PATTERNS.items():
+        compiled = re.compile(pattern)
+        for text in texts:
+            for match in compiled.finditer(text):
+                assert first.match(match.group()), (name, match.group())
+
+
+def test_lookahead_does_not_change_matches():
+    plain = re.compile("|".join(f"(?:{pattern})" for pattern in extraction._PATTERNS.values()))
+    for case in CASES:
+        text = fold(case["text"])
+        assert ([m.group() for m in extraction._combined.finditer(text)] ==
+                [m.group() for m in plain.finditer(text)])
+
+
+@pytest.mark.parametrize("arg,expected", [
+    ("123", 123), ("KV123", 123), ("КВ-0123", 123), ("kv 77", 77), ("ID 123", 123), ("id:5", 5),
+    ("#123", 123), ("  42 ", 42), ("0007", 7),
+])
+def test_parse_command_id(arg, expected):
+    assert parse_command_id(arg) == expected
+
+
+@pytest.mark.parametrize("arg", ["-5", "--5", ":5", "kv", "", "12a", "5-", "kv-5-"])
+def test_parse_command_id_rejects(arg):
+    assert parse_command_id(arg) is None
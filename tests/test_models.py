@@ -0,0 +1,34 @@
+from models import HouseListing
+
+
+def fields(post_id=7, **extra):
+    return {"post_id": post_id, "post_url": f"https://t.me/c/1/{post_id}", "source_message_id": post_id,
+            "source_group_id": -100, "caption": "KV7", **extra}
+
+
+def test_upsert_replaces_a_repost(database):
+    listing, previous = HouseListing.upsert(**fields())
+    assert previous is None
+    HouseListing.update(status="sent", boost_status="boosted").where(HouseListing.id == listing.id).execute()
+    repost, previous = HouseListing.upsert(**fields(source_message_id=99, caption="KV7 yangi"))
+    assert previous == ("sent", "boosted")
+    assert (repost.id, repost.status, repost.boost_status) == (listing.id, "active", "boosted")
+    assert (repost.source_message_id, repost.caption) == (99, "KV7 yangi")
+
+
+def test_upsert_keeps_a_deleted_listing_deleted(database):
+    listing, _ = HouseListing.upsert(**fields())
+    HouseListing.update(status="deleted").where(HouseListing.id == listing.id).execute()
+    repost, previous = HouseListing.upsert(**fields(caption="KV7 qayta"))
+    assert previous[0] == "deleted"
+    assert (repost.status, repost.caption) == ("deleted", "KV7 qayta")
+
+
+def test_upsert_many_keeps_a_deleted_listing_deleted(database):
+    deleted, _ = HouseListing.upsert(**fields(1))
+    sent, _ = HouseListing.upsert(**fields(2))
+    HouseListing.update(status="deleted").where(HouseListing.id == deleted.id).execute()
+    HouseListing.update(status="sent").where(HouseListing.id == sent.id).execute()
+    stored = HouseListing.upsert_many([fields(1), fields(2), fields(3)])
+    assert {post_id: listing.status for (_, post_id), (listing, _) in stored.items()} == \
+        {1: "deleted", 2: "active", 3: "active"}
@@ -0,0 +1,138 @@
+import datetime
+
+import pytest
+import pytz
+
+from models import HouseListing
+from scheduler import StrideScheduler, QuietHours, BoostedSet
+
+TASHKENT = pytz.timezone("Asia/Tashkent")
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def scheduler(regular=5, boosted=1, interval=10.0):
+    clock = FakeClock()
+    stride = StrideScheduler(interval, clock=clock)
+    stride.add_flow("regular", regular)
+    stride.add_flow("boosted", boosted)
+    return stride, clock
+
+
+def test_stride_shares_slots_by_weight():
+    stride, _ = scheduler(regular=5, boosted=1)
+    picks = [stride.pick(["regular", "boosted"]) for _ in range(600)]
+    assert picks.count("regular") == 500
+    assert picks.count("boosted") == 100
+    # Har 6 ta slotda aynan bitta boost: portlash yo'q.
+    for start in range(0, 600, 6):
+        assert picks[start:start + 6].count("boosted") == 1
+
+
+def test_idle_flow_does_not_bank_credit():
+    stride, _ = scheduler(regular=5, boosted=1)
+    for _ in range(100):
+        assert stride.pick(["regular"]) == "regular"
+    picks = [stride.pick(["regular", "boosted"]) for _ in range(12)]
+    assert picks.count("boosted") == 2
+
+
+def test_slots_are_spaced_on_the_clock():
+    stride, clock = scheduler(interval=10.0)
+    assert stride.delay() == 0.0
+    stride.pick(["regular"])
+    clock.now += 3  # yuborish 3 soniya davom etdi
+    stride.slot_done()
+    assert stride.delay() == pytest.approx(7.0)
+    clock.now += 7
+    stride.pick(["regular"])
+    stride.slot_done(slots=3)  # to'plam uchta slotni egallaydi
+    assert stride.delay() == pytest.approx(30.0)
+    clock.now += 100  # uzoq to'xtash: keyingi slot "qarz" bilan tezlashmaydi
+    stride.pick(["regular"])
+    stride.slot_done()
+    assert stride.delay() == pytest.approx(10.0)
+
+
+def local(hour, minute=0, day=1):
+    return TASHKENT.localize(datetime.datetime(2024, 1, day, hour, minute))
+
+
+@pytest.mark.parametrize("when,expected", [
+    (local(22, 59), 0),
+    (local(23, 0), 8 * 3600),
+    (local(23, 30), 7.5 * 3600),
+    (local(0, 0, day=2), 7 * 3600),
+    (local(6, 59), 60),
+    (local(7, 0), 0),
+    (local(12, 0), 0),
+])
+def test_quiet_hours_across_midnight(when, expected):
+    quiet = QuietHours("23:00-07:00", "Asia/Tashkent")
+    assert quiet.seconds_left(when) == pytest.approx(expected)
+
+
+def test_quiet_hours_use_their_timezone():
+    quiet = QuietHours("23:00-07:00", "Asia/Tashkent")
+    # 18:30 UTC = 23:30 Toshkentda
+    assert quiet.seconds_left(datetime.datetime(2024, 1, 1, 18, 30, tzinfo=datetime.timezone.utc)) == \
+        pytest.approx(7.5 * 3600)
+
+
+def test_quiet_hours_within_a_day_and_disabled():
+    assert QuietHours("13:00-14:00", "Asia/Tashkent").seconds_left(local(13, 30)) == pytest.approx(1800)
+    assert QuietHours("13:00-14:00", "Asia/Tashkent").seconds_left(local(14, 0)) == 0
+    assert QuietHours("", "Asia/Tashkent").seconds_left(local(23, 30)) == 0
+    with pytest.raises(ValueError):
+        QuietHours("25:00-07:00", "Asia/Tashkent")
+
+
+def listing(post_id, boost_status="boosted", status="active"):
+    return HouseListing.create(post_id=post_id, post_url=f"https://t.me/c/1/{post_id}", source_message_id=post_id,
+                               source_group_id=-100, boost_status=boost_status, status=status)
+
+
+def test_boosted_set_round_robin_and_invalidate(database):
+    first, second = listing(1), listing(2)
+    listing(3, boost_status="unboosted")
+    listing(4, status="deleted")
+    boosted = BoostedSet()
+    assert [boosted.next_listing().id for _ in range(3)] == [first.id, second.id, first.id]
+
+    third = listing(5)
+    assert boosted.next_listing().id == second.id  # keshlangan ro'yxat invalidate() gacha o'zgarmaydi
+    boosted.invalidate()
+    assert [boosted.next_listing().id for _ in range(3)] == [first.id, second.id, third.id]
+
+
+def test_boosted_set_drops_unboosted_listing(database):
+    first = listing(1)
+    boosted = BoostedSet()
+    assert boosted.has_any()
+    HouseListing.update(boost_status="unboosted").where(HouseListing.id == first.id).execute()
+    assert boosted.next_listing() is None
+    assert not boosted.has_any()
+
+
+def test_boosted_set_discards_load_overtaken_by_invalidate(database):
+    listing(1)
+
+    class Racing(BoostedSet):
+        def _query(self):
+            ids = super()._query()
+            if self.generation == 0:
+                # So'rov read pool'da ketayotganda loop'da invalidate() chaqirildi.
+                listing(2)
+                self.invalidate()
+            return ids
+
+    boosted = Racing()
+    assert boosted.has_any()
+    assert boosted.ids is None  # eskirgan natija keshlanmadi
+    assert len(boosted._load()) == 2
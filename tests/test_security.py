@@ -0,0 +1,44 @@
+from types import SimpleNamespace
+
+from security import TokenCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_entries_expire_after_ttl_and_token_exp():
+    clock = FakeClock()
+    cache = TokenCache(maxsize=10, ttl=30, clock=clock)
+    user = SimpleNamespace(id=1)
+    cache.put("a", user, token_exp=clock.now + 3600)
+    cache.put("b", user, token_exp=clock.now + 10)
+    assert cache.get("a") is user and cache.get("b") is user
+    clock.now += 10
+    assert cache.get("b") is None
+    clock.now += 20
+    assert cache.get("a") is None
+
+
+def test_zero_ttl_or_size_disables_the_cache():
+    user = SimpleNamespace(id=1)
+    for cache in (TokenCache(maxsize=10, ttl=0), TokenCache(maxsize=0, ttl=30)):
+        cache.put("a", user, token_exp=float("inf"))
+        assert cache.get("a") is None
+        assert not cache.entries
+
+
+def test_lru_eviction_and_invalidate_user():
+    cache = TokenCache(maxsize=2, ttl=30, clock=FakeClock())
+    alice, bob = SimpleNamespace(id=1), SimpleNamespace(id=2)
+    cache.put("a1", alice, token_exp=float("inf"))
+    cache.put("b1", bob, token_exp=float("inf"))
+    cache.get("a1")
+    cache.put("a2", alice, token_exp=float("inf"))  # b1 eng uzoq ishlatilmagan
+    assert cache.get("b1") is None
+    cache.invalidate_user(alice.id)
+    assert cache.get("a1") is None and cache.get("a2") is None
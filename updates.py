@@ -0,0 +1,139 @@
+import asyncio
+import hmac
+import json
+import logging
+import time
+from collections import deque
+from aiogram import Bot, Dispatcher, types
+from config import UPDATE_MODE, UPDATE_WORKERS, UPDATE_QUEUE_SIZE, WEBHOOK_SECRET
+from metrics import UPDATES, UPDATE_SECONDS, UPDATE_QUEUE
+
+# Webhook rejimida Telegram yangilanishlari darhol qabul qilinadi (200 OK) va navbatga qo'yiladi.
+# Bir xil kalitli yangilanishlar doim bitta workerga tushadi va tartib bilan qayta ishlanadi:
+#  - albom qismlari: (chat, media_group_id) — yig'uvchi qismlarni kelgan tartibda oladi;
+#  - qolgan xabarlar (manba guruhdagi oddiy e'lonlar ham): chat id — chat ichidagi tartib saqlanadi
+#    (e'lon va uning tahriri yoki o'chirilishi bir-biridan oldin qayta ishlanib qolmaydi).
+
+_CHAT_KEYS = ("message", "edited_message", "channel_post", "edited_channel_post")
+
+
+def shard_key(data: dict):
+    """Ordering key of a raw update (see above); sender id for updates without a chat."""
+    for key in _CHAT_KEYS:
+        if key in data:
+            message = data[key]
+            chat_id = message.get("chat", {}).get("id", 0)
+            if message.get("media_group_id"):
+                return chat_id, message["media_group_id"]
+            return chat_id
+    for value in data.values():
+        if isinstance(value, dict):
+            if isinstance(value.get("message"), dict):
+                return value["message"].get("chat", {}).get("id", 0)
+            if isinstance(value.get("from"), dict):
+                return value["from"].get("id", 0)
+    return 0
+
+
+class UpdateDispatcher:
+    """
+    Bounded worker pool in front of `Dispatcher.process_update`.
+
+    `put()` only parses the shard key and enqueues, so the webhook can answer at once;
+    when a worker's queue is full it waits, which slows Telegram down instead of
+    growing memory. Recently seen update_ids are dropped (Telegram re-sends on timeouts).
+    """
+
+    def __init__(self, dp: Dispatcher, workers: int = UPDATE_WORKERS, queue_size: int = UPDATE_QUEUE_SIZE):
+        self.dp = dp
+        self.queues = [asyncio.Queue(queue_size) for _ in range(max(1, workers))]
+        self.tasks = []
+        self.seen = set()
+        self.seen_order = deque()
+
+    def start(self):
+        UPDATE_QUEUE.set_function(self.backlog)
+        self.tasks = [asyncio.create_task(self._worker(queue)) for queue in self.queues]
+
+    def backlog(self) -> int:
+        return sum(queue.qsize() for queue in self.queues)
+
+    def _duplicate(self, update_id) -> bool:
+        if update_id is None:
+            return False
+        if update_id in self.seen:
+            return True
+        self.seen.add(update_id)
+        self.seen_order.append(update_id)
+        if len(self.seen_order) > 10000:
+            self.seen.discard(self.seen_order.popleft())
+        return False
+
+    async def put(self, data: dict):
+        if self._duplicate(data.get("update_id")):
+            UPDATES.labels("duplicate").inc()
+            return
+        queue = self.queues[hash(shard_key(data)) % len(self.queues)]
+        await queue.put((data, time.perf_counter()))
+
+    async def _worker(self, queue: asyncio.Queue):
+        Bot.set_current(self.dp.bot)
+        Dispatcher.set_current(self.dp)
+        while True:
+            data, received = await queue.get()
+            try:
+                await self.dp.process_update(types.Update.to_object(data))
+                UPDATES.labels("ok").inc()
+            except Exception as e:
+                UPDATES.labels("error").inc()
+                logging.error(f"❌ Yangilanish {data.get('update_id')} ni qayta ishlashda xato: {e}")
+            finally:
+                UPDATE_SECONDS.observe(time.perf_counter() - received)
+                queue.task_done()
+
+    async def join(self):
+        """Wait until everything queued so far is processed (shutdown, benchmarks)."""
+        for queue in self.queues:
+            await queue.join()
+
+    async def stop(self):
+        await self.join()
+        for task in self.tasks:
+            task.cancel()
+
+
+update_dispatcher = None  # webhook rejimida start_bot() yaratadi
+
+
+def check_config():
+    """Webhook endpoint is public: refuse to run it without a secret token."""
+    if UPDATE_MODE == "webhook" and not WEBHOOK_SECRET:
+        raise RuntimeError("UPDATE_MODE=webhook uchun WEBHOOK_SECRET berilishi shart "
+                           "(aks holda istalgan kishi soxta yangilanish yubora oladi).")
+
+
+def start(dp: Dispatcher) -> UpdateDispatcher:
+    global update_dispatcher
+    update_dispatcher = UpdateDispatcher(dp)
+    update_dispatcher.start()
+    return update_dispatcher
+
+
+def authorized(secret: str) -> bool:
+    """The webhook's X-Telegram-Bot-Api-Secret-Token header; checked before the body is read."""
+    return bool(WEBHOOK_SECRET) and hmac.compare_digest((secret or "").encode(), WEBHOOK_SECRET.encode())
+
+
+async def accept(body: bytes) -> int:
+    """Handle one (authorized) webhook request body; returns the HTTP status to answer with."""
+    try:
+        data = json.loads(body)
+    except ValueError:
+        data = None
+    if not isinstance(data, dict):
+        UPDATES.labels("invalid").inc()
+        return 400
+    if update_dispatcher is None:
+        return 503  # bot bu jarayonda ishlamayapti; Telegram keyinroq qayta yuboradi
+    await update_dispatcher.put(data)
+    return 200